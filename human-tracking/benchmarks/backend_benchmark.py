@@ -0,0 +1,133 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from engines.backends import available_backends, labelled_frames, load_detector, load_reid_model
+from engines.reid import BatchFeatureExtractor
+
+# YOLO and OSNet on every installed inference backend, FP32 and INT8, on the labelled frames of Annotation/:
+#   detection  frames/s and precision / recall / F1 at IoU 0.5 against the labels
+#   re-ID      crops/s and mean cosine similarity of the embeddings to the PyTorch FP32 ones
+# Deltas are against PyTorch FP32, the previous setup. Exports and calibration are cached, so only the
+# first run of a backend pays for them.
+
+HUMAN_TRACKING_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+WEIGHTS = os.path.join(HUMAN_TRACKING_DIR, 'model', 'runs', 'detect', 'train', 'weights', 'best.pt')
+IMAGES = os.path.join(HUMAN_TRACKING_DIR, 'model_training', 'datasets', 'images')
+ANNOTATIONS = os.path.join(HUMAN_TRACKING_DIR, 'Annotation')
+EXPORT_DIR = os.path.join(HUMAN_TRACKING_DIR, 'model', 'exported')
+IOU_THRESHOLD = 0.5
+
+
+def iou_matrix(a, b):
+    a, b = np.asarray(a, dtype=np.float32).reshape(-1, 4), np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return intersection / np.maximum(area_a[:, None] + area_b[None, :] - intersection, 1e-6)
+
+
+def match(predicted, labelled):
+    """True positives of one frame, greedy on the highest IoU first"""
+    if len(predicted) == 0 or len(labelled) == 0:
+        return 0
+    ious = iou_matrix(predicted, labelled)
+    matched = 0
+    while True:
+        i, j = np.unravel_index(ious.argmax(), ious.shape)
+        if ious[i, j] < IOU_THRESHOLD:
+            return matched
+        matched += 1
+        ious[i, :] = 0
+        ious[:, j] = 0
+
+
+def benchmark_detector(model, frames, batch_size, conf, device):
+    images = [image for image, _ in frames]
+    model(images[:batch_size], conf=conf, device=device, verbose=False)  # Warm-up
+
+    predicted = []
+    start_time = time.perf_counter()
+    for start in range(0, len(images), batch_size):
+        results = model(images[start:start + batch_size], conf=conf, device=device, verbose=False)
+        predicted += [result.boxes.xyxy.cpu().numpy() for result in results]
+    elapsed = time.perf_counter() - start_time
+
+    true_positives = sum(match(boxes, labelled) for boxes, (_, labelled) in zip(predicted, frames))
+    precision = true_positives / max(sum(len(boxes) for boxes in predicted), 1)
+    recall = true_positives / max(sum(len(labelled) for _, labelled in frames), 1)
+    return {
+        "fps": len(images) / elapsed,
+        "precision": precision,
+        "recall": recall,
+        "f1": 2 * precision * recall / max(precision + recall, 1e-6),
+    }
+
+
+def benchmark_reid(extractor, crops, batch_size):
+    batch_extractor = BatchFeatureExtractor(extractor, max_batch_size=batch_size)
+    batch_extractor(crops[:batch_size])  # Warm-up
+    start_time = time.perf_counter()
+    embeddings = batch_extractor(crops)
+    return embeddings, len(crops) / (time.perf_counter() - start_time)
+
+
+def cosine_similarity(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return float(np.mean(np.sum(a * b, axis=1)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FPS and accuracy of YOLO / OSNet per inference backend")
+    parser.add_argument("--weights", default=WEIGHTS)
+    parser.add_argument("--images", nargs="+", default=[IMAGES], help="Image folders searched for the labelled frames")
+    parser.add_argument("--annotations", default=ANNOTATIONS)
+    parser.add_argument("--limit", type=int, default=200, help="Labelled frames to evaluate")
+    parser.add_argument("--backends", nargs="+", default=available_backends())
+    parser.add_argument("--no-int8", action="store_true", help="Skip the INT8 variants")
+    parser.add_argument("--device", default="cpu", help="Device of the PyTorch backend, cpu as on the store PCs")
+    parser.add_argument("--batch", type=int, default=1, help="Frames per YOLO call")
+    parser.add_argument("--reid-batch", type=int, default=16, help="Crops per OSNet call")
+    parser.add_argument("--conf", type=float, default=0.5)
+    args = parser.parse_args()
+
+    frames = list(labelled_frames(args.images, args.annotations, args.limit))
+    if not frames:
+        sys.exit(f"No labelled frames found in {args.images} for {args.annotations}")
+    crops = [image[max(y1, 0):y2, max(x1, 0):x2] for image, boxes in frames for x1, y1, x2, y2 in boxes]
+    crops = [crop for crop in crops if crop.size != 0]
+    print(f"{len(frames)} frames, {sum(len(boxes) for _, boxes in frames)} labelled people")
+
+    reference = None  # PyTorch FP32 embeddings
+    baseline = None  # PyTorch FP32 row
+    rows = []
+    for backend in ["torch"] + [backend for backend in args.backends if backend != "torch"]:
+        for int8 in [False] if backend == "torch" or args.no_int8 else [False, True]:
+            model = load_detector(args.weights, backend, int8, calibration_images=args.images, annotations=args.annotations,
+                                  calibration_data=os.path.join(HUMAN_TRACKING_DIR, 'model_training', 'data.yaml'))
+            row = benchmark_detector(model, frames, args.batch, args.conf, args.device)
+            extractor = load_reid_model(backend, args.device, EXPORT_DIR, int8, calibration_images=args.images,
+                                        annotations=args.annotations)
+            embeddings, row["crops_per_s"] = benchmark_reid(extractor, crops, args.reid_batch)
+            if reference is None:
+                reference = embeddings
+            row["cosine"] = cosine_similarity(embeddings, reference)
+            row["name"] = f"{backend}{' int8' if int8 else ''}"
+            baseline = baseline or row
+            rows.append(row)
+
+    print(f"{'backend':>16} {'det fps':>8} {'speedup':>8} {'precision':>10} {'recall':>7} {'f1':>6} {'f1 delta':>9} "
+          f"{'crops/s':>8} {'speedup':>8} {'cosine':>7}")
+    for row in rows:
+        print(f"{row['name']:>16} {row['fps']:>8.1f} {row['fps'] / baseline['fps']:>7.2f}x {row['precision']:>10.3f} "
+              f"{row['recall']:>7.3f} {row['f1']:>6.3f} {row['f1'] - baseline['f1']:>+9.3f} {row['crops_per_s']:>8.1f} "
+              f"{row['crops_per_s'] / baseline['crops_per_s']:>7.2f}x {row['cosine']:>7.4f}")
@@ -0,0 +1,167 @@
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import cv2
+from deep_sort_realtime.deepsort_tracker import DeepSort
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from engines.zones import ZoneMap
+from engines.schedule import DetectionScheduler, predicted_ltrb
+
+# Simulated shoppers walk between zones and browse, the detector is ground truth plus jitter and
+# misses. YOLO cost is modelled (--detect-ms), tracking, prediction and zone lookups are measured.
+# Dwell error compares the zone durations each schedule measures with the true ones.
+
+FRAME_SIZE = (1280, 960)
+MOTION_FRAME_SIZE = (160, 120)  # Rendered frames only feed the scheduler's motion estimate
+BOX_SIZE = (120, 300)
+EMBEDDING_DIM = 128
+CAMERA_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'engines', 'cameras.json')
+MODES = {"every frame": (1, 1), "fixed 3": (3, 3), "fixed 6": (6, 6), "adaptive 1-6": (1, 6)}
+
+
+def simulate_shoppers(rng, people, seconds, fps, zone_centers):
+    """Center positions of every shopper per frame, NaN while they are not in view"""
+    frames = int(seconds * fps)
+    positions = np.full((frames, people, 2), np.nan)
+    for person in range(people):
+        frame = int(rng.uniform(0, 0.5) * frames)
+        position = np.array([rng.uniform(0, FRAME_SIZE[0]), FRAME_SIZE[1] * 0.55])
+        for _ in range(rng.integers(2, 6)):
+            # Walk to a shelf, then browse it
+            target = zone_centers[rng.integers(len(zone_centers))] + rng.normal(0, 30, 2)
+            speed = rng.uniform(60, 140) / fps
+            steps = max(1, int(np.linalg.norm(target - position) / speed))
+            path = position + np.linspace(0, 1, steps)[:, None] * (target - position)
+            browse_frames = int(rng.uniform(2, 15) * fps)
+            browse = target + rng.normal(0, 3, (browse_frames, 2))
+            for point in np.concatenate([path, browse]):
+                if frame >= frames:
+                    break
+                positions[frame, person] = point
+                frame += 1
+            position = target
+    return positions
+
+
+def render(centers):
+    scale = np.array(MOTION_FRAME_SIZE) / np.array(FRAME_SIZE)
+    frame = np.full((MOTION_FRAME_SIZE[1], MOTION_FRAME_SIZE[0], 3), 90, dtype=np.uint8)
+    for x, y in centers * scale:
+        w, h = np.array(BOX_SIZE) * scale / 2
+        cv2.rectangle(frame, (int(x - w), int(y - h)), (int(x + w), int(y + h)), (200, 160, 120), -1)
+    return frame
+
+
+def run(positions, zone_map, identities, fps, interval, detect_ms, miss_rate, rng):
+    scheduler = DetectionScheduler(*interval, frame_period=1.0 / fps)
+    tracker = DeepSort(max_age=1, embedder=None)  # As create_tracker() in zone.py, one missed detection ends a track
+    last_zone = {}  # Format: {track_id: (zone, timestamp)}, same bookkeeping as record_zone in zone.py
+    dwell = {}  # Format: {track_id: {zone: seconds}}
+    owner = {}  # Format: {track_id: {person: detections}}
+    measured = 0.0
+
+    def observe(track_id, zone, now):
+        if track_id in last_zone:
+            previous, since = last_zone[track_id]
+            dwell.setdefault(track_id, {}).setdefault(previous, 0.0)
+            dwell[track_id][previous] += now - since
+        last_zone[track_id] = (zone, now)
+
+    for frame_index, frame_positions in enumerate(positions):
+        now = frame_index / fps
+        visible = np.flatnonzero(~np.isnan(frame_positions[:, 0]))
+        detect = scheduler.should_detect(render(frame_positions[visible]), now)
+        prediction = None if detect else scheduler.prediction()
+
+        start_time = time.perf_counter()
+        if detect:
+            scheduler.record_detection(detect_ms / 1000)
+            seen = visible[rng.random(len(visible)) >= miss_rate]
+            centers = frame_positions[seen] + rng.normal(0, 4, (len(seen), 2))
+            detections = [([x - BOX_SIZE[0] / 2, y - BOX_SIZE[1] / 2, BOX_SIZE[0], BOX_SIZE[1]], 0.9, "human") for x, y in centers]
+            embeds = identities[seen] + rng.normal(0, 0.1, (len(seen), EMBEDDING_DIM))
+            tracks = tracker.update_tracks(detections, embeds=list(embeds / np.linalg.norm(embeds, axis=1, keepdims=True)),
+                                           others=list(seen))
+            scheduler.observe_tracks(tracks)
+            scheduler.record_update(now)
+            tracks = [track for track in tracks if track.is_confirmed() and track.time_since_update == 0]
+            boxes = [track.to_ltrb(orig=True) for track in tracks]
+            for track in tracks:
+                person = track.get_det_supplementary()
+                owner.setdefault(track.track_id, {}).setdefault(person, 0)
+                owner[track.track_id][person] += 1
+        else:
+            tracks = [track for track in tracker.tracker.tracks if track.is_confirmed() and track.time_since_update == 0]
+            steps = scheduler.steps(prediction.timestamp)
+            boxes = [predicted_ltrb(track, steps) for track in tracks]
+
+        zones = zone_map.lookup([((x1 + x2) / 2, (y1 + y2) / 2) for x1, y1, x2, y2 in boxes], (FRAME_SIZE[1], FRAME_SIZE[0]))
+        for track, zone in zip(tracks, zones):
+            observe(track.track_id, zone, now)
+        measured += time.perf_counter() - start_time
+
+    # Every track counts for the shopper it was matched to most often
+    estimated = {}
+    for track_id, zones in dwell.items():
+        person = max(owner[track_id], key=owner[track_id].get)
+        for zone, seconds in zones.items():
+            estimated[(person, zone)] = estimated.get((person, zone), 0.0) + seconds
+    return scheduler, measured, estimated, len(owner)
+
+
+def true_dwell(positions, zone_map, fps):
+    truth = {}
+    for frame_positions in positions:
+        visible = np.flatnonzero(~np.isnan(frame_positions[:, 0]))
+        for person, zone in zip(visible, zone_map.lookup(frame_positions[visible], (FRAME_SIZE[1], FRAME_SIZE[0]))):
+            truth[(person, zone)] = truth.get((person, zone), 0.0) + 1.0 / fps
+    return truth
+
+
+def benchmark(people, seconds, fps, detect_ms, miss_rate, seed):
+    with open(CAMERA_CONFIG, "r") as f:
+        zones = json.load(f)[0]["zones"]
+    zone_map = ZoneMap(zones, FRAME_SIZE)
+    zone_centers = np.array([np.mean(zone["polygon"], axis=0) for zone in zones])
+
+    rng = np.random.default_rng(seed)
+    positions = simulate_shoppers(rng, people, seconds, fps, zone_centers)
+    identities = rng.standard_normal((people, EMBEDDING_DIM))
+    truth = true_dwell(positions, zone_map, fps)
+    total = sum(truth.values())
+
+    results = []
+    for mode, interval in MODES.items():
+        scheduler, measured, estimated, track_count = run(positions, zone_map, identities, fps, interval, detect_ms, miss_rate,
+                                                          np.random.default_rng(seed + 1))
+        error = sum(abs(estimated.get(key, 0.0) - truth.get(key, 0.0)) for key in set(truth) | set(estimated))
+        cost = scheduler.detections * detect_ms / 1000 + measured
+        results.append({
+            "mode": mode,
+            "detected_frames_pct": round(100 * scheduler.detections / len(positions), 1),
+            "fps": round(len(positions) / cost, 1),
+            "dwell_error_pct": round(100 * error / total, 1),
+            "tracks_per_shopper": round(track_count / people, 2),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FPS vs dwell-time accuracy of the YOLO detection schedules")
+    parser.add_argument("--people", type=int, default=12)
+    parser.add_argument("--seconds", type=float, default=120)
+    parser.add_argument("--fps", type=float, default=15, help="Camera frame rate")
+    parser.add_argument("--detect-ms", type=float, default=120, help="Modelled YOLO cost per frame on the store PC")
+    parser.add_argument("--miss-rate", type=float, default=0.01, help="Fraction of people YOLO misses on a frame")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'mode':>14} {'detected %':>11} {'fps':>8} {'dwell err %':>12} {'tracks/shopper':>15}")
+    for result in benchmark(args.people, args.seconds, args.fps, args.detect_ms, args.miss_rate, args.seed):
+        print(f"{result['mode']:>14} {result['detected_frames_pct']:>11} {result['fps']:>8} "
+              f"{result['dwell_error_pct']:>12} {result['tracks_per_shopper']:>15}")
@@ -0,0 +1,110 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from engines.faces import ATTRIBUTE_INPUT_SIZE, ATTRIBUTE_MEAN, FaceAttributeAnalyzer, HaarFaceDetector, DnnFaceDetector
+
+# Per-frame age / gender cost against the number of people in view:
+#   per person  the previous behaviour: Haar over the whole person crop, two single-image forwards per face
+#   batched     FaceAttributeAnalyzer: upper body only, one blob batch per network
+#   sampled     batched, with each track sampled once every --interval seconds (the live setting)
+# Every person is assumed to show a face, the worst case for the attribute networks.
+
+FACE_MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'model', 'face_models')
+FRAME_SIZE = (1280, 960)
+PERSON_SIZE = (120, 300)
+
+
+class EveryoneHasAFace:
+    """Runs the real detector for its cost, then reports a face at the top of every crop it missed"""
+
+    def __init__(self, detector):
+        self.detector = detector
+
+    def detect(self, crops):
+        faces = self.detector.detect(crops)
+        for crop, found in zip(crops, faces):
+            if not found:
+                height, width = crop.shape[:2]
+                side = min(width, height) // 2
+                found.append(((width - side) // 2, 0, side, side))
+        return faces
+
+
+def per_person(frame, boxes, detector, age_net, gender_net):
+    # The loop analyze_frame ran before: every person crop on its own, every face through both networks alone
+    for x1, y1, x2, y2 in boxes:
+        person_crop = frame[y1:y2, x1:x2]
+        for fx, fy, fw, fh in detector.detect([person_crop])[0]:
+            blob = cv2.dnn.blobFromImage(person_crop[fy:fy + fh, fx:fx + fw], 1.0, ATTRIBUTE_INPUT_SIZE, ATTRIBUTE_MEAN, swapRB=False)
+            age_net.setInput(blob)
+            age_net.forward()
+            gender_net.setInput(blob)
+            gender_net.forward()
+
+
+def person_boxes(rng, people):
+    x = rng.integers(0, FRAME_SIZE[0] - PERSON_SIZE[0], people)
+    y = rng.integers(0, FRAME_SIZE[1] - PERSON_SIZE[1], people)
+    return [(int(a), int(b), int(a) + PERSON_SIZE[0], int(b) + PERSON_SIZE[1]) for a, b in zip(x, y)]
+
+
+def timed(function, frames):
+    timings = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(float(np.median(timings)), 1)
+
+
+def benchmark(people, frames, detector, age_net, gender_net, fps, interval, frame):
+    rng = np.random.default_rng(people)
+    boxes = person_boxes(rng, people)
+    analyzer = FaceAttributeAnalyzer(age_net, gender_net, detector)
+    sampled = boxes[:int(np.ceil(people / (fps * interval)))]  # Tracks due on an average frame
+    return {
+        "people": people,
+        "per_person_ms": timed(lambda: per_person(frame, boxes, detector, age_net, gender_net), frames),
+        "batched_ms": timed(lambda: analyzer.analyze(frame, boxes), frames),
+        "sampled_ms": timed(lambda: analyzer.analyze(frame, sampled), frames),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-frame face / age / gender cost against people in view")
+    parser.add_argument("--people", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--frames", type=int, default=10)
+    parser.add_argument("--detector", choices=["haar", "dnn"], default="haar")
+    parser.add_argument("--fps", type=float, default=15, help="Camera frame rate, for the sampled column")
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between samples of one track")
+    parser.add_argument("--frame", default=None, help="Image to crop people from, defaults to noise")
+    parser.add_argument("--age-model", default=os.path.join(FACE_MODEL_DIR, "age_net.caffemodel"))
+    parser.add_argument("--age-config", default=os.path.join(FACE_MODEL_DIR, "deploy_age.prototxt"))
+    parser.add_argument("--gender-model", default=os.path.join(FACE_MODEL_DIR, "gender_net.caffemodel"))
+    parser.add_argument("--gender-config", default=os.path.join(FACE_MODEL_DIR, "deploy_gender.prototxt"))
+    args = parser.parse_args()
+
+    age_net = cv2.dnn.readNet(args.age_model, args.age_config if args.age_model.endswith(".caffemodel") else "")
+    gender_net = cv2.dnn.readNet(args.gender_model, args.gender_config if args.gender_model.endswith(".caffemodel") else "")
+    if args.detector == "dnn":
+        detector = DnnFaceDetector(os.path.join(FACE_MODEL_DIR, "deploy.prototxt"),
+                                   os.path.join(FACE_MODEL_DIR, "res10_300x300_ssd_iter_140000.caffemodel"))
+    else:
+        detector = HaarFaceDetector()
+    detector = EveryoneHasAFace(detector)
+
+    if args.frame:
+        frame = cv2.resize(cv2.imread(args.frame), FRAME_SIZE)
+    else:
+        frame = np.random.default_rng(0).integers(0, 256, (FRAME_SIZE[1], FRAME_SIZE[0], 3), dtype=np.uint8)
+
+    print(f"{'people':>7} {'per person ms':>14} {'batched ms':>11} {'sampled ms':>11}")
+    for people in args.people:
+        result = benchmark(people, args.frames, detector, age_net, gender_net, args.fps, args.interval, frame)
+        print(f"{result['people']:>7} {result['per_person_ms']:>14} {result['batched_ms']:>11} {result['sampled_ms']:>11}")
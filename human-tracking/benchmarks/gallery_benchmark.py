@@ -0,0 +1,57 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from engines.gallery import EmbeddingGallery
+
+EMBEDDING_DIM = 512  # osnet_x1_0 output size
+
+
+def benchmark(gallery_size, tracks_per_frame, frames, threshold):
+    rng = np.random.default_rng(0)
+    gallery = EmbeddingGallery(threshold=threshold, dim=EMBEDDING_DIM, initial_capacity=gallery_size)
+    stored = rng.standard_normal((gallery_size, EMBEDDING_DIM)).astype(np.float32)
+    for identity, embedding in enumerate(stored):
+        gallery.add(str(identity), embedding, cam_id=0)
+
+    timings = []
+    for _ in range(frames):
+        # Half of the tracks are noisy copies of stored identities, the rest are new people
+        known = rng.integers(0, gallery_size, tracks_per_frame // 2)
+        queries = np.concatenate([
+            stored[known] + 0.05 * rng.standard_normal((len(known), EMBEDDING_DIM)),
+            rng.standard_normal((tracks_per_frame - len(known), EMBEDDING_DIM)),
+        ]).astype(np.float32)
+
+        start = time.perf_counter()
+        results = gallery.match(queries)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    hits = sum(1 for identity, _ in results[:len(known)] if identity is not None)
+    timings = np.array(timings)
+    return {
+        "gallery_size": gallery_size,
+        "tracks_per_frame": tracks_per_frame,
+        "p50_ms": round(float(np.percentile(timings, 50)), 3),
+        "p95_ms": round(float(np.percentile(timings, 95)), 3),
+        "known_hits_last_frame": f"{hits}/{len(known)}",
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-frame re-ID gallery match latency")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--tracks", type=int, default=10, help="Confirmed tracks per frame")
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args()
+
+    print(f"{'identities':>10} {'tracks':>7} {'p50 ms':>9} {'p95 ms':>9} {'hits':>8}")
+    for size in args.sizes:
+        result = benchmark(size, args.tracks, args.frames, args.threshold)
+        print(f"{result['gallery_size']:>10} {result['tracks_per_frame']:>7} "
+              f"{result['p50_ms']:>9} {result['p95_ms']:>9} {result['known_hits_last_frame']:>8}")
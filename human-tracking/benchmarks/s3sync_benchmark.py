@@ -0,0 +1,136 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import contextlib
+
+import boto3
+from moto import mock_aws
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from engines.s3datasync import S3DataSync
+
+BUCKET = "benchmark-physicalstore"
+
+
+class FlakyPut:
+    """Wraps S3DataSync.put_part and fails every upload while `down` is set, like an S3 outage"""
+
+    def __init__(self, put):
+        self.put = put
+        self.down = threading.Event()
+        self.calls = 0
+        self.keys = []
+
+    def __call__(self, key, body):
+        self.calls += 1
+        if self.down.is_set():
+            raise ConnectionError("simulated S3 outage")
+        self.put(key, body)
+        self.keys.append(key)
+
+
+def create_sync(s3, work_dir):
+    sync = S3DataSync(
+        bucket_name=BUCKET,
+        local_base_folder_customer=os.path.join(work_dir, "customer"),
+        local_base_folder_visitzone=os.path.join(work_dir, "visit_zone"),
+        s3_client=s3,
+    )
+    flaky = FlakyPut(sync.put_part)
+    sync.upload_queue.put = flaky
+    sync.upload_queue.base_backoff = 0.05
+    sync.upload_queue.max_backoff = 0.5
+    return sync, flaky
+
+
+def append_records(sync, start, count):
+    log_path, _ = sync.get_targets("customer")
+    with open(log_path, "a") as f:
+        for i in range(start, start + count):
+            record = {"track_id": f"0-{i}", "age": "25-32", "gender": "Female", "time": "12:00:00"}
+            f.write(json.dumps({"key": f"bench-{i}", "record": record}) + "\n")
+
+
+def wait_for_queue(sync, timeout=120):
+    deadline = time.time() + timeout
+    while sync.upload_queue.pending() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def benchmark(batches, batch_size, outage_batches, restart_at):
+    work_dir = tempfile.mkdtemp(prefix="s3sync_bench_")
+    try:
+        with mock_aws():
+            s3 = boto3.client("s3", region_name="us-east-1")
+            s3.create_bucket(Bucket=BUCKET)
+            sync, flaky = create_sync(s3, work_dir)
+            sync.upload_queue.start()
+
+            uploaded_keys = []
+            failed_attempts = 0
+            start = time.perf_counter()
+            for batch in range(batches):
+                # S3 goes down for a stretch of batches, records keep queueing on disk
+                if batch == outage_batches[0]:
+                    flaky.down.set()
+                if batch == outage_batches[1]:
+                    flaky.down.clear()
+
+                # Simulated restart: a new process picks up the state file and the queue folder
+                if batch == restart_at:
+                    sync.upload_queue.stop()
+                    uploaded_keys.extend(flaky.keys)
+                    failed_attempts += flaky.calls - len(flaky.keys)
+                    down = flaky.down.is_set()
+                    sync, flaky = create_sync(s3, work_dir)
+                    if down:
+                        flaky.down.set()
+                    sync.upload_queue.start()
+
+                append_records(sync, batch * batch_size, batch_size)
+                sync.upload_new_records("customer")
+
+            flaky.down.clear()
+            wait_for_queue(sync)
+            elapsed = time.perf_counter() - start
+            sync.upload_queue.stop()
+            uploaded_keys.extend(flaky.keys)
+            failed_attempts += flaky.calls - len(flaky.keys)
+
+            sync.compact("customer")
+            daily = json.loads(s3.get_object(Bucket=BUCKET, Key=f"customer/{sync.current_date}.json")["Body"].read())
+
+            total = batches * batch_size
+            return {
+                "records": total,
+                "parts": batches,
+                "seconds": round(elapsed, 3),
+                "records_per_s": round(total / elapsed),
+                "parts_per_s": round(batches / elapsed, 1),
+                "failed_attempts": failed_attempts,
+                "records_in_daily_file": len(daily),
+                "lost": total - len({record["track_id"] for record in daily}),
+                "parts_sent_twice": len(uploaded_keys) - len(set(uploaded_keys)),
+            }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="S3DataSync queue throughput and outage / restart recovery against moto")
+    parser.add_argument("--batches", type=int, default=200, help="Flushes of the analytics writer")
+    parser.add_argument("--batch-size", type=int, default=100, help="Records per flush")
+    parser.add_argument("--outage", type=int, nargs=2, default=[50, 90], help="S3 is down from batch x to batch y")
+    parser.add_argument("--restart-at", type=int, default=70, help="Restart the sync service at this batch")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):  # Per-part log lines of the service
+        result = benchmark(args.batches, args.batch_size, args.outage, args.restart_at)
+    print(json.dumps(result, indent=2))
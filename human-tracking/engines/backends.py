@@ -0,0 +1,260 @@
+import os
+import glob
+import itertools
+import numpy as np
+import cv2
+from engines.reid import preprocess_crops
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+try:
+    import openvino as ov
+except ImportError:
+    ov = None
+
+# Inference backends for the custom YOLO detector and the OSNet re-ID model:
+#   torch        the PyTorch weights as before (CUDA when available)
+#   onnxruntime  exported ONNX models on ONNX Runtime
+#   openvino     exported models on OpenVINO (Intel CPUs and iGPUs)
+# Exports are cached next to the source weights and redone only when the weights are newer.
+# INT8 models are calibrated on the frames labelled in Annotation/.
+
+BACKENDS = ("torch", "onnxruntime", "openvino")
+REID_MODEL_NAME = "osnet_x1_0"
+REID_INPUT_SIZE = (256, 128)  # Height, width, as BatchFeatureExtractor feeds it
+YOLO_INPUT_SIZE = 640
+CALIBRATION_SAMPLES = 200
+
+
+def cuda_available():
+    import torch
+    return torch.cuda.is_available()
+
+
+def available_backends():
+    backends = ["torch"]
+    if ort is not None:
+        backends.append("onnxruntime")
+    if ov is not None:
+        backends.append("openvino")
+    return backends
+
+
+def select_backend(preferred="auto"):
+    """torch on a CUDA GPU, else OpenVINO on Intel hardware, else ONNX Runtime, else torch on the CPU"""
+    if preferred != "auto":
+        if preferred not in available_backends():
+            raise ValueError(f"Inference backend {preferred} is not installed, available: {available_backends()}")
+        return preferred
+
+    if cuda_available():
+        return "torch"
+    if ov is not None:
+        core = ov.Core()
+        if "GPU" in core.available_devices or "Intel" in core.get_property("CPU", "FULL_DEVICE_NAME"):
+            return "openvino"
+    if ort is not None:
+        return "onnxruntime"
+    return "torch"
+
+
+def is_stale(path, source):
+    return not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(source)
+
+
+def labelled_frames(image_dirs, annotations, limit=CALIBRATION_SAMPLES):
+    """(image, [(x1, y1, x2, y2), ...]) for the images that have a YOLO label file in `annotations`"""
+    labels = {os.path.splitext(name)[0]: os.path.join(annotations, name)
+              for name in os.listdir(annotations) if name.endswith(".txt") and name != "classes.txt"}
+    paths = []
+    for image_dir in image_dirs:
+        paths += [path for path in glob.glob(os.path.join(image_dir, "**", "*"), recursive=True)
+                  if os.path.splitext(os.path.basename(path))[0] in labels and path.lower().endswith((".jpg", ".jpeg", ".png", ".bmp"))]
+
+    for path in sorted(paths)[:limit]:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        height, width = image.shape[:2]
+        boxes = []
+        with open(labels[os.path.splitext(os.path.basename(path))[0]], "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 5 and parts[0] == "0":  # Class 0: human
+                    cx, cy, w, h = (float(value) for value in parts[1:])
+                    boxes.append((int((cx - w / 2) * width), int((cy - h / 2) * height),
+                                  int((cx + w / 2) * width), int((cy + h / 2) * height)))
+        yield image, boxes
+
+
+def calibration_samples(calibration_images, annotations, preprocess):
+    """NCHW float32 calibration samples, `preprocess(image, boxes)` -> list of samples of one labelled frame.
+
+    The samples are produced lazily (at most CALIBRATION_SAMPLES), but a missing
+    annotations folder or no sample at all raises straight away.
+    """
+    if annotations is None or not os.path.isdir(annotations):
+        raise FileNotFoundError(f"INT8 calibration needs the labelled frames, annotations folder {annotations} not found")
+    samples = itertools.islice((sample for image, boxes in labelled_frames(calibration_images, annotations)
+                                for sample in preprocess(image, boxes)), CALIBRATION_SAMPLES)
+    first = next(samples, None)
+    if first is None:
+        raise ValueError(f"No INT8 calibration samples: no image in {list(calibration_images)} "
+                         f"has a labelled person in annotations folder {annotations}")
+    return itertools.chain([first], samples)
+
+
+def reid_samples(image, boxes):
+    crops = [image[max(y1, 0):y2, max(x1, 0):x2] for x1, y1, x2, y2 in boxes]
+    return [preprocess_crops([crop], REID_INPUT_SIZE) for crop in crops if crop.size != 0]
+
+
+def letterbox(image, size=YOLO_INPUT_SIZE):
+    # Same preprocessing as ultralytics: keep the aspect ratio, pad with grey, RGB, 0..1
+    height, width = image.shape[:2]
+    scale = size / max(height, width)
+    resized = cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    top, left = (size - resized.shape[0]) // 2, (size - resized.shape[1]) // 2
+    canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    return (canvas[:, :, ::-1].transpose(2, 0, 1)[None] / 255.0).astype(np.float32)
+
+
+def quantize_onnx(model_path, output_path, samples):
+    """Static INT8 quantization of an ONNX model, calibrated on `samples` (NCHW float32 arrays)"""
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    input_name = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self.samples = iter(samples)
+
+        def get_next(self):
+            sample = next(self.samples, None)
+            return None if sample is None else {input_name: sample}
+
+    quantize_static(model_path, output_path, Reader(), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    return output_path
+
+
+class OnnxRuntimeModel:
+    """ONNX model called on NCHW float32 arrays, on the best execution provider ONNX Runtime has here.
+
+    With a `cache_dir` the graph optimized for this machine is saved there, later
+    runs load it as is instead of optimizing the model again.
+    """
+
+    def __init__(self, path, cache_dir=None):
+        providers = [provider for provider in ("CUDAExecutionProvider", "CPUExecutionProvider")
+                     if provider in ort.get_available_providers()]
+        options = ort.SessionOptions()
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            name = os.path.splitext(os.path.basename(path))[0]
+            optimized_path = os.path.join(cache_dir, f"{name}_{providers[0].replace('ExecutionProvider', '').lower()}.onnx")
+            if is_stale(optimized_path, path):
+                options.optimized_model_filepath = optimized_path
+            else:
+                path = optimized_path
+                options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVinoModel:
+    """OpenVINO model (.onnx or .xml) called on NCHW float32 arrays.
+
+    With a `cache_dir` OpenVINO keeps the compiled blob there (CACHE_DIR), later
+    runs import it instead of compiling the model again.
+    """
+
+    def __init__(self, path, device="AUTO", cache_dir=None):
+        core = ov.Core()
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            core.set_property({"CACHE_DIR": cache_dir})
+        self.compiled = core.compile_model(path, device)
+
+    def __call__(self, batch):
+        return self.compiled(batch)[0]
+
+
+def load_detector(weights, backend, int8=False, calibration_data=None, calibration_images=(), annotations=None):
+    """YOLO model for `backend`, exported from the PyTorch weights on first use.
+
+    ultralytics runs the exported .onnx file or *_openvino_model folder with the
+    same predict API and results as the .pt weights. OpenVINO INT8 is calibrated
+    by ultralytics on `calibration_data` (a dataset yaml), ONNX INT8 on the
+    labelled frames of `calibration_images`.
+    """
+    from ultralytics import YOLO
+
+    if backend == "torch":
+        return YOLO(weights)
+
+    root = os.path.splitext(weights)[0]
+    if backend == "openvino":
+        path = f"{root}_int8_openvino_model" if int8 else f"{root}_openvino_model"
+        if is_stale(path, weights):
+            print(f"Exporting {weights} to OpenVINO{' INT8' if int8 else ''}...")
+            path = YOLO(weights).export(format="openvino", int8=int8, data=calibration_data, imgsz=YOLO_INPUT_SIZE, dynamic=True)
+        return YOLO(path, task="detect")
+
+    path = f"{root}.onnx"
+    if is_stale(path, weights):
+        print(f"Exporting {weights} to ONNX...")
+        path = YOLO(weights).export(format="onnx", imgsz=YOLO_INPUT_SIZE, dynamic=True)
+    if int8:
+        quantized_path = f"{root}_int8.onnx"
+        if is_stale(quantized_path, path):
+            print(f"Quantizing {path} to INT8...")
+            samples = calibration_samples(calibration_images, annotations, lambda image, _: [letterbox(image)])
+            quantize_onnx(path, quantized_path, samples)
+        path = quantized_path
+    return YOLO(path, task="detect")
+
+
+def load_reid_model(backend, device, cache_dir, int8=False, calibration_images=(), annotations=None):
+    """OSNet for BatchFeatureExtractor: a torchreid FeatureExtractor, or the exported model for `backend`"""
+    from torchreid.reid.utils import FeatureExtractor
+
+    if backend == "torch":
+        return FeatureExtractor(model_name=REID_MODEL_NAME, model_path=None, device=str(device))  # Pretrained weights
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{REID_MODEL_NAME}.onnx")
+    if not os.path.exists(path):
+        import torch
+        print(f"Exporting {REID_MODEL_NAME} to ONNX...")
+        extractor = FeatureExtractor(model_name=REID_MODEL_NAME, model_path=None, device="cpu")
+        torch.onnx.export(extractor.model, torch.zeros(1, 3, *REID_INPUT_SIZE), path, input_names=["images"],
+                          output_names=["features"], dynamic_axes={"images": {0: "batch"}, "features": {0: "batch"}},
+                          opset_version=17)
+
+    if int8:
+        # Calibrated on the labelled people of Annotation/, only when the quantized model is not cached yet
+        if backend == "openvino":
+            quantized_path = os.path.join(cache_dir, f"{REID_MODEL_NAME}_int8.xml")
+            if not os.path.exists(quantized_path):
+                import nncf
+                print(f"Quantizing {REID_MODEL_NAME} to INT8 with NNCF...")
+                samples = list(calibration_samples(calibration_images, annotations, reid_samples))
+                quantized = nncf.quantize(ov.Core().read_model(path), nncf.Dataset(samples))
+                ov.save_model(quantized, quantized_path)
+        else:
+            quantized_path = os.path.join(cache_dir, f"{REID_MODEL_NAME}_int8.onnx")
+            if not os.path.exists(quantized_path):
+                print(f"Quantizing {REID_MODEL_NAME} to INT8...")
+                quantize_onnx(path, quantized_path, calibration_samples(calibration_images, annotations, reid_samples))
+        path = quantized_path
+
+    compiled_dir = os.path.join(cache_dir, "compiled")
+    return OpenVinoModel(path, cache_dir=compiled_dir) if backend == "openvino" else OnnxRuntimeModel(path, cache_dir=compiled_dir)
@@ -0,0 +1,171 @@
+import json
+import threading
+import time
+import cv2
+from engines.pipeline import LatestQueue, PipelineStats
+from engines.schedule import Prediction
+
+
+def load_camera_config(config_path):
+    """Read the camera registry, a JSON list of {"cam_id", "source", "frame_size", "zones"} entries.
+
+    "zones" is optional: a list of {"name", "polygon": [[x, y], ...], "color": [b, g, r]}
+    in frame_size pixel coordinates, earlier zones win where they overlap.
+    "detection_interval" is optional too: [min, max] frames between YOLO runs.
+    """
+    with open(config_path, "r") as f:
+        cameras = json.load(f)
+
+    for camera in cameras:
+        camera.setdefault("frame_size", [1280, 960])
+    return cameras
+
+
+class Camera:
+    """One capture source with its own DeepSort tracker and frame queues.
+
+    capture thread -> frames -> (shared BatchDetector) -> detected -> analytics thread -> processed
+    Nothing reaches `processed` when `analyze` returns None (headless analytics).
+    """
+
+    def __init__(self, cam_id, source, tracker, frame_size=(1280, 960), scheduler=None):
+        self.cam_id = cam_id
+        self.source = source
+        self.tracker = tracker
+        self.frame_size = frame_size
+        self.scheduler = scheduler  # DetectionScheduler, None runs YOLO on every frame
+
+        self.frames = LatestQueue(maxsize=1)  # Newest (frame, capture time, frame index), waiting for detection
+        self.detected = LatestQueue(maxsize=1)  # Newest (frame, YOLO result or Prediction, capture time), waiting for tracking / analytics
+        self.processed = LatestQueue(maxsize=1)  # Newest analyzed frame and its overlay, waiting to be sent
+        self.stats = PipelineStats()
+        self.stats.watch_queue("capture", self.frames)
+        self.stats.watch_queue("detection", self.detected)
+        self.stats.watch_queue("analytics", self.processed)
+
+        self.stop_event = threading.Event()
+        self._threads = []
+
+    def start(self, analyze, on_frame=None):
+        """Start capturing, `analyze(frame, result, camera, timestamp)` returns what to queue for viewers, or None"""
+        cap = cv2.VideoCapture(self.source)
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.frame_size[0]) #Set the reslution of the camera
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.frame_size[1])
+
+        self._threads = [
+            threading.Thread(target=self._capture_loop, args=(cap, on_frame), daemon=True),
+            threading.Thread(target=self._analytics_loop, args=(analyze,), daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.frames.close()
+        self.detected.close()
+        for thread in self._threads:
+            thread.join()
+
+    def _capture_loop(self, cap, on_frame):
+        frame_index = 0  # Counts every captured frame, including the ones dropped before detection
+        while not self.stop_event.is_set() and cap.isOpened():
+            start_time = time.perf_counter()
+            ret, frame = cap.read()
+
+            if not ret or frame is None:
+                print(f"[Camera {self.cam_id}] Failed to grab frame")
+                break
+
+            captured_at = time.perf_counter()
+            self.stats.record("capture", captured_at - start_time)
+            frame_index += 1
+            self.frames.put((frame, captured_at, frame_index))
+            if on_frame is not None:
+                on_frame()
+        cap.release()
+        self.frames.close()
+
+    def _analytics_loop(self, analyze):
+        while not self.stop_event.is_set():
+            item = self.detected.get(timeout=1.0)
+            if item is None:
+                if self.detected.closed:
+                    break
+                continue
+
+            frame, result, captured_at = item
+            start_time = time.perf_counter()
+            try:
+                output = analyze(frame, result, self, captured_at)
+            except Exception as e:
+                print(f"[Camera {self.cam_id}] Error processing frame: {e}")
+                continue
+            self.stats.record("analytics", time.perf_counter() - start_time)
+            if output is not None:
+                self.processed.put(output)
+        self.processed.close()
+
+
+def is_prediction(item):
+    return isinstance(item[1], Prediction)
+
+
+class BatchDetector:
+    """Runs one shared YOLO model over the newest frame of every camera as a single batch.
+
+    Cameras with a DetectionScheduler only join the batch on frames it picks,
+    their other frames go straight on with a Prediction instead of a result.
+    """
+
+    def __init__(self, model, cameras, conf):
+        self.model = model
+        self.cameras = cameras
+        self.conf = conf
+        self.frame_ready = threading.Event()  # Set by the capture threads
+        self.stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.frame_ready.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            if not self.frame_ready.wait(timeout=1.0):
+                continue
+            self.frame_ready.clear()
+
+            batch = []
+            for camera in self.cameras:
+                item = camera.frames.get(timeout=0)
+                if item is None:
+                    continue
+                frame, captured_at, frame_index = item
+                if camera.scheduler is not None and not camera.scheduler.should_detect(frame, captured_at, frame_index):
+                    # Tracked by Kalman prediction only. A prediction never displaces a YOLO result the analytics
+                    # thread has not picked up yet, DeepSort must see every detection the scheduler counted.
+                    camera.detected.put((frame, camera.scheduler.prediction(), captured_at), replaceable=is_prediction)
+                    continue
+                batch.append((camera, frame, captured_at))
+            if not batch:
+                continue
+
+            start_time = time.perf_counter()
+            try:
+                results = self.model([frame for _, frame, _ in batch], conf=self.conf)  # Threshold for confidence score for human detection
+            except Exception as e:
+                print(f"Error in batched detection: {e}")
+                continue
+            elapsed = time.perf_counter() - start_time
+
+            for (camera, frame, captured_at), result in zip(batch, results):
+                camera.stats.record("detection", elapsed)
+                if camera.scheduler is not None:
+                    camera.scheduler.record_detection(elapsed)
+                camera.detected.put((frame, result, captured_at))
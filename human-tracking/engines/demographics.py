@@ -0,0 +1,99 @@
+import threading
+import time
+from engines.pipeline import LatestQueue
+
+
+class DemographicsPool:
+    """Worker threads that estimate age / gender off the frame loop.
+
+    A job is one frame with the (track_id, person box) pairs due for a sample.
+    The job queue keeps only the newest `max_pending` jobs: when the workers
+    fall behind, the oldest job is dropped, so submit() never blocks a camera.
+    Requests of tracks that `wanted(track_id)` rejects by the time a worker picks
+    them up (enough votes already, or evicted) are skipped. Every face found is
+    passed to `on_result(track_id, face)`.
+
+    cv2.dnn networks must not be shared between threads, so every worker gets
+    its own analyzer from `create_analyzer()`.
+    """
+
+    def __init__(self, create_analyzer, wanted, on_result, workers=1, max_pending=4):
+        self.create_analyzer = create_analyzer
+        self.wanted = wanted
+        self.on_result = on_result
+        self.workers = workers
+        self.max_pending = max_pending
+        self.jobs = LatestQueue(maxsize=max_pending)
+        self.submitted = 0
+        self.skipped = 0
+        self.analyzed = 0
+        self.found = 0
+        self._dropped = 0  # Jobs dropped by the queues of earlier start() / stop() rounds
+        self._lock = threading.Lock()  # Guards the counters, updated by the camera and worker threads
+        self._threads = []
+
+    def start(self):
+        if self._threads:
+            return
+        if self.jobs.closed:
+            # stop() closed the queue for good, a new round (e.g. the next replay) needs a fresh one
+            self._dropped += self.jobs.dropped
+            self.jobs = LatestQueue(maxsize=self.max_pending)
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._run, args=(self.create_analyzer(),), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """Finish the queued jobs and stop the workers"""
+        self.jobs.close()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, frame, requests, stats=None):
+        # The frame is only read by the workers, the camera hands a new array to every frame
+        self.jobs.put((frame, requests, stats))
+        with self._lock:
+            self.submitted += len(requests)
+
+    def stats(self):
+        return {
+            "submitted": self.submitted,
+            "dropped_jobs": self._dropped + self.jobs.dropped,
+            "skipped": self.skipped,
+            "analyzed": self.analyzed,
+            "found": self.found,
+        }
+
+    def _run(self, analyzer):
+        while True:
+            job = self.jobs.get(timeout=1.0)
+            if job is None:
+                if self.jobs.closed:
+                    break
+                continue
+
+            frame, requests, stats = job
+            due = [(track_id, box) for track_id, box in requests if self.wanted(track_id)]
+            with self._lock:
+                self.skipped += len(requests) - len(due)
+            if not due:
+                continue
+
+            start_time = time.perf_counter()
+            try:
+                faces = analyzer.analyze(frame, [box for _, box in due])
+            except Exception as e:
+                print(f"Error in face analysis: {e}")
+                continue
+            found = 0
+            for (track_id, _), face in zip(due, faces):
+                if face is not None:
+                    self.on_result(track_id, face)
+                    found += 1
+            with self._lock:
+                self.analyzed += len(due)
+                self.found += found
+            if stats is not None:
+                stats.record("face", time.perf_counter() - start_time)
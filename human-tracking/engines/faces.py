@@ -0,0 +1,115 @@
+import cv2
+
+AGE_LIST = ['(0-2)', '(4-6)', '(8-12)', '(15-20)', '(25-32)', '(38-43)', '(48-53)', '(60-100)']
+GENDER_LIST = ['Male', 'Female']
+ATTRIBUTE_MEAN = (78.4263377603, 87.7689143744, 114.895847746)  # Mean BGR of the Caffe age / gender training set
+ATTRIBUTE_INPUT_SIZE = (227, 227)
+
+
+class HaarFaceDetector:
+    """OpenCV's frontal face Haar cascade, one crop at a time"""
+
+    def __init__(self, cascade_path=None, scale_factor=1.1, min_neighbors=5, min_size=(30, 30)):
+        self.cascade = cv2.CascadeClassifier(cascade_path or cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    def detect(self, crops):
+        """Face boxes (x, y, w, h) inside each crop"""
+        return [
+            [tuple(map(int, face)) for face in self.cascade.detectMultiScale(
+                cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY),
+                scaleFactor=self.scale_factor,
+                minNeighbors=self.min_neighbors,
+                minSize=self.min_size,
+            )]
+            for crop in crops
+        ]
+
+
+class DnnFaceDetector:
+    """OpenCV's ResNet-10 SSD face detector (res10_300x300_ssd), every crop of a frame in one forward pass"""
+
+    def __init__(self, prototxt_path, model_path, confidence=0.5, input_size=(300, 300)):
+        self.net = cv2.dnn.readNetFromCaffe(prototxt_path, model_path)
+        self.confidence = confidence
+        self.input_size = input_size
+
+    def detect(self, crops):
+        faces = [[] for _ in crops]
+        if not crops:
+            return faces
+
+        blob = cv2.dnn.blobFromImages(crops, 1.0, self.input_size, (104.0, 177.0, 123.0), swapRB=False)
+        self.net.setInput(blob)
+        # Rows of (image index, class, confidence, x1, y1, x2, y2), coordinates relative to the crop
+        for image_id, _, confidence, x1, y1, x2, y2 in self.net.forward()[0, 0]:
+            if confidence < self.confidence:
+                continue
+            height, width = crops[int(image_id)].shape[:2]
+            x1, y1 = int(max(x1, 0) * width), int(max(y1, 0) * height)
+            x2, y2 = int(min(x2, 1) * width), int(min(y2, 1) * height)
+            if x2 > x1 and y2 > y1:
+                faces[int(image_id)].append((x1, y1, x2 - x1, y2 - y1))
+        return faces
+
+
+class FaceAttributeAnalyzer:
+    """Age and gender of the people in a frame, with as few DNN calls as possible.
+
+    Faces are only searched for in the upper part of each person box, and
+    the largest face of each person is kept. All kept faces of the frame then
+    go through the age and gender networks as one blob batch per network.
+    """
+
+    def __init__(self, age_net, gender_net, detector, upper_body=0.5, min_crop_size=100, max_batch_size=32):
+        self.age_net = age_net
+        self.gender_net = gender_net
+        self.detector = detector  # HaarFaceDetector or DnnFaceDetector
+        self.upper_body = upper_body  # Fraction of the person box, from the top, where faces are searched
+        self.min_crop_size = min_crop_size  # Smaller crops are upscaled so the detector can find a face in them
+        self.max_batch_size = max_batch_size
+
+    def _upper_body_crops(self, frame, boxes):
+        crops, origins = [], []  # origins: (box index, x1, y1, scale) to map faces back to frame coordinates
+        for i, (x1, y1, x2, y2) in enumerate(boxes):
+            x1, y1 = max(int(x1), 0), max(int(y1), 0)
+            crop = frame[y1:y1 + int((int(y2) - y1) * self.upper_body), x1:int(x2)]
+            if crop.size == 0:
+                continue
+            scale = max(1.0, self.min_crop_size / min(crop.shape[:2]))
+            if scale > 1.0:
+                crop = cv2.resize(crop, None, fx=scale, fy=scale)
+            crops.append(crop)
+            origins.append((i, x1, y1, scale))
+        return crops, origins
+
+    def analyze(self, frame, boxes):
+        """{'bbox', 'age', 'gender'} or None for each (x1, y1, x2, y2) person box"""
+        results = [None] * len(boxes)
+        crops, origins = self._upper_body_crops(frame, boxes)
+
+        face_crops, faces = [], []
+        for (i, x1, y1, scale), found in zip(origins, self.detector.detect(crops)):
+            if not found:
+                continue
+            fx, fy, fw, fh = max(found, key=lambda face: face[2] * face[3])
+            face_x1, face_y1 = x1 + int(fx / scale), y1 + int(fy / scale)
+            face_x2, face_y2 = face_x1 + int(fw / scale), face_y1 + int(fh / scale)
+            face_crop = frame[face_y1:face_y2, face_x1:face_x2]
+            if face_crop.size > 0:
+                face_crops.append(face_crop)
+                faces.append((i, (face_x1, face_y1, face_x2, face_y2)))
+
+        for start in range(0, len(face_crops), self.max_batch_size):
+            blob = cv2.dnn.blobFromImages(face_crops[start:start + self.max_batch_size], 1.0, ATTRIBUTE_INPUT_SIZE,
+                                          ATTRIBUTE_MEAN, swapRB=False)
+            self.age_net.setInput(blob)
+            ages = self.age_net.forward().argmax(axis=1)
+            self.gender_net.setInput(blob)
+            genders = self.gender_net.forward().argmax(axis=1)
+
+            for (i, bbox), age, gender in zip(faces[start:start + self.max_batch_size], ages, genders):
+                results[i] = {'bbox': bbox, 'age': AGE_LIST[age], 'gender': GENDER_LIST[gender]}
+        return results
@@ -0,0 +1,118 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+# inotify event masks (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class InotifyWatcher:
+    """Minimal inotify wrapper through libc (Linux only, no extra dependency).
+
+    Reports completed writes (close after write, rename into place) and new
+    sub-folders of the watched folders as (path, mask) tuples.
+    """
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._paths = {}  # Format: {watch descriptor: folder}
+        self._watched = set()
+
+    def add_watch(self, folder):
+        folder = os.path.abspath(folder)
+        if folder in self._watched:
+            return
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(folder), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {folder}")
+        self._paths[wd] = folder
+        self._watched.add(folder)
+
+    def read_events(self, timeout):
+        """Block up to `timeout` seconds, returns the events that arrived"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += _EVENT_HEADER.size + length
+            folder = self._paths.get(wd, "")
+            events.append((os.path.join(folder, os.fsdecode(name)) if name else folder, mask))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Fallback for platforms without inotify: stats the watched folders every `interval` seconds"""
+
+    def __init__(self, interval=30):
+        self.interval = interval
+        self._folders = set()
+        self._seen = {}  # Format: {path: (size, mtime)}
+        self._last_scan = 0
+
+    def add_watch(self, folder):
+        folder = os.path.abspath(folder)
+        if folder not in self._folders:
+            self._folders.add(folder)
+            self._scan(report=False)
+
+    def _scan(self, report=True):
+        events = []
+        for folder in list(self._folders):
+            if not os.path.isdir(folder):
+                continue
+            for entry in os.scandir(folder):
+                stat = entry.stat()
+                signature = (stat.st_size, stat.st_mtime)
+                if self._seen.get(entry.path) != signature:
+                    self._seen[entry.path] = signature
+                    if report:
+                        events.append((entry.path, IN_CREATE | IN_ISDIR if entry.is_dir() else IN_CLOSE_WRITE))
+        self._last_scan = time.time()
+        return events
+
+    def read_events(self, timeout):
+        wait = max(0.0, min(timeout, self._last_scan + self.interval - time.time()))
+        time.sleep(wait)
+        if time.time() - self._last_scan < self.interval:
+            return []
+        return self._scan()
+
+    def close(self):
+        pass
+
+
+def create_watcher(poll_interval=30):
+    """inotify on Linux, polling everywhere else (or if inotify is unavailable)"""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher()
+        except (OSError, AttributeError) as e:
+            print(f"⚠️  inotify unavailable ({e}), falling back to polling every {poll_interval}s")
+    return PollingWatcher(poll_interval)
@@ -0,0 +1,211 @@
+import threading
+import time
+import numpy as np
+
+
+def l2_normalize(embeddings):
+    """Return a float32 (N, D) copy of the embeddings scaled to unit length"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if embeddings.ndim == 1:
+        embeddings = embeddings[None, :]
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+
+class EmbeddingGallery:
+    """Global re-ID gallery that keeps every stored embedding in one contiguous matrix.
+
+    Rows are L2-normalized on insert, so the cosine distance between a query and
+    every stored identity is a single matrix product: 1 - Q @ G.T
+    """
+
+    def __init__(self, threshold=0.25, dim=None, initial_capacity=1024, ttl=None, max_size=None):
+        self.threshold = threshold  # Cosine distance threshold (lower = more similar)
+        self.dim = dim
+        self.ttl = ttl  # Seconds an identity is kept after it was last matched (None = forever)
+        self.max_size = max_size  # Maximum stored identities, least recently seen go first
+        self.evicted_count = 0
+        self.cross_camera_matches = 0  # Identities re-found by a camera other than the ones that saw them before
+        self.lock = threading.Lock()  # To ensure only one thread accesses the embeddings at a time
+
+        self._capacity = initial_capacity
+        self._size = 0
+        self._matrix = None  # Allocated on first insert once the embedding size is known
+        self._ids = []  # Row -> identity
+        self._rows = {}  # Identity -> row
+        self._cam_ids = []  # Row -> set of cameras that have seen the identity
+        self._last_seen = np.zeros(initial_capacity, dtype=np.float64)
+
+        if dim is not None:
+            self._matrix = np.zeros((initial_capacity, dim), dtype=np.float32)
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, identity):
+        return identity in self._rows
+
+    def cameras_for(self, identity):
+        """Cameras that have seen an identity"""
+        with self.lock:
+            row = self._rows.get(identity)
+            return set(self._cam_ids[row]) if row is not None else set()
+
+    def _grow(self):
+        self._capacity *= 2
+        matrix = np.zeros((self._capacity, self.dim), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        self._matrix = matrix
+
+        last_seen = np.zeros(self._capacity, dtype=np.float64)
+        last_seen[:self._size] = self._last_seen[:self._size]
+        self._last_seen = last_seen
+
+    def _add(self, identity, embedding, cam_id, timestamp):
+        if self._matrix is None:
+            self.dim = embedding.shape[-1]
+            self._matrix = np.zeros((self._capacity, self.dim), dtype=np.float32)
+        if self._size == self._capacity:
+            self._grow()
+
+        row = self._size
+        self._matrix[row] = embedding
+        self._last_seen[row] = timestamp
+        self._ids.append(identity)
+        self._cam_ids.append({cam_id})
+        self._rows[identity] = row
+        self._size += 1
+
+    def _match(self, queries):
+        if self._size == 0:
+            return None, np.full(len(queries), -1), np.full(len(queries), np.inf)
+
+        similarities = queries @ self._matrix[:self._size].T  # (queries, stored)
+        best_rows = similarities.argmax(axis=1)
+        best_distances = 1.0 - similarities[np.arange(len(queries)), best_rows]
+        return similarities, best_rows, best_distances
+
+    def _assign(self, similarities, best_rows, best_distances):
+        # One-to-one assignment within a batch: two people in the same frame can't be the same identity.
+        # Most confident queries pick first, the others fall back to their next best free identity.
+        rows = best_rows.copy()
+        distances = best_distances.copy()
+        taken = set()
+        for query in np.argsort(best_distances):
+            if distances[query] >= self.threshold:
+                continue
+            if rows[query] in taken:
+                rows[query], distances[query] = -1, np.inf
+                for row in np.argsort(-similarities[query])[:len(taken) + 1]:
+                    if row not in taken and 1.0 - similarities[query, row] < self.threshold:
+                        rows[query], distances[query] = row, 1.0 - similarities[query, row]
+                        break
+            if rows[query] >= 0:
+                taken.add(rows[query])
+        return rows, distances
+
+    def add(self, identity, embedding, cam_id=None, timestamp=None):
+        """Store a new identity, or overwrite the embedding of an existing one"""
+        embedding = l2_normalize(embedding)[0]
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock:
+            row = self._rows.get(identity)
+            if row is None:
+                self._add(identity, embedding, cam_id, timestamp)
+            else:
+                self._matrix[row] = embedding
+                self._last_seen[row] = timestamp
+
+    def match(self, embeddings):
+        """Top-1 lookup for a batch of embeddings.
+
+        Returns a list of (identity, distance) per query. The identity is None
+        when the closest stored embedding is not under the threshold.
+        """
+        queries = l2_normalize(embeddings)
+        with self.lock:
+            _, best_rows, best_distances = self._match(queries)
+            ids = list(self._ids)
+
+        results = []
+        for row, distance in zip(best_rows, best_distances):
+            if row >= 0 and distance < self.threshold:
+                results.append((ids[row], float(distance)))
+            else:
+                results.append((None, float(distance)))
+        return results
+
+    def match_or_add(self, track_ids, embeddings, cam_id=None):
+        """Resolve every track of a frame against the gallery in one batched search.
+
+        Tracks that match a stored identity are renamed to it, the rest are
+        added as new identities under their own track ID. Each identity is
+        given to at most one track of the batch, and identities first stored
+        by another camera are shared, so a shopper walking between cameras
+        keeps one ID. Returns the resolved IDs and the number of identities
+        that were added.
+        """
+        if len(track_ids) == 0:
+            return [], 0
+
+        queries = l2_normalize(embeddings)
+        now = time.time()
+        resolved = []
+        added = 0
+        with self.lock:
+            similarities, best_rows, best_distances = self._match(queries)
+            if similarities is not None and len(queries) > 1:
+                best_rows, best_distances = self._assign(similarities, best_rows, best_distances)
+            for track_id, query, row, distance in zip(track_ids, queries, best_rows, best_distances):
+                if row >= 0 and distance < self.threshold:
+                    self._last_seen[row] = now
+                    if cam_id not in self._cam_ids[row]:
+                        self._cam_ids[row].add(cam_id)
+                        self.cross_camera_matches += 1
+                    resolved.append(self._ids[row])
+                elif track_id in self._rows:
+                    # Same track drifted away from its stored appearance, refresh it
+                    row = self._rows[track_id]
+                    self._matrix[row] = query
+                    self._last_seen[row] = now
+                    resolved.append(track_id)
+                else:
+                    self._add(track_id, query, cam_id, now)
+                    resolved.append(track_id)
+                    added += 1
+        return resolved, added
+
+    def evict(self, now=None):
+        """Drop identities older than the TTL and the least recently seen ones over max_size.
+
+        Surviving rows are compacted to the front of the matrix so it stays contiguous.
+        Returns the evicted identities.
+        """
+        if self.ttl is None and self.max_size is None:
+            return []
+
+        now = time.time() if now is None else now
+        with self.lock:
+            last_seen = self._last_seen[:self._size]
+            keep = np.ones(self._size, dtype=bool)
+            if self.ttl is not None:
+                keep &= (now - last_seen) <= self.ttl
+            if self.max_size is not None and keep.sum() > self.max_size:
+                kept_rows = np.flatnonzero(keep)
+                oldest = kept_rows[np.argsort(last_seen[kept_rows])[:len(kept_rows) - self.max_size]]
+                keep[oldest] = False
+            if keep.all():
+                return []
+
+            kept_rows = np.flatnonzero(keep)
+            evicted = [self._ids[row] for row in np.flatnonzero(~keep)]
+            size = len(kept_rows)
+            self._matrix[:size] = self._matrix[kept_rows]
+            self._last_seen[:size] = self._last_seen[kept_rows]
+            self._ids = [self._ids[row] for row in kept_rows]
+            self._cam_ids = [self._cam_ids[row] for row in kept_rows]
+            self._rows = {identity: row for row, identity in enumerate(self._ids)}
+            self._size = size
+            self.evicted_count += len(evicted)
+        return evicted
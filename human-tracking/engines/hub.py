@@ -0,0 +1,38 @@
+import asyncio
+
+
+class FrameHub:
+    """Fans the newest encoded frame of one camera out to every connected viewer.
+
+    Each viewer gets a one-slot queue. publish() replaces a frame the viewer has
+    not picked up yet, so a slow client only skips frames and never blocks the
+    producer or the other viewers. Must be used from the event loop thread.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self.latest = None
+        self.published = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=1)
+        if self.latest is not None:
+            queue.put_nowait(self.latest)  # New viewers see the current frame straight away
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, frame):
+        self.latest = frame
+        self.published += 1
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(frame)
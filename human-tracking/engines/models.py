@@ -0,0 +1,91 @@
+import os
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+PACKAGE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # human-tracking/
+
+
+def package_path(*parts):
+    """Absolute path of a file inside human-tracking/, whatever the working directory is"""
+    return os.path.join(PACKAGE_DIR, *parts)
+
+
+def load_parameters(path, defaults):
+    """{name: float} of the `defaults` keys found in a flat XML parameter file.
+
+    Files whose closing tags do not match their opening ones (as parameter.xml
+    used to be) are read tag by tag instead of failing. Missing or unreadable
+    values keep their default.
+    """
+    parameters = dict(defaults)
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    try:
+        values = {element.tag: element.text for element in ET.fromstring(text)}
+    except ET.ParseError as e:
+        print(f"{path} is not well-formed ({e}), reading its values tag by tag")
+        values = dict(re.findall(r"<(\w+)>\s*([^<]*?)\s*</", text))
+
+    for name in parameters:
+        try:
+            parameters[name] = float(values[name])
+        except (KeyError, TypeError, ValueError):
+            print(f"{name} missing from {path}, using {parameters[name]}")
+    return parameters
+
+
+class ModelRegistry:
+    """Models loaded on first use, or all at once with warm_up().
+
+    Every model is registered as a name and a loader. get() runs the loader once
+    and keeps the result, concurrent callers of the same model wait for the first
+    one. Loaders may get() other models, e.g. the inference backend they share.
+    """
+
+    def __init__(self):
+        self.loaders = {}
+        self.models = {}
+        self.load_times = {}  # Format: {name: seconds}, loaders that get() others include their time
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, loader):
+        with self._lock:
+            self.loaders[name] = loader
+            self._locks[name] = threading.Lock()
+            self.models.pop(name, None)
+
+    def loaded(self, name):
+        return name in self.models
+
+    def get(self, name):
+        if name in self.models:
+            return self.models[name]
+        with self._locks[name]:
+            if name not in self.models:
+                start_time = time.perf_counter()
+                model = self.loaders[name]()
+                self.load_times[name] = time.perf_counter() - start_time
+                self.models[name] = model
+        return self.models[name]
+
+    def warm_up(self, names=None, workers=None):
+        """Load `names` (default: every model) in parallel threads, returns the wall time in seconds"""
+        names = [name for name in (names if names is not None else self.loaders) if name not in self.models]
+        start_time = time.perf_counter()
+        if names:
+            with ThreadPoolExecutor(max_workers=workers or len(names), thread_name_prefix="model-load") as pool:
+                for _ in pool.map(self.get, names):
+                    pass
+        return time.perf_counter() - start_time
+
+    def report(self):
+        return {name: round(seconds, 3) for name, seconds in sorted(self.load_times.items(), key=lambda item: -item[1])}
+
+    def print_report(self, wall_time=None):
+        print("Model load times: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.report().items())
+              + (f" ({wall_time:.2f}s wall)" if wall_time is not None else ""))
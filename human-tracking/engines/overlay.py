@@ -0,0 +1,52 @@
+import cv2
+
+DETECTION_COLOR = (56, 56, 255)  # Same red ultralytics' plot() used for class 0
+TRACK_COLOR = (255, 255, 0)
+LABEL_COLOR = (255, 0, 0)
+FACE_COLOR = (255, 0, 255)
+
+
+class FrameOverlay:
+    """What the analytics found on one frame, kept as plain values.
+
+    The analytics threads only fill this in, render() draws it onto a copy of the
+    frame when the frame is actually going to a viewer.
+    """
+
+    def __init__(self):
+        self.people_count = 0  # Size of the re-ID gallery
+        self.detections = []  # (x1, y1, x2, y2, confidence) of every YOLO detection
+        self.predicted = []  # (track_id, x1, y1, x2, y2) of tracks moved by Kalman prediction on skipped frames
+        self.tracks = []  # (track_id, x1, y1, center, zone, duration), duration None when not in a zone yet
+        self.faces = []  # ((x1, y1, x2, y2), label)
+
+
+def render(frame, overlay, zone_map):
+    """Annotated copy of `frame`: the cached zone layer, then the detections, tracks and faces"""
+    annotated = frame.copy()
+    zone_map.draw(annotated)
+
+    for x1, y1, x2, y2, confidence in overlay.detections:
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), DETECTION_COLOR, 2)
+        cv2.putText(annotated, f"human {confidence:.2f}", (x1, max(y1 - 5, 10)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, DETECTION_COLOR, 2)
+    for track_id, x1, y1, x2, y2 in overlay.predicted:
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), TRACK_COLOR, 2)
+        cv2.circle(annotated, ((x1 + x2) // 2, (y1 + y2) // 2), 5, TRACK_COLOR, -1)
+        cv2.putText(annotated, f"ID: {track_id}", (x1 + 50, y1 - 70), cv2.FONT_HERSHEY_SIMPLEX, 1, LABEL_COLOR, 2)
+
+    for track_id, x1, y1, center, zone, duration in overlay.tracks:
+        cv2.circle(annotated, center, 5, TRACK_COLOR, -1)
+        cv2.putText(annotated, f"ID: {track_id}", (x1 + 50, y1 - 70), cv2.FONT_HERSHEY_SIMPLEX, 1, LABEL_COLOR, 2)
+        if duration is not None:
+            cv2.putText(annotated, f"Duration: {zone} {duration:.2f}s", (x1 + 50, y1 - 40),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, LABEL_COLOR, 2)
+        else:
+            # If not currently in a zone or no entry time recorded, display 0.0s
+            cv2.putText(annotated, "Duration: 0.00s", (x1 + 150, y1 + 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, LABEL_COLOR, 2)
+
+    for (x1, y1, x2, y2), label in overlay.faces:
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), FACE_COLOR, 2)
+        cv2.putText(annotated, label, (x1, y2 + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, FACE_COLOR, 2)
+
+    cv2.putText(annotated, f"Human Detected: {overlay.people_count}", (10, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, LABEL_COLOR, 2)
+    return annotated
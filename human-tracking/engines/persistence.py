@@ -0,0 +1,152 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+KINDS = ("customer", "visit_zone")
+
+
+class DailyAnalyticsWriter:
+    """Batched, append-only persistence for the daily customer / visit_zone analytics.
+
+    The frame loop only calls mark_dirty(track_id). A background thread wakes
+    up every `flush_interval` seconds (or once `max_dirty` tracks changed),
+    asks `collect(track_ids)` for the current records of the dirty tracks and
+    appends them as JSON lines to temp/<kind>/<date>/<date>.jsonl. Every
+    `snapshot_interval` seconds the latest record per track is written to
+    <date>.json (the file the dashboard and S3DataSync read) through a temp
+    file and an atomic rename, so readers never see a half written file.
+
+    Disk writes scale with the number of tracks that changed per flush, not
+    with visitors times FPS. The folded records of the current day are kept in
+    memory (a few hundred bytes per visitor) and rebuilt from the .jsonl after
+    a restart.
+    """
+
+    def __init__(self, base_dir, collect, flush_interval=5.0, snapshot_interval=30.0, max_dirty=200):
+        self.base_dir = base_dir
+        self.collect = collect  # Format: collect(track_ids) -> {track_id: (metadata, behaviour)}
+        self.flush_interval = flush_interval
+        self.snapshot_interval = snapshot_interval
+        self.max_dirty = max_dirty
+        self.session = datetime.now().strftime("%H%M%S")  # Track IDs restart with the process, keep runs apart
+
+        self._lock = threading.Lock()
+        self._dirty = set()
+        self._final = {}  # Format: {track_id: (metadata, behaviour)} for tracks evicted since the last flush
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._date = None
+        self._records = {kind: {} for kind in KINDS}  # Format: {kind: {record_key: record}} for self._date
+        self._changed_since_snapshot = False
+        self._last_snapshot_time = 0
+
+        self.lines_written = 0
+        self.snapshots_written = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Flush everything that is pending and write a final snapshot"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush(force_snapshot=True)
+
+    def mark_dirty(self, track_id):
+        with self._lock:
+            self._dirty.add(track_id)
+            if len(self._dirty) >= self.max_dirty:
+                self._wake.set()
+
+    def record_final(self, track_id, metadata, behaviour):
+        """Queue the last state of a track that is about to be dropped from memory"""
+        with self._lock:
+            self._final[track_id] = (metadata, behaviour)
+            self._dirty.discard(track_id)
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error saving daily analytics: {e}")
+
+    def daily_dir(self, kind, date):
+        folder = os.path.join(self.base_dir, kind, date)
+        if not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+            open(os.path.join(folder, "log.txt"), "w").close()
+        return folder
+
+    def _switch_date(self, date):
+        if self._date is not None and self._changed_since_snapshot:
+            self.snapshot()  # Close off the previous day
+
+        self._date = date
+        self._records = {kind: {} for kind in KINDS}
+        # Rebuild today's records after a restart
+        for kind in KINDS:
+            log_path = os.path.join(self.daily_dir(kind, date), f"{date}.jsonl")
+            if os.path.exists(log_path):
+                with open(log_path, "r") as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue  # Partially written last line
+                        self._records[kind][entry["key"]] = entry["record"]
+
+    def flush(self, force_snapshot=False):
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            final, self._final = self._final, {}
+
+        records = self.collect(dirty) if dirty else {}
+        records.update(final)
+
+        today = datetime.now().strftime("%d%m%Y")
+        if today != self._date:
+            self._switch_date(today)
+
+        if records:
+            lines = {kind: [] for kind in KINDS}
+            for track_id, (metadata, behaviour) in records.items():
+                key = f"{self.session}-{track_id}"
+                for kind, record in (("customer", metadata), ("visit_zone", behaviour)):
+                    if record and self._records[kind].get(key) != record:
+                        self._records[kind][key] = record
+                        lines[kind].append(json.dumps({"key": key, "record": record}))
+
+            for kind, kind_lines in lines.items():
+                if kind_lines:
+                    log_path = os.path.join(self.daily_dir(kind, today), f"{today}.jsonl")
+                    with open(log_path, "a") as f:
+                        f.write("\n".join(kind_lines) + "\n")
+                    self.lines_written += len(kind_lines)
+                    self._changed_since_snapshot = True
+
+        if self._changed_since_snapshot and (force_snapshot or time.time() - self._last_snapshot_time >= self.snapshot_interval):
+            self.snapshot()
+
+    def snapshot(self):
+        for kind in KINDS:
+            file_path = os.path.join(self.daily_dir(kind, self._date), f"{self._date}.json")
+            tmp_path = file_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(list(self._records[kind].values()), f, indent=4)
+            os.replace(tmp_path, file_path)
+
+        self._changed_since_snapshot = False
+        self._last_snapshot_time = time.time()
+        self.snapshots_written += 1
+        print(f"💾 Saved {len(self._records['customer'])} customer and {len(self._records['visit_zone'])} visit zone records for {self._date}")
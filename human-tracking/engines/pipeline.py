@@ -0,0 +1,110 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+class LatestQueue:
+    """Bounded hand-off queue between pipeline stages that always keeps the newest items.
+
+    When the queue is full, put() drops the oldest item instead of blocking,
+    so a slow consumer skips stale frames rather than building up latency.
+    """
+
+    def __init__(self, maxsize=1):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._items = deque()
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def put(self, item, replaceable=None):
+        """Queue `item`, returns False if it was dropped instead.
+
+        `replaceable(pending)` decides whether a full queue may drop its oldest
+        item for this one. When it returns False the new item is dropped.
+        """
+        with self._condition:
+            if len(self._items) >= self.maxsize:
+                if replaceable is not None and not replaceable(self._items[0]):
+                    self.dropped += 1
+                    return False
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._condition.notify()
+            return True
+
+    def get(self, timeout=None):
+        """Return the oldest queued item, or None on timeout or once the queue is closed"""
+        with self._condition:
+            if not self._items and not self._closed:
+                self._condition.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+
+class PipelineStats:
+    """Rolling per-stage latency and throughput counters for one camera pipeline"""
+
+    def __init__(self, window=300):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = {}  # Format: {stage: deque of (timestamp, seconds)}
+        self._counts = {}  # Format: {stage: total frames}
+        self._queues = {}  # Format: {name: LatestQueue}
+
+    def watch_queue(self, name, queue):
+        self._queues[name] = queue
+
+    def record(self, stage, seconds):
+        with self._lock:
+            if stage not in self._samples:
+                self._samples[stage] = deque(maxlen=self.window)
+                self._counts[stage] = 0
+            self._samples[stage].append((time.time(), seconds))
+            self._counts[stage] += 1
+
+    def durations(self, stage):
+        """Recorded seconds of one stage inside the window, oldest first"""
+        with self._lock:
+            return [seconds for _, seconds in self._samples.get(stage, ())]
+
+    def snapshot(self):
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self._samples.items()}
+            counts = dict(self._counts)
+
+        stages = {}
+        for stage, values in samples.items():
+            durations = sorted(seconds for _, seconds in values)
+            span = values[-1][0] - values[0][0]
+            stages[stage] = {
+                "frames": counts[stage],
+                "avg_ms": round(sum(durations) / len(durations) * 1000, 2),
+                "p50_ms": round(durations[len(durations) // 2] * 1000, 2),
+                "p95_ms": round(durations[min(len(durations) - 1, int(len(durations) * 0.95))] * 1000, 2),
+                "fps": round((len(values) - 1) / span, 2) if span > 0 else 0.0,
+            }
+        return {
+            "stages": stages,
+            "dropped": {name: queue.dropped for name, queue in self._queues.items()},
+        }
+
+    def export(self, file_path):
+        """Write the current snapshot as JSON (atomically, so readers never see a partial file)"""
+        tmp_path = file_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f, indent=4)
+        os.replace(tmp_path, file_path)
@@ -0,0 +1,54 @@
+import cv2
+import numpy as np
+import torch
+
+PIXEL_MEAN = (0.485, 0.456, 0.406)
+PIXEL_STD = (0.229, 0.224, 0.225)
+
+
+def preprocess_crops(crops, image_size=(256, 128), pixel_mean=PIXEL_MEAN, pixel_std=PIXEL_STD):
+    """NCHW float32 batch of BGR crops, resized straight to `image_size` (height, width) and normalized"""
+    height, width = image_size
+    batch = np.empty((len(crops), height, width, 3), dtype=np.float32)
+    for i, crop in enumerate(crops):
+        resized = cv2.resize(crop, (width, height), interpolation=cv2.INTER_LINEAR)
+        batch[i] = resized[:, :, ::-1]  # BGR (OpenCV) -> RGB (torchreid)
+    batch = (batch / 255.0 - np.array(pixel_mean, dtype=np.float32)) / np.array(pixel_std, dtype=np.float32)
+    return np.ascontiguousarray(batch.transpose(0, 3, 1, 2), dtype=np.float32)
+
+
+class BatchFeatureExtractor:
+    """Embeds all person crops of a frame with batched OSNet forward passes.
+
+    Wraps the model of a torchreid FeatureExtractor, or an exported model from
+    engines.backends that takes NCHW float32 arrays. Crops are resized
+    straight to the model input size (no letterbox padding), normalized in one
+    NumPy operation and pushed through the network in chunks of at most
+    `max_batch_size`.
+    """
+
+    def __init__(self, extractor, max_batch_size=16, image_size=(256, 128), pixel_mean=PIXEL_MEAN, pixel_std=PIXEL_STD):
+        self.model = getattr(extractor, "model", extractor)
+        self.device = getattr(extractor, "device", None)  # None: exported model, called on NumPy arrays
+        self.max_batch_size = max_batch_size
+        self.image_size = image_size
+        self.pixel_mean = pixel_mean
+        self.pixel_std = pixel_std
+
+    def preprocess(self, crops):
+        return preprocess_crops(crops, self.image_size, self.pixel_mean, self.pixel_std)
+
+    def __call__(self, crops):
+        """Return a (len(crops), D) float32 array of embeddings"""
+        if len(crops) == 0:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        features = []
+        with torch.no_grad():
+            for start in range(0, len(crops), self.max_batch_size):
+                batch = self.preprocess(crops[start:start + self.max_batch_size])
+                if self.device is None:
+                    features.append(np.asarray(self.model(batch)))
+                else:
+                    features.append(self.model(torch.from_numpy(batch).to(self.device)).cpu().numpy())
+        return np.concatenate(features).astype(np.float32, copy=False)
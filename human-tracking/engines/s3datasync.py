@@ -1,11 +1,13 @@
 import os
+import gzip
 import time
 import json
-import glob
 import boto3
 import shutil
 from datetime import datetime, timedelta
 from botocore.exceptions import BotoCoreError, ClientError
+from engines.fswatch import create_watcher, PollingWatcher, IN_CREATE, IN_ISDIR, IN_Q_OVERFLOW
+from engines.upload_queue import UploadQueue
 
 class S3DataSync:
     def __init__(
@@ -16,10 +18,17 @@ class S3DataSync:
         s3_base_prefix_customer="customer/",
         s3_base_prefix_visitzone="visit_zone/",
         check_interval=30,
-        max_days_to_keep=3  # New parameter: keep only last x days of folders
+        max_days_to_keep=3,  # New parameter: keep only last x days of folders
+        compaction_interval=10,  # Merge uploaded parts into the daily file every x cycles
+        state_file=None,  # Upload watermarks, defaults to <local base>/s3sync_state.json
+        queue_dir=None,  # Parts waiting for upload, defaults to <local base>/s3sync_queue
+        s3_client=None,  # Inject a client (e.g. one created inside moto's mock_aws) for local testing
+        watch=True,  # React to completed writes (inotify on Linux), False = poll every check_interval
+        max_latency=5.0,  # Upload at most x seconds after the first write of a burst
+        debounce=1.0  # ...or once no new write arrived for x seconds, whichever comes first
     ):
         try:
-            self.s3 = boto3.client('s3')
+            self.s3 = s3_client if s3_client is not None else boto3.client('s3')
             print("✅ S3 client initialized")
             
             self.s3.head_bucket(Bucket=bucket_name)
@@ -45,10 +54,34 @@ class S3DataSync:
         self.s3_base_prefix_visitzone = s3_base_prefix_visitzone.rstrip('/') + '/'
         self.check_interval = check_interval
         self.max_days_to_keep = max_days_to_keep
+        self.compaction_interval = compaction_interval
+        self.watch = watch
+        self.max_latency = max_latency
+        self.debounce = min(debounce, max_latency)
+        self.state_file = state_file or os.path.join(os.path.dirname(os.path.normpath(local_base_folder_customer)), "s3sync_state.json")
+        self.state = self.load_state()
+        self.upload_queue = UploadQueue(
+            queue_dir or os.path.join(os.path.dirname(os.path.normpath(local_base_folder_customer)), "s3sync_queue"),
+            self.put_part
+        )
         
         # Get current date in format DDMMYYYY
-        self.current_date = datetime.now().strftime("%d%m%Y")
+        self.set_date(datetime.now().strftime("%d%m%Y"))
         
+        # Clean up old folders before starting
+        self.cleanup_old_folders()
+        
+        print(f"📁 Customer Local folder: {os.path.abspath(self.local_folder_customer)}")
+        print(f"☁️  Customer S3 target: s3://{self.bucket}/{self.main_s3_key_customer}")
+        print(f"📁 Visit Zone Local folder: {os.path.abspath(self.local_folder_visitzone)}")
+        print(f"☁️  Visit Zone S3 target: s3://{self.bucket}/{self.main_s3_key_visitzone}")
+        print(f"📅 Using today's date: {self.current_date}")
+        print(f"🗑️  Keeping only last {self.max_days_to_keep} days of folders")
+
+    def set_date(self, date):
+        """Point the local folders and S3 keys at `date` (DDMMYYYY)"""
+        self.current_date = date
+
         # Set up paths with current date for customer
         self.local_folder_customer = os.path.join(self.local_base_folder_customer, self.current_date)
         self.main_s3_file_customer = f"{self.current_date}.json"
@@ -62,16 +95,27 @@ class S3DataSync:
         # Create directories if they don't exist
         os.makedirs(self.local_folder_customer, exist_ok=True)
         os.makedirs(self.local_folder_visitzone, exist_ok=True)
-        
-        # Clean up old folders before starting
-        self.cleanup_old_folders()
-        
-        print(f"📁 Customer Local folder: {os.path.abspath(self.local_folder_customer)}")
+
+    def check_date(self):
+        """Switch to today's folders and keys after midnight, returns True if the date changed"""
+        today = datetime.now().strftime("%d%m%Y")
+        if today == self.current_date:
+            return False
+
+        # Queue the tail of yesterday's logs before moving on, compact_due() closes the day once it is uploaded
+        previous_date = self.current_date
+        self.upload_new_records("customer")
+        self.upload_new_records("visitzone")
+
+        self.set_date(today)
+        print(f"📅 Date changed {previous_date} -> {today}")
         print(f"☁️  Customer S3 target: s3://{self.bucket}/{self.main_s3_key_customer}")
-        print(f"📁 Visit Zone Local folder: {os.path.abspath(self.local_folder_visitzone)}")
         print(f"☁️  Visit Zone S3 target: s3://{self.bucket}/{self.main_s3_key_visitzone}")
-        print(f"📅 Using today's date: {self.current_date}")
-        print(f"🗑️  Keeping only last {self.max_days_to_keep} days of folders")
+        return True
+
+    def next_midnight(self):
+        tomorrow = datetime.now().date() + timedelta(days=1)
+        return datetime.combine(tomorrow, datetime.min.time()).timestamp()
 
     def cleanup_old_folders(self):
         """Remove folders older than max_days_to_keep for both customer and visit_zone"""
@@ -83,6 +127,14 @@ class S3DataSync:
         # Clean up visit_zone folders
         self._cleanup_folder_type_folders(self.local_base_folder_visitzone, "visit_zone")
 
+        # Forget the upload watermarks of removed days
+        cutoff_date = datetime.now() - timedelta(days=self.max_days_to_keep)
+        expired = [key for key in self.state if datetime.strptime(key.split("/")[-1], "%d%m%Y") < cutoff_date]
+        if expired:
+            for key in expired:
+                del self.state[key]
+            self.save_state()
+
     def _cleanup_folder_type_folders(self, base_folder, folder_type):
         """Clean up old folders for a specific folder type"""
         if not os.path.exists(base_folder):
@@ -131,120 +183,281 @@ class S3DataSync:
         except Exception as e:
             print(f"❌ Error cleaning up {folder_type} folders: {e}")
 
-    def find_json_files(self, folder_type):
-        """Find JSON files in the specified folder type"""
+    def load_state(self):
+        """Load the upload watermarks: {"<folder_type>/<date>": {"offset": bytes_uploaded, "seq": next_part}}"""
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"❌ Invalid sync state in {self.state_file}, starting from scratch: {e}")
+            return {}
+
+    def save_state(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_file)), exist_ok=True)
+        tmp_path = self.state_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_file)
+
+    def get_targets(self, folder_type):
+        """Local record log and S3 prefix for a folder type"""
         if folder_type == "customer":
-            return glob.glob(os.path.join(self.local_folder_customer, "*.json"))
+            return os.path.join(self.local_folder_customer, f"{self.current_date}.jsonl"), self.s3_base_prefix_customer
         elif folder_type == "visitzone":
-            return glob.glob(os.path.join(self.local_folder_visitzone, "*.json"))
+            return os.path.join(self.local_folder_visitzone, f"{self.current_date}.jsonl"), self.s3_base_prefix_visitzone
         else:
-            return []
-
-    def validate_json(self, file_path):
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            return data
-        except Exception as e:
-            print(f"❌ Invalid JSON in {os.path.basename(file_path)}: {e}")
             return None
 
-    def append_to_s3_file(self, new_data, folder_type):
-        """Append new data to the appropriate S3 JSON file"""
+    def read_new_lines(self, log_path, offset, end=None):
+        """Complete lines appended to the record log after `offset` (up to `end`), and the offset after them"""
+        if not os.path.exists(log_path) or os.path.getsize(log_path) <= offset:
+            return [], offset
+        with open(log_path, "rb") as f:
+            f.seek(offset)
+            chunk = f.read() if end is None else f.read(end - offset)
+        end = chunk.rfind(b"\n") + 1  # A line still being written is left for the next cycle
+        lines = [line for line in chunk[:end].decode("utf-8").splitlines() if line.strip()]
+        return lines, offset + end
+
+    def put_part(self, key, body):
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=key,
+            Body=body,
+            ContentType='application/x-ndjson',
+            ContentEncoding='gzip'
+        )
+
+    def upload_new_records(self, folder_type):
+        """Queue the records appended since the last call as one small immutable part object.
+
+        The byte range of a batch is written to the state before the part is
+        queued. If the process dies in between, the same range is re-read and
+        re-queued under the same key on restart, so a batch is never lost or
+        uploaded twice with different contents.
+        """
+        targets = self.get_targets(folder_type)
+        if targets is None:
+            print(f"❌ Unknown folder type: {folder_type}")
+            return 0
+        log_path, s3_prefix = targets
+
+        state_key = f"{folder_type}/{self.current_date}"
+        watermark = self.state.setdefault(state_key, {"offset": 0, "seq": 0})
+        if "end" in watermark:
+            lines, new_offset = self.read_new_lines(log_path, watermark["offset"], watermark["end"])  # Interrupted batch
+        else:
+            lines, new_offset = self.read_new_lines(log_path, watermark["offset"])
+            if not lines:
+                print(f"⏭️ No new {folder_type} records")
+                return 0
+            watermark["end"] = new_offset
+            self.save_state()
+
+        part_key = f"{s3_prefix}{self.current_date}/part-{watermark['seq']:06d}.jsonl.gz"
+        self.upload_queue.enqueue(part_key, gzip.compress(("\n".join(lines) + "\n").encode("utf-8")))
+
+        watermark["offset"] = new_offset
+        watermark["seq"] += 1
+        del watermark["end"]
+        self.save_state()
+        print(f"📤 Queued {len(lines)} {folder_type} records as {part_key}")
+        return len(lines)
+
+    def compact_due(self):
+        """Compact today, and each previous day once all of its parts have been uploaded"""
+        self.compact("customer")
+        self.compact("visitzone")
+
+        for state_key, watermark in list(self.state.items()):
+            folder_type, date = state_key.split("/")
+            if date == self.current_date or watermark.get("closed"):
+                continue
+            _, s3_prefix = self.get_targets(folder_type)
+            if self.upload_queue.pending(f"{s3_prefix}{date}/"):
+                continue
+            if self.compact(folder_type, date) is not None:
+                watermark["closed"] = True
+                self.save_state()
+
+    def read_jsonl_object(self, key):
+        response = self.s3.get_object(Bucket=self.bucket, Key=key)
+        body = gzip.decompress(response['Body'].read()).decode("utf-8")
+        return [json.loads(line) for line in body.splitlines() if line.strip()], response.get('Metadata', {})
+
+    def compact(self, folder_type, date=None):
+        """Merge the uploaded parts of a day into compacted.jsonl.gz and rewrite the daily JSON file.
+
+        Records are folded by key (latest wins), so the daily file holds one
+        entry per visitor. Merged parts are deleted afterwards; the last merged
+        seq is kept in the compacted object's metadata so a part is never
+        merged twice, even if the job stops half way.
+        """
+        targets = self.get_targets(folder_type)
+        if targets is None:
+            return 0
+        _, s3_prefix = targets
+        date = date or self.current_date
+        day_prefix = f"{s3_prefix}{date}/"
+        compacted_key = day_prefix + "compacted.jsonl.gz"
+
         try:
-            # Determine the correct S3 key based on folder type
-            if folder_type == "customer":
-                s3_key = self.main_s3_key_customer
-            elif folder_type == "visitzone":
-                s3_key = self.main_s3_key_visitzone
-            else:
-                print(f"❌ Unknown folder type: {folder_type}")
-                return False
-            
-            # Try to download existing data first
+            part_keys = []
+            paginator = self.s3.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=day_prefix + "part-"):
+                part_keys.extend(obj['Key'] for obj in page.get('Contents', []))
+            if not part_keys:
+                return 0
+
+            records = {}
+            last_merged = -1
             try:
-                response = self.s3.get_object(Bucket=self.bucket, Key=s3_key)
-                existing_data = json.loads(response['Body'].read().decode('utf-8'))
-                if not isinstance(existing_data, list):
-                    existing_data = [existing_data]
+                entries, metadata = self.read_jsonl_object(compacted_key)
+                records = {entry["key"]: entry["record"] for entry in entries}
+                last_merged = int(metadata.get('last-part', -1))
             except ClientError as e:
-                if e.response['Error']['Code'] == 'NoSuchKey':
-                    existing_data = []
-                else:
+                if e.response['Error']['Code'] != 'NoSuchKey':
                     raise e
-            
-            # Append new data
-            if isinstance(new_data, list):
-                existing_data.extend(new_data)
-            else:
-                existing_data.append(new_data)
-            
-            # Upload updated data back to S3
-            updated_json = json.dumps(existing_data, indent=2)
+
+            merged_keys = []
+            for part_key in sorted(part_keys):
+                seq = int(part_key.rsplit("part-", 1)[1].split(".")[0])
+                merged_keys.append(part_key)
+                if seq <= last_merged:
+                    continue  # Already in the compacted object, only its delete was missed
+                entries, _ = self.read_jsonl_object(part_key)
+                for entry in entries:
+                    records[entry["key"]] = entry["record"]
+                last_merged = seq
+
+            compacted_body = "".join(json.dumps({"key": key, "record": record}) + "\n" for key, record in records.items())
             self.s3.put_object(
                 Bucket=self.bucket,
-                Key=s3_key,
-                Body=updated_json,
+                Key=compacted_key,
+                Body=gzip.compress(compacted_body.encode("utf-8")),
+                ContentType='application/x-ndjson',
+                ContentEncoding='gzip',
+                Metadata={'last-part': str(last_merged)}
+            )
+            self.s3.put_object(
+                Bucket=self.bucket,
+                Key=f"{s3_prefix}{date}.json",
+                Body=json.dumps(list(records.values())),
                 ContentType='application/json'
             )
-            
-            return True
-            
+            for start in range(0, len(merged_keys), 1000):
+                self.s3.delete_objects(
+                    Bucket=self.bucket,
+                    Delete={'Objects': [{'Key': key} for key in merged_keys[start:start + 1000]]}
+                )
+
+            print(f"🗜️  Compacted {len(merged_keys)} {folder_type} parts into s3://{self.bucket}/{s3_prefix}{date}.json ({len(records)} records)")
+            return len(merged_keys)
+
         except Exception as e:
-            print(f"❌ Failed to append to S3 file: {e}")
-            return False
+            print(f"❌ Failed to compact {folder_type} parts for {date}: {e}")
+            return None
 
-    def process_local_files(self, folder_type):
-        """Process files for a specific folder type (customer or visitzone)"""
-        files = self.find_json_files(folder_type)
-        if not files:
-            print(f"⏭️ No JSON files found in {folder_type} folder")
-            return 0
-            
-        print(f"📋 Found {len(files)} files in {folder_type}: {[os.path.basename(f) for f in files]}")
-        
-        success_count = 0
-        all_new_data = []
-        
-        for file_path in files:
-            filename = os.path.basename(file_path)
-            print(f"\n--- Processing {folder_type}: {filename} ---")
-            
-            new_data = self.validate_json(file_path)
-            if new_data is not None:
-                if isinstance(new_data, list):
-                    all_new_data.extend(new_data)
-                else:
-                    all_new_data.append(new_data)
-                print(f"✓ Data extracted from {filename}")
-            else:
-                print(f"🗑️ Deleting invalid JSON: {filename}")
-                try:
-                    os.remove(file_path)
-                except OSError:
-                    pass
-        
-        # Append all new data to the appropriate S3 file
-        if all_new_data:
-            if self.append_to_s3_file(all_new_data, folder_type):
-                success_count = len(all_new_data)
-                if folder_type == "customer":
-                    s3_key = self.main_s3_key_customer
+    def folder_type_for(self, path):
+        """Folder type whose base folder contains `path`, or None"""
+        path = os.path.abspath(path)
+        for folder_type, base_folder in (("customer", self.local_base_folder_customer), ("visitzone", self.local_base_folder_visitzone)):
+            base_folder = os.path.abspath(base_folder)
+            if path == base_folder or path.startswith(base_folder + os.sep):
+                return folder_type
+        return None
+
+    def add_watches(self, watcher):
+        # Base folders to see new date folders appear, date folders for the record logs themselves
+        for folder in (self.local_base_folder_customer, self.local_base_folder_visitzone,
+                       self.local_folder_customer, self.local_folder_visitzone):
+            try:
+                watcher.add_watch(folder)
+            except OSError as e:
+                print(f"❌ Cannot watch {folder}: {e}")
+
+    def upload_pending(self, folder_types):
+        for folder_type in sorted(folder_types):
+            count = self.upload_new_records(folder_type)
+            if count > 0:
+                print(f"\n📊 Processed {count} new {folder_type} records")
+
+    def run_watch(self):
+        """Upload when the record logs change instead of on a fixed timer.
+
+        The analytics writer appends a batch and closes the file every few
+        seconds. Each completed write marks its folder type as pending; pending
+        uploads go out once writes pause for `debounce` seconds, and never later
+        than `max_latency` seconds after the first write of the burst. With no
+        writes the thread blocks in the watcher and does no work until the next
+        compaction / cleanup is due or the date changes.
+        """
+        watcher = create_watcher(self.check_interval)
+        mode = "polling" if isinstance(watcher, PollingWatcher) else "inotify"
+        print(f"👀 Watching for completed writes ({mode})")
+        self.add_watches(watcher)
+
+        compaction_period = self.compaction_interval * self.check_interval
+        cleanup_period = 24 * self.check_interval
+        next_compaction = time.time() + compaction_period
+        next_cleanup = time.time() + cleanup_period
+
+        pending = {"customer", "visitzone"}  # Catch up on anything written while the service was down
+        first_event = last_event = 0
+        try:
+            while True:
+                if self.check_date():
+                    self.add_watches(watcher)
+                    pending.update(("customer", "visitzone"))
+
+                now = time.time()
+                if pending:
+                    deadline = min(last_event + self.debounce, first_event + self.max_latency)
                 else:
-                    s3_key = self.main_s3_key_visitzone
-                print(f"🎉✅ Appended {success_count} records to s3://{self.bucket}/{s3_key}")
-                
-                # Clean up processed files
-                for file_path in files:
-                    try:
-                        os.remove(file_path)
-                        print(f"🗑️ Removed local file: {os.path.basename(file_path)}")
-                    except OSError:
-                        pass
-            else:
-                print(f"❌ Failed to append {folder_type} data to S3")
-        
-        return success_count
+                    deadline = min(next_compaction, next_cleanup, self.next_midnight())
+
+                if deadline > now:
+                    for path, mask in watcher.read_events(deadline - now):
+                        if mask & IN_Q_OVERFLOW:
+                            pending.update(("customer", "visitzone"))  # Events were lost, check both logs
+                        elif mask & IN_ISDIR and mask & IN_CREATE:
+                            watcher.add_watch(path)  # New date folder after midnight
+                        elif path.endswith(".jsonl"):
+                            folder_type = self.folder_type_for(path)
+                            if folder_type is None:
+                                continue
+                            if not pending:
+                                first_event = time.time()
+                            pending.add(folder_type)
+                        else:
+                            continue
+                        last_event = time.time()
+                    continue
+
+                if pending:
+                    self.upload_pending(pending)
+                    pending = set()
+
+                if now >= next_compaction:
+                    self.compact_due()
+                    next_compaction = now + compaction_period
+                if now >= next_cleanup:
+                    self.cleanup_old_folders()
+                    next_cleanup = now + cleanup_period
+        except KeyboardInterrupt:
+            self.upload_pending(pending)
+            self.shutdown()
+        finally:
+            watcher.close()
+
+    def shutdown(self):
+        # Whatever cannot be uploaded now stays in the queue folder for the next start
+        self.upload_queue.stop(timeout=5)
+        if self.upload_queue.drain():
+            self.compact_due()
+        print("\n🛑 S3 Data Service Stopped")
 
     def run(self):
         print("\n" + "="*60)
@@ -255,26 +468,46 @@ class S3DataSync:
         print(f"📁 Monitoring Visit Zone: {os.path.abspath(self.local_folder_visitzone)}")
         print(f"☁️  Visit Zone S3 file: s3://{self.bucket}/{self.main_s3_key_visitzone}")
         print(f"📅 Date: {self.current_date}")
-        print(f"⏰ Check interval: {self.check_interval} seconds")
+        if self.watch:
+            print(f"⚡ Uploading on change, within {self.max_latency} seconds")
+        else:
+            print(f"⏰ Check interval: {self.check_interval} seconds")
+        print(f"🗜️  Compacting parts every {self.compaction_interval} cycles")
         print(f"🗑️  Keeping only last {self.max_days_to_keep} days of folders")
         print("="*60)
         print("Press Ctrl+C to stop\n")
-        
+
+        self.upload_queue.start()
+        if self.watch:
+            return self.run_watch()
+        return self.run_poll()
+
+    def run_poll(self):
+        """Fallback: check both record logs every check_interval seconds"""
         # Counter for periodic cleanup
         cleanup_counter = 0
         cleanup_interval = 24  # Clean up every 24 cycles (30 sec * 24 = 12 minutes)
+        compaction_counter = 0
         
         try:
             while True:
-                # Process customer files
-                customer_count = self.process_local_files("customer")
+                self.check_date()
+
+                # Queue new customer records
+                customer_count = self.upload_new_records("customer")
                 if customer_count > 0:
                     print(f"\n📊 Processed {customer_count} new customer records")
                 
-                # Process visit zone files
-                visitzone_count = self.process_local_files("visitzone")
+                # Queue new visit zone records
+                visitzone_count = self.upload_new_records("visitzone")
                 if visitzone_count > 0:
                     print(f"\n📊 Processed {visitzone_count} new visit zone records")
+
+                # Periodically merge the uploaded parts into the daily files
+                compaction_counter += 1
+                if compaction_counter >= self.compaction_interval:
+                    self.compact_due()
+                    compaction_counter = 0
                 
                 # Periodically clean up old folders
                 cleanup_counter += 1
@@ -284,7 +517,7 @@ class S3DataSync:
                 
                 time.sleep(self.check_interval)
         except KeyboardInterrupt:
-            print("\n🛑 S3 Data Service Stopped")
+            self.shutdown()
 
 if __name__ == "__main__":
     sync_service = S3DataSync()
@@ -0,0 +1,151 @@
+import math
+import time
+from collections import deque
+import cv2
+
+MOTION_SIZE = (80, 60)  # Frames are compared at this size, enough to notice people walking in
+
+
+class Prediction:
+    """Queued instead of a YOLO result for frames the scheduler skipped.
+
+    `timestamp` is the capture time of the skipped frame,
+    DetectionScheduler.steps() turns it into how far the tracks have moved on.
+    """
+
+    __slots__ = ("timestamp",)
+
+    def __init__(self, timestamp):
+        self.timestamp = timestamp
+
+
+def predicted_ltrb(track, steps):
+    """Box of a DeepSort track `steps` updates ahead of its last one, from its constant-velocity Kalman state"""
+    x, y, aspect, height = track.mean[:4] + steps * track.mean[4:8]
+    width = aspect * height
+    return x - width / 2, y - height / 2, x + width / 2, y + height / 2
+
+
+class DetectionScheduler:
+    """Decides for each frame whether YOLO runs or the tracks are carried by their Kalman prediction.
+
+    The interval N between detections adapts between min_interval and
+    max_interval. Load pushes it up: YOLO may use at most `detection_budget` of
+    the time between frames on average. Scene activity (frame-to-frame motion
+    and tentative or unmatched tracks) pulls it down, and a sudden burst of
+    motion forces a detection straight away. min_interval == max_interval gives
+    a fixed schedule, 1 and 1 is the old every-frame behaviour.
+
+    Intervals and the frame period are in camera frames, taken from the capture
+    timestamp and index of each frame. Frames dropped while YOLO was busy
+    still count, so the time YOLO takes never stretches the schedule.
+    """
+
+    def __init__(self, min_interval=1, max_interval=6, detection_budget=0.5, motion_threshold=4.0,
+                 uncertainty_threshold=0.3, frame_period=None, smoothing=0.2):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.detection_budget = detection_budget
+        self.motion_threshold = motion_threshold  # Mean absolute grey level change that counts as a busy scene
+        self.uncertainty_threshold = uncertainty_threshold  # Fraction of uncertain tracks that counts as a busy scene
+        self.frame_period = frame_period  # Fixed seconds between frames (replays), None measures it
+        self.smoothing = smoothing
+
+        self.interval = min_interval
+        self.load_interval = min_interval
+        self.frames_since_detection = 0
+        self.detection_seconds = None
+        self.measured_period = None
+        self.motion = 0.0
+        self.uncertainty = 0.0
+        self.detections = 0
+        self.predictions = 0
+        self._previous = None
+        self._last_frame = None  # (timestamp, index) of the previous frame
+        self._detection_index = None
+        self._timestamp = None
+        self._calls = 0
+        self._updates = deque(maxlen=2)  # Timestamps of the last two tracker updates with detections
+
+    def _smooth(self, current, value):
+        return value if current is None else current + self.smoothing * (value - current)
+
+    def _measure_motion(self, frame):
+        small = cv2.cvtColor(cv2.resize(frame, MOTION_SIZE, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        motion = 0.0 if self._previous is None else float(cv2.absdiff(small, self._previous).mean())
+        self._previous = small
+        return motion
+
+    def _adapt(self):
+        period = self.frame_period or self.measured_period
+        self.load_interval = self.min_interval
+        if self.detection_seconds is not None and period:
+            self.load_interval = math.ceil(self.detection_seconds / (self.detection_budget * period))
+
+        activity = max(self.motion / self.motion_threshold, self.uncertainty / self.uncertainty_threshold)
+        activity_interval = round(self.max_interval - (self.max_interval - self.min_interval) * min(activity, 1.0))
+
+        # Busy scenes want short intervals, but never more detections than the CPU can afford
+        self.interval = max(self.min_interval, min(self.max_interval, max(self.load_interval, activity_interval)))
+
+    def should_detect(self, frame, timestamp=None, frame_index=None):
+        """`timestamp` / `frame_index`: capture time and number of the frame, default now / one frame per call"""
+        self._calls += 1
+        timestamp = time.perf_counter() if timestamp is None else timestamp
+        frame_index = self._calls if frame_index is None else frame_index
+        if self._last_frame is not None and frame_index > self._last_frame[1]:
+            period = (timestamp - self._last_frame[0]) / (frame_index - self._last_frame[1])
+            self.measured_period = self._smooth(self.measured_period, period)
+        self._last_frame = (timestamp, frame_index)
+        self._timestamp = timestamp
+
+        motion = self._measure_motion(frame) if self.max_interval > self.min_interval else 0.0
+        burst = motion > 2 * self.motion_threshold
+        self.motion = self._smooth(self.motion, motion)
+        self._adapt()
+
+        if self._detection_index is not None:
+            self.frames_since_detection = frame_index - self._detection_index
+        due = self.frames_since_detection >= self.interval
+        if burst and self.frames_since_detection >= self.load_interval:
+            due = True  # Someone walked in, don't wait for the prediction to drift (as far as the load allows)
+        if self.detections == 0 or due:
+            self._detection_index = frame_index
+            self.frames_since_detection = 0
+            self.detections += 1
+            return True
+        self.predictions += 1
+        return False
+
+    def prediction(self):
+        """Prediction marker for the frame should_detect() just skipped"""
+        return Prediction(self._timestamp)
+
+    def record_detection(self, seconds):
+        self.detection_seconds = self._smooth(self.detection_seconds, seconds)
+
+    def record_update(self, timestamp):
+        """The tracker was updated with the detections of the frame captured at `timestamp`"""
+        self._updates.append(timestamp)
+
+    def steps(self, timestamp):
+        """Tracker updates between the last one and `timestamp`, the Kalman velocities are per update"""
+        if len(self._updates) < 2:
+            return 0.0
+        previous, last = self._updates
+        return max(timestamp - last, 0.0) / max(last - previous, 1e-6)
+
+    def observe_tracks(self, tracks):
+        # Tentative tracks and tracks missed by the last detection make the Kalman prediction less trustworthy
+        tracks = [track for track in tracks if not track.is_deleted()]
+        uncertain = sum(1 for track in tracks if not track.is_confirmed() or track.time_since_update > 0)
+        self.uncertainty = self._smooth(self.uncertainty, uncertain / len(tracks) if tracks else 0.0)
+
+    def stats(self):
+        return {
+            "interval": self.interval,
+            "detections": self.detections,
+            "predictions": self.predictions,
+            "motion": round(self.motion, 2),
+            "uncertainty": round(self.uncertainty, 2),
+        }
@@ -0,0 +1,127 @@
+import json
+import threading
+import cv2
+
+IMAGE_FORMATS = {
+    "jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY),
+}
+
+
+class StreamSettings:
+    """What a viewer negotiated for its stream.
+
+    Clients send a JSON text message at any time, e.g.
+    {"format": "webp", "width": 640, "quality": 70, "max_fps": 10, "binary": true}
+    Unknown keys are ignored and invalid values keep the previous setting.
+    """
+
+    def __init__(self, format="jpeg", width=None, quality=80, max_fps=None, binary=True):
+        self.format = format
+        self.width = width  # None = full camera resolution
+        self.quality = quality
+        self.max_fps = max_fps  # None = every processed frame
+        self.binary = binary  # False = base64 text frames for older clients
+
+    def update(self, message):
+        try:
+            requested = json.loads(message)
+        except (TypeError, ValueError):
+            return False
+        if not isinstance(requested, dict):
+            return False
+
+        if requested.get("format") in IMAGE_FORMATS:
+            self.format = requested["format"]
+        if isinstance(requested.get("width"), (int, float)) and requested["width"] >= 64:
+            self.width = int(requested["width"])
+        if isinstance(requested.get("quality"), (int, float)):
+            self.quality = int(min(max(requested["quality"], 10), 100))
+        if isinstance(requested.get("max_fps"), (int, float)) and requested["max_fps"] > 0:
+            self.max_fps = float(requested["max_fps"])
+        if isinstance(requested.get("binary"), bool):
+            self.binary = requested["binary"]
+        return True
+
+
+class AdaptiveQuality:
+    """Lowers the encode quality while a viewer's send buffer is backed up, and recovers it once it drains"""
+
+    def __init__(self, settings, high_water=512 * 1024, low_water=64 * 1024, min_quality=30, step=10):
+        self.settings = settings
+        self.high_water = high_water  # Buffered bytes above which frames are skipped and quality drops
+        self.low_water = low_water  # Buffered bytes below which quality climbs back towards the requested value
+        self.min_quality = min_quality
+        self.step = step
+        self.quality = settings.quality
+
+    def ready(self, buffered_bytes):
+        """Return False when this frame should be skipped because the client is still behind"""
+        if buffered_bytes > self.high_water:
+            self.quality = max(self.min_quality, self.quality - self.step)
+            return False
+        if buffered_bytes < self.low_water:
+            self.quality = min(self.settings.quality, self.quality + self.step // 2)
+        self.quality = min(self.quality, self.settings.quality)
+        return True
+
+    @property
+    def encode_quality(self):
+        return int(round(self.quality / 5.0) * 5)  # Coarse steps so viewers can share cached encodes
+
+
+class FrameEncoder:
+    """Encodes each published frame at most once per (format, width, quality) profile.
+
+    `render(frame)`, if given, returns the annotated frame to encode. It runs once
+    per frame_id, on the first encode that is not cached, so frames no viewer
+    sends are never drawn on.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frame_id = None
+        self._cache = {}
+        self._rendered = None
+
+    def encode(self, frame_id, frame, format="jpeg", width=None, quality=80, render=None):
+        key = (format, width, quality)
+        with self._lock:
+            if frame_id != self._frame_id:
+                self._frame_id = frame_id
+                self._cache = {}
+                self._rendered = None
+            if key in self._cache:
+                return self._cache[key]
+            rendered = self._rendered
+
+        if render is not None:
+            if rendered is None:
+                rendered = render(frame)
+                with self._lock:
+                    if frame_id == self._frame_id:
+                        self._rendered = rendered
+            frame = rendered
+
+        h, w = frame.shape[:2]
+        if width is not None and width < w:
+            frame = cv2.resize(frame, (width, int(h * width / w)), interpolation=cv2.INTER_AREA)
+        extension, quality_flag = IMAGE_FORMATS[format]
+        _, buffer = cv2.imencode(extension, frame, [quality_flag, quality])
+        data = buffer.tobytes()
+
+        with self._lock:
+            if frame_id == self._frame_id:
+                self._cache[key] = data
+        return data
+
+
+def send_buffer_size(websocket):
+    """Bytes queued in the websocket's transport that the client has not received yet"""
+    transport = getattr(websocket, "transport", None)
+    if transport is None:
+        return 0
+    try:
+        return transport.get_write_buffer_size()
+    except Exception:
+        return 0
@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TrackStateStore:
+    """Per-track analytics state with TTL and capacity limits.
+
+    Tracks are kept in last-seen order (LRU). A track is evicted once it has
+    not been seen for `ttl` seconds, or when more than `capacity` tracks are
+    live. Before a track is dropped, `on_evict(track_id, behaviour, metadata)`
+    is called so its final zone durations can be written out.
+    """
+
+    def __init__(self, ttl=300, capacity=2000, on_evict=None):
+        self.ttl = ttl
+        self.capacity = capacity
+        self.on_evict = on_evict
+        self.lock = threading.RLock()  # Held by every camera while it updates or snapshots the state
+
+        self.last_zone = {}  # Format: {track_id: zone}
+        self.behaviour = {}  # Format: {track_id: {zone: total_duration}}
+        self.metadata = {}  # Format: {track_id: {age: age, gender: gender}}
+        self.last_update_time = {}  # Format: {track_id: {zone: timestamp_of_last_update}}
+        self._last_seen = OrderedDict()  # Format: {track_id: timestamp}, oldest first
+
+        self.evicted_count = 0
+        self.flushed_count = 0
+
+    def __len__(self):
+        return len(self._last_seen)
+
+    def touch(self, track_id, timestamp=None):
+        """Mark a track as seen in the current frame"""
+        self._last_seen[track_id] = time.time() if timestamp is None else timestamp
+        self._last_seen.move_to_end(track_id)
+
+    def evict(self, now=None):
+        """Drop expired and over-capacity tracks, returns the evicted track IDs"""
+        now = time.time() if now is None else now
+        evicted = []
+        with self.lock:
+            while self._last_seen:
+                track_id, last_seen = next(iter(self._last_seen.items()))
+                if now - last_seen <= self.ttl and len(self._last_seen) <= self.capacity:
+                    break
+                del self._last_seen[track_id]
+                self._drop(track_id)
+                evicted.append(track_id)
+        return evicted
+
+    def _drop(self, track_id):
+        behaviour = self.behaviour.pop(track_id, None)
+        metadata = self.metadata.pop(track_id, None)
+        self.last_zone.pop(track_id, None)
+        self.last_update_time.pop(track_id, None)
+        self.evicted_count += 1
+
+        if self.on_evict is not None and (behaviour or metadata):
+            try:
+                if self.on_evict(track_id, behaviour, metadata):
+                    self.flushed_count += 1
+            except Exception as e:
+                print(f"Error flushing evicted track {track_id}: {e}")
+
+    def stats(self):
+        return {
+            "live": len(self._last_seen),
+            "evicted": self.evicted_count,
+            "flushed": self.flushed_count,
+        }
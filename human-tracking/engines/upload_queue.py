@@ -0,0 +1,99 @@
+import os
+import random
+import threading
+from urllib.parse import quote, unquote
+
+
+class UploadQueue:
+    """Persistent FIFO of objects waiting to be uploaded.
+
+    Every queued object is one file in `spool_dir`, named after its S3 key
+    and written through a temp file and an atomic rename. A background thread
+    uploads the oldest file with `put(key, body)` and deletes it only after
+    the upload succeeded. While uploads fail it retries the same object with
+    exponential backoff, so objects go out strictly in order and nothing is
+    lost when S3 is down or the process restarts. Re-queuing or re-uploading
+    an object writes the same key again, which replaces it instead of
+    duplicating it.
+    """
+
+    def __init__(self, spool_dir, put, base_backoff=1.0, max_backoff=300.0):
+        self.spool_dir = spool_dir
+        self.put = put
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        os.makedirs(spool_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.uploaded = 0
+        self.uploaded_bytes = 0
+        self.failures = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def enqueue(self, key, body):
+        file_path = os.path.join(self.spool_dir, quote(key, safe=""))
+        tmp_path = file_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+        self._wake.set()
+
+    def pending(self, prefix=""):
+        """Keys still waiting for upload, oldest first"""
+        with self._lock:
+            names = sorted(name for name in os.listdir(self.spool_dir) if not name.endswith(".tmp"))
+        return [key for key in map(unquote, names) if key.startswith(prefix)]
+
+    def drain(self):
+        """Upload everything queued, returns False as soon as an upload fails"""
+        for key in self.pending():
+            file_path = os.path.join(self.spool_dir, quote(key, safe=""))
+            try:
+                with open(file_path, "rb") as f:
+                    body = f.read()
+            except FileNotFoundError:
+                continue
+            try:
+                self.put(key, body)
+            except Exception as e:
+                self.failures += 1
+                print(f"❌ Upload of {key} failed, will retry: {e}")
+                return False
+
+            with self._lock:
+                try:
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    pass
+            self.uploaded += 1
+            self.uploaded_bytes += len(body)
+            print(f"🎉✅ Uploaded {key}")
+        return True
+
+    def _run(self):
+        attempt = 0
+        while not self._stop.is_set():
+            if self.drain():
+                attempt = 0
+                self._wake.wait()
+                self._wake.clear()
+            else:
+                # New objects don't cut the backoff short, only stop() does
+                attempt += 1
+                backoff = min(self.max_backoff, self.base_backoff * 2 ** (attempt - 1))
+                self._stop.wait(backoff * random.uniform(0.5, 1.0))  # Jitter, don't hammer S3 in lockstep
@@ -1,362 +1,569 @@
-from ultralytics import YOLO
 import cv2
-from deep_sort_realtime.deepsort_tracker import DeepSort
-from torchreid.reid.utils import FeatureExtractor
-from scipy.spatial.distance import cosine
-from bs4 import BeautifulSoup
 import threading
 import time
-import torch
-from torchvision import models, transforms
 import os
 from collections import Counter
 from datetime import datetime
-import json
 import base64
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from engines.gallery import EmbeddingGallery, l2_normalize
+from engines.track_store import TrackStateStore
+from engines.models import ModelRegistry, package_path, load_parameters
+from engines.cameras import Camera, BatchDetector, load_camera_config
+from engines.zones import ZoneMap, rectangle
+from engines.schedule import DetectionScheduler, Prediction, predicted_ltrb
+from engines.faces import FaceAttributeAnalyzer, HaarFaceDetector, DnnFaceDetector
+from engines.demographics import DemographicsPool
+from engines.hub import FrameHub
+from engines.overlay import FrameOverlay, render
+from engines.persistence import DailyAnalyticsWriter
+from engines.stream import StreamSettings, AdaptiveQuality, FrameEncoder, send_buffer_size
 
 frame_size = [1280,960]
 
-AGE_LIST = ['(0-2)', '(4-6)', '(8-12)', '(15-20)', '(25-32)', '(38-43)', '(48-53)', '(60-100)']
-GENDER_LIST = ['Male', 'Female']
-
-# Load face models
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-
-# Load Caffe age & gender models
-age_net = cv2.dnn.readNetFromCaffe(
-    r".\\human-tracking\\model\\face_models\\deploy_age.prototxt",
-    r".\\human-tracking\\model\\face_models\\age_net.caffemodel"   
-)
-gender_net = cv2.dnn.readNetFromCaffe(
-    r".\\human-tracking\\model\\face_models\\deploy_gender.prototxt",
-    r".\\human-tracking\\model\\face_models\\gender_net.caffemodel"
-)
-
-transform = transforms.Compose([
-    transforms.Resize((224, 224)),
-    transforms.ToTensor(),
-    transforms.Normalize([0.5] * 3, [0.5] * 3)
-])
-
-# Detect faces inside the person crop
-def detect_and_analyze_face(frame, frame_with_yolo, x1, y1, x2, y2): 
-    global frame_size
-    # Crop the detected person from YOLO box
-    person_crop = frame[y1:y2, x1:x2]
-
-    if person_crop.size == 0:
-        return None
-
-    h, w = person_crop.shape[:2]
-    if h < 100 or w < 100:  # arbitrary threshold
-        person_crop = cv2.resize(person_crop, (224, 224))
-
-    # Convert to grayscale for Haar
-    gray = cv2.cvtColor(person_crop, cv2.COLOR_BGR2GRAY)
-
-    # Detect faces
-    faces = face_cascade.detectMultiScale(
-        gray,
-        scaleFactor=1.1,
-        minNeighbors=5,
-        minSize=(30, 30)
-    )
-
-    face_info = []
-
-    for (fx, fy, fw, fh) in faces:
-        face_x1 = x1 + fx
-        face_y1 = y1 + fy
-        face_x2 = x1 + fx + fw
-        face_y2 = y1 + fy + fh
-
-        # Draw face bounding box
-        cv2.rectangle(frame_with_yolo, (face_x1, face_y1), (face_x2, face_y2), (255, 0, 255), 2)
-
-        # Extract face crop for age/gender
-        face_crop = frame[face_y1:face_y2, face_x1:face_x2]
-        
-        if face_crop.size > 0:
-            try:
-                # Preprocess for Caffe model
-                blob = cv2.dnn.blobFromImage(
-                    face_crop, 
-                    1.0, 
-                    (227, 227), 
-                    (78.4263377603, 87.7689143744, 114.895847746),
-                    swapRB=False
-                )
-
-                # Age prediction
-                age_net.setInput(blob)
-                age_preds = age_net.forward()
-                age = AGE_LIST[age_preds[0].argmax()]
-
-                # Gender prediction
-                gender_net.setInput(blob)
-                gender_preds = gender_net.forward()
-                gender = GENDER_LIST[gender_preds[0].argmax()]
-
-                # Annotate frame
-                cv2.putText(frame_with_yolo, f"{gender}, {age}", 
-                            (face_x1, face_y2 + 20),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 255), 2)
-
-                face_info.append({
-                    'bbox': (face_x1, face_y1, face_x2, face_y2),
-                    'age': age,
-                    'gender': gender
-                })
-
-            except Exception as e:
-                print(f"Error in face analysis: {e}")
-
-    return face_info if face_info else None
-
-# Load model and parametersq
-with open('human-tracking\\engines\\parameter.xml', 'r') as f:
-    xml = f.read()
-Bs_data = BeautifulSoup(xml, "xml")
-
-inference_threshold = float(Bs_data.find('inference_threshold').text)
-feature_extraction_threshold = float(Bs_data.find('feature_extraction_threshold').text)
+FACE_MODEL_DIR = package_path('model', 'face_models')
+# "haar": OpenCV's Haar cascade, one crop at a time
+# "dnn": OpenCV's res10 SSD face detector (deploy.prototxt + res10_300x300_ssd_iter_140000.caffemodel in model/face_models),
+#        all crops of a frame in one pass, falls back to Haar when the files are missing
+FACE_DETECTOR = "haar"
+FACE_SAMPLE_INTERVAL = 1.0  # Seconds between face samples of the same track
+FACE_MAX_SAMPLES = 10  # Age / gender votes per track, no more face analysis after that
+# Threads estimating age / gender off the frame loop, 0 runs it inline in analyze_frame
+DEMOGRAPHICS_WORKERS = 1
+DEMOGRAPHICS_MAX_PENDING = 4  # Frames of face jobs waiting, older ones are dropped when the workers fall behind
+
+def create_face_detector():
+    if FACE_DETECTOR == "dnn":
+        prototxt_path = os.path.join(FACE_MODEL_DIR, "deploy.prototxt")
+        model_path = os.path.join(FACE_MODEL_DIR, "res10_300x300_ssd_iter_140000.caffemodel")
+        if os.path.exists(prototxt_path) and os.path.exists(model_path):
+            return DnnFaceDetector(prototxt_path, model_path)
+        print(f"DNN face detector not found in {FACE_MODEL_DIR}, using the Haar cascade")
+    return HaarFaceDetector()
+
+def create_face_analyzer():
+    # Caffe age & gender models, every caller gets its own networks (cv2.dnn nets are not thread safe)
+    age_net = cv2.dnn.readNetFromCaffe(os.path.join(FACE_MODEL_DIR, "deploy_age.prototxt"),
+                                       os.path.join(FACE_MODEL_DIR, "age_net.caffemodel"))
+    gender_net = cv2.dnn.readNetFromCaffe(os.path.join(FACE_MODEL_DIR, "deploy_gender.prototxt"),
+                                          os.path.join(FACE_MODEL_DIR, "gender_net.caffemodel"))
+    return FaceAttributeAnalyzer(age_net, gender_net, create_face_detector())
+
+# Load parameters
+parameters = load_parameters(package_path('engines', 'parameter.xml'),
+                             {'inference_threshold': 0.5, 'feature_extraction_threshold': 0.25})
+inference_threshold = parameters['inference_threshold']
+feature_extraction_threshold = parameters['feature_extraction_threshold']
 print(f"Thresholds: {inference_threshold}, {feature_extraction_threshold}")
 
-model = YOLO("..\\human-tracking\\model\\runs\\detect\\train\\weights\\best.pt")
-
-extractor = FeatureExtractor(
-    model_name='osnet_x1_0',
-    model_path=None,  # Use a pretrained model
-    device='cuda'  # Use GPU if available
-)
-
-ZONE_A = (0, 0, 200, 959)  # x1,y1,x2,y2
-ZONE_B = (1079, 0, 1279, 959) 
-ZONE_C = (201, 0, 400, 959) 
-ZONE_D = (401, 0, 600, 959) 
-ZONE_E = (879, 0, 1078, 959) 
-
-person_embeddings = {}  # Format: {track_id: (embedding, timestamp, cam_id)}
-embedding_lock = threading.Lock() #To ensure only one thread accesses the embeddings at a time
-person_last_zone = {} # Format: {track_id: zone}
-person_behaviour = {} # Format: {track_id: {zone: total_duration}}
-person_metadata = {} # Format: {track_id: {age: age, gender: gender}}
-person_last_update_time = {} # Format: {track_id: {zone: timestamp_of_last_update}}
+# "auto": PyTorch on a CUDA GPU, else OpenVINO on Intel hardware, else ONNX Runtime (see engines/backends.py)
+# "torch" / "onnxruntime" / "openvino" force a backend
+INFERENCE_BACKEND = "auto"
+INT8 = False  # Post-training INT8 quantization of the exported models, calibrated on Annotation/
+YOLO_WEIGHTS = package_path('model', 'runs', 'detect', 'train', 'weights', 'best.pt')
+EXPORT_DIR = package_path('model', 'exported')  # Exported re-ID models, compiled OpenVINO / ONNX Runtime graphs
+CALIBRATION_DATA = package_path('model_training', 'data.yaml')
+CALIBRATION_IMAGES = [package_path('model_training', 'datasets', 'images')]
+ANNOTATION_DIR = package_path('Annotation')
+REID_MAX_BATCH_SIZE = 16  # Max person crops per OSNet forward pass
+
+# torch, DeepSort, the re-ID code and the inference backends are only imported by the loaders below and
+# create_tracker(), so importing this module for its helpers stays cheap
+
+def select_device():
+    import torch
+    return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+def select_inference_backend():
+    from engines.backends import select_backend
+    backend = select_backend(INFERENCE_BACKEND)
+    print(f"Inference backend: {backend}{' INT8' if INT8 and backend != 'torch' else ''}, device: {models.get('device')}")
+    return backend
+
+def load_yolo():
+    from engines.backends import load_detector
+    return load_detector(YOLO_WEIGHTS, models.get("backend"), INT8, calibration_data=CALIBRATION_DATA,
+                         calibration_images=CALIBRATION_IMAGES, annotations=ANNOTATION_DIR)
+
+def load_reid():
+    from engines.backends import load_reid_model
+    from engines.reid import BatchFeatureExtractor
+    extractor = load_reid_model(models.get("backend"), models.get("device"), EXPORT_DIR, INT8,
+                                calibration_images=CALIBRATION_IMAGES, annotations=ANNOTATION_DIR)
+    return BatchFeatureExtractor(extractor, max_batch_size=REID_MAX_BATCH_SIZE)
+
+# Every model loads on first use, start_cameras() loads the ones the cameras need in parallel beforehand
+models = ModelRegistry()
+models.register("device", select_device)
+models.register("backend", select_inference_backend)
+models.register("yolo", load_yolo)
+models.register("reid", load_reid)
+models.register("face_analyzer", create_face_analyzer)  # Inline face analysis only, the demographics workers build their own
+
+def warm_up_models():
+    names = ["yolo", "reid"] + (["face_analyzer"] if DEMOGRAPHICS_WORKERS == 0 else [])
+    models.print_report(models.warm_up(names))
+
+# "shared": one OSNet pass per detection feeds both DeepSort (through `embeds`) and the re-ID gallery
+# "double": DeepSort runs its own torchreid embedder and OSNet embeds the confirmed tracks again (previous behaviour)
+REID_EMBEDDING_MODE = "shared"
+
+# Headless: analytics only, no overlays are drawn and no frames are queued for viewers (set by start_cameras)
+HEADLESS = False
+
+def create_tracker():
+    from deep_sort_realtime.deepsort_tracker import DeepSort
+    if REID_EMBEDDING_MODE == "double":
+        return DeepSort(max_age=1, embedder="torchreid", embedder_gpu=models.get("device").type == "cuda")
+    return DeepSort(max_age=1, embedder=None)
+
+# Zones of cameras without a "zones" entry in cameras.json (x1, y1, x2, y2 at 1280x960), checked in this order
+DEFAULT_ZONES = [
+    rectangle("A", 0, 0, 200, 959, (0, 255, 0)),
+    rectangle("B", 1079, 0, 1279, 959, (0, 0, 255)),
+    rectangle("C", 201, 0, 400, 959, (255, 0, 0)),
+    rectangle("D", 401, 0, 600, 959, (0, 255, 255)),
+    rectangle("E", 879, 0, 1078, 959, (255, 0, 255)),
+]
+
+# Detection schedule: YOLO runs every 1..6 frames depending on load and scene activity, the frames
+# in between use DeepSort's Kalman prediction. Cameras can override it with "detection_interval": [min, max].
+MIN_DETECTION_INTERVAL = 1
+MAX_DETECTION_INTERVAL = 6
+
+# Memory limits for long running stores
+TRACK_TTL_SECONDS = 300  # Drop a track's zone/age state once it has not been seen for this long
+MAX_LIVE_TRACKS = 2000
+GALLERY_TTL_SECONDS = 3600  # Keep re-ID embeddings longer so returning shoppers keep their ID
+GALLERY_MAX_SIZE = 10000
+EVICTION_INTERVAL = 5  # Seconds between eviction passes
+
+def clean_metadata(meta):
+    cleaned = meta.copy()
+    cleaned.pop("AgeSamples", None)
+    cleaned.pop("GenderSamples", None)
+    cleaned.pop("LastFaceSample", None)
+    return cleaned
+
+def collect_track_records(track_ids):
+    # Current (metadata, behaviour) of the given tracks, called by the analytics writer thread
+    with track_store.lock:
+        return {
+            track_id: (
+                clean_metadata(person_metadata[track_id]) if track_id in person_metadata else None,
+                dict(person_behaviour[track_id]) if track_id in person_behaviour else None,
+            )
+            for track_id in track_ids
+        }
+
+def flush_evicted_track(track_id, behaviour, metadata):
+    # Persist the final zone durations of a track before it is dropped from memory
+    return analytics_writer.record_final(track_id, clean_metadata(metadata) if metadata else None, behaviour)
+
+clock = time.time  # Source of the zone timestamps, replays swap in the recording's own time
+
+SAVE_INTERVAL = 5  # Seconds between appends of changed tracks to temp/<kind>/<date>/<date>.jsonl
+SNAPSHOT_INTERVAL = 30  # Seconds between rewrites of the daily <date>.json files
+analytics_writer = DailyAnalyticsWriter(package_path('temp'), collect_track_records,
+                                        flush_interval=SAVE_INTERVAL, snapshot_interval=SNAPSHOT_INTERVAL)
+
+person_embeddings = EmbeddingGallery(threshold=feature_extraction_threshold, ttl=GALLERY_TTL_SECONDS, max_size=GALLERY_MAX_SIZE)  # Rows: (embedding, last_seen, cam_id) per track_id
+track_store = TrackStateStore(ttl=TRACK_TTL_SECONDS, capacity=MAX_LIVE_TRACKS, on_evict=flush_evicted_track)
+person_last_zone = track_store.last_zone # Format: {track_id: zone}
+person_behaviour = track_store.behaviour # Format: {track_id: {zone: total_duration}}
+person_metadata = track_store.metadata # Format: {track_id: {age: age, gender: gender}}
+person_last_update_time = track_store.last_update_time # Format: {track_id: {zone: timestamp_of_last_update}}
+
+def wants_face_sample(track_id):
+    with track_store.lock:
+        return track_id in person_metadata and len(person_metadata[track_id]["AgeSamples"]) < FACE_MAX_SAMPLES
+
+def record_face(track_id, face):
+    # One age / gender vote for a track, the most common answers win
+    with track_store.lock:
+        if track_id not in person_metadata:
+            return  # Evicted while its face was being analyzed
+        metadata = person_metadata[track_id]
+        metadata["AgeSamples"].append(face['age'])
+        metadata["GenderSamples"].append(face['gender'])
+        metadata["Age"] = Counter(metadata["AgeSamples"]).most_common(1)[0][0]
+        metadata["Gender"] = Counter(metadata["GenderSamples"]).most_common(1)[0][0]
+
+demographics = None
+if DEMOGRAPHICS_WORKERS > 0:
+    demographics = DemographicsPool(create_face_analyzer, wants_face_sample, record_face,
+                                    workers=DEMOGRAPHICS_WORKERS, max_pending=DEMOGRAPHICS_MAX_PENDING)
 raw_detections = {}  # Format: {track_id: (x1, y1, x2, y2)}
 
-async def process_camera(websocket, cam_id, camera_index):
-    global person_behaviour, person_last_update_time, ZONE_A, ZONE_B,ZONE_C, ZONE_D, ZONE_E, frame_size
-    tracker = DeepSort(max_age=1, embedder="torchreid", embedder_gpu=True) # Set to False for CPU
-    cap = cv2.VideoCapture(camera_index) 
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, frame_size[0]) #Set the reslution of the camera
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, frame_size[1])
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        
-        if not ret or frame is None:
-            print(f"[Camera {cam_id}] Failed to grab frame")
-            break
-        
-        print("Frame shape:", frame.shape)
-
-        results = model(frame, conf=inference_threshold)  # Threshold for confidence score for human detection
-        frame_with_yolo = results[0].plot()
-
-        cv2.putText(frame_with_yolo, f"Human Detected: {len(person_embeddings)}", (10, 40),
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
-        cv2.rectangle(frame_with_yolo, ZONE_A[:2], ZONE_A[2:], (0, 255, 0), 2)
-        cv2.putText(frame_with_yolo, "Zone A", (ZONE_A[0], ZONE_A[1] - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-
-        cv2.rectangle(frame_with_yolo, ZONE_B[:2], ZONE_B[2:], (0, 0, 255), 2)
-        cv2.putText(frame_with_yolo, "Zone B", (ZONE_B[0], ZONE_B[1] - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
-
-        cv2.rectangle(frame_with_yolo, ZONE_C[:2], ZONE_C[2:], (255, 0, 0), 2)
-        cv2.putText(frame_with_yolo, "Zone C", (ZONE_C[0], ZONE_C[1] - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
-
-        cv2.rectangle(frame_with_yolo, ZONE_D[:2], ZONE_D[2:], (0, 255, 255), 2)
-        cv2.putText(frame_with_yolo, "Zone D", (ZONE_D[0], ZONE_D[1] - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
-
-        cv2.rectangle(frame_with_yolo, ZONE_E[:2], ZONE_E[2:], (255, 0, 255), 2)
-        cv2.putText(frame_with_yolo, "Zone E", (ZONE_E[0], ZONE_E[1] - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 255), 2)
-
-        if len(results) == 0 or len(results[0].boxes) == 0:
-            # Encode frame and send over WebSocket even if no detections
-            _, buffer = cv2.imencode('.jpg', frame_with_yolo)
-            encoded_frame = base64.b64encode(buffer).decode('utf-8')
-            await websocket.send(encoded_frame)
-            continue
-
-        detections = []
-        detection_coords = []
-        for result in results:
-            for i, box in enumerate(result.boxes.xyxy):
-                x1, y1, x2, y2 = map(int, box.tolist())
-                conf = float(result.boxes.conf[i])
-                cls = int(result.boxes.cls[i])
-
-                if cls == 0:
-                    detections.append(([x1, y1, x2, y2], conf, "human"))
-                    detection_coords.append((x1, y1, x2, y2))
-
+STATS_INTERVAL = 10  # Seconds between pipeline timing exports
+pipeline_stats = {} # Format: {cam_id: PipelineStats}
+zone_maps = {} # Format: {cam_id: ZoneMap}
+
+CAMERA_CONFIG = package_path('engines', 'cameras.json')
+cameras = {} # Format: {cam_id: Camera}
+cameras_lock = threading.Lock()
+detector = None # Shared BatchDetector for all cameras
+housekeeping_stop = threading.Event()
+hubs = {} # Format: {cam_id: FrameHub}
+encoders = {} # Format: {cam_id: FrameEncoder}, shared by all viewers of a camera
+broadcast_tasks = [] # Keeps the producer tasks referenced while the server runs
+
+def export_pipeline_stats(cam_id):
+    stats = pipeline_stats[cam_id]
+    snapshot = stats.snapshot()
+    print(f"[Camera {cam_id}] Pipeline: " + ", ".join(
+        f"{stage} {values['p50_ms']}ms p50 / {values['fps']} fps" for stage, values in snapshot["stages"].items()
+    ) + f", dropped {snapshot['dropped']}")
+    base_temp_dir = package_path('temp')
+    os.makedirs(base_temp_dir, exist_ok=True)
+    stats.export(os.path.join(base_temp_dir, f"pipeline_stats_{cam_id}.json"))
+
+def evict_stale_tracks():
+    evicted_tracks = track_store.evict()
+    evicted_embeddings = person_embeddings.evict()
+    if evicted_tracks or evicted_embeddings:
+        stats = track_store.stats()
+        print(f"Evicted {len(evicted_tracks)} tracks and {len(evicted_embeddings)} embeddings. "
+              f"Live: {stats['live']}, Evicted: {stats['evicted']}, Flushed: {stats['flushed']}, "
+              f"Gallery: {len(person_embeddings)}")
+
+def zone_map_for(cam_id):
+    if cam_id not in zone_maps:
+        zone_maps[cam_id] = ZoneMap(DEFAULT_ZONES, frame_size)
+    return zone_maps[cam_id]
+
+def record_zone(track_id, current_zone):
+    # Credit the time since the previous observation to the zone the track was in, then remember the current one
+    with track_store.lock:
+        track_store.touch(track_id)
+        analytics_writer.mark_dirty(track_id)
+        last_zone = person_last_zone.get(track_id)
+
+        # increment the person_behaviour by duration of (last update time - current time)
+        if last_zone is not None and track_id in person_last_update_time and last_zone in person_last_update_time[track_id]:
+            duration = clock() - person_last_update_time[track_id][last_zone]
+
+            if track_id in person_metadata:
+                person_metadata[track_id]["InStoreDuration"] += duration
+                person_metadata[track_id]["InStoreDuration"] = round(person_metadata[track_id]["InStoreDuration"], 2)
+
+            if track_id not in person_behaviour:
+                person_behaviour[track_id] = {}
+            if last_zone not in person_behaviour[track_id]:
+                person_behaviour[track_id][last_zone] = 0.0
+            person_behaviour[track_id][last_zone] += duration
+            person_behaviour[track_id][last_zone] = round(person_behaviour[track_id][last_zone], 2)
+            print(f"Track {track_id} spent {duration:.2f} seconds in Zone {last_zone}. Total: {person_behaviour[track_id][last_zone]:.2f}")
+
+        # Update las update time for the current zone
+        if track_id not in person_last_update_time:
+            person_last_update_time[track_id] = {}
+        person_last_update_time[track_id][current_zone] = clock()
+        person_last_zone[track_id] = current_zone
+
+        # track age and gender
+        if track_id not in person_metadata:
+            person_metadata[track_id] = {
+                "Age": None,
+                "Gender": None,
+                "DateTime": datetime.now().strftime("%d%m%Y %H:%M:%S"),
+                "InStoreDuration": 0,
+                "AgeSamples": [],
+                "GenderSamples": []
+            }
+
+def process_frame(frame, tracker, cam_id):
+    # Detection -> tracking -> zone / face analytics -> re-ID for a single frame, returns the annotated frame
+    results = models.get("yolo")(frame, conf=inference_threshold)  # Threshold for confidence score for human detection
+    overlay = analyze_frame(frame, results, tracker, cam_id)
+    return frame if overlay is None else render(frame, overlay, zone_map_for(cam_id))
+
+def analyze_frame(frame, results, tracker, cam_id, timestamp=None):
+    # Tracking -> zone / face analytics -> re-ID on a frame whose YOLO results are already known.
+    # Returns the FrameOverlay to draw if the frame is sent to a viewer, None in headless mode.
+
+    overlay = None if HEADLESS else FrameOverlay()
+    zone_map = zone_map_for(cam_id)
+
+    if len(results) == 0 or len(results[0].boxes) == 0:
+        # Still send the frame over WebSocket even if no detections
+        if overlay is not None:
+            overlay.people_count = len(person_embeddings)
+        return overlay
+
+    detections = []
+    detection_coords = []
+    for result in results:
+        for i, box in enumerate(result.boxes.xyxy):
+            x1, y1, x2, y2 = map(int, box.tolist())
+            conf = float(result.boxes.conf[i])
+            cls = int(result.boxes.cls[i])
+
+            if cls == 0:
+                detections.append(([x1, y1, x2, y2], conf, "human"))
+                detection_coords.append((x1, y1, x2, y2))
+                if overlay is not None:
+                    overlay.detections.append((x1, y1, x2, y2, conf))
+
+    reid_start_time = time.perf_counter()
+    detection_embeddings = None
+    if REID_EMBEDDING_MODE == "double":
         tracked_objects = tracker.update_tracks(detections, frame=frame)
-
-        for i, track in enumerate(tracked_objects):
-            if track.is_confirmed() and i < len(detection_coords):
-                track_id = track.track_id
-                x1, y1, x2, y2 = detection_coords[i]
-                box_width = x2 - x1
-                center_x = int((x1 + x2) / 2)
-                center_y = int((y1 + y2) / 2)
-
-                cv2.circle(frame_with_yolo, (center_x, center_y), 5, (255, 255, 0), -1)
-
-                # Determine current zone
-                current_zone = None
-                if ZONE_A[0] <= center_x <= ZONE_A[2] and ZONE_A[1] <= center_y <= ZONE_A[3]:
-                    current_zone = 'A'
-                elif ZONE_B[0] <= center_x <= ZONE_B[2] and ZONE_B[1] <= center_y <= ZONE_B[3]:
-                    current_zone = 'B'
-                elif ZONE_C[0] <= center_x <= ZONE_C[2] and ZONE_C[1] <= center_y <= ZONE_C[3]:
-                    current_zone = 'C'
-                elif ZONE_D[0] <= center_x <= ZONE_D[2] and ZONE_D[1] <= center_y <= ZONE_D[3]:
-                    current_zone = 'D'
-                elif ZONE_E[0] <= center_x <= ZONE_E[2] and ZONE_E[1] <= center_y <= ZONE_E[3]:
-                    current_zone = 'E'
-                else:
-                    current_zone = 'none'
-
-                # Check for zone change and update duration
-                if current_zone is not None:
-                    last_zone = person_last_zone.get(track_id)
-                    
-                    # increment the person_behaviour by duration of (last update time - current time)
-                    if last_zone is not None and track_id in person_last_update_time and last_zone in person_last_update_time[track_id]:
-                        duration = time.time() - person_last_update_time[track_id][last_zone]
-
-                        if track_id in person_metadata:
-                            person_metadata[track_id]["InStoreDuration"] += duration
-                            person_metadata[track_id]["InStoreDuration"] = round(person_metadata[track_id]["InStoreDuration"], 2)
-
-                        if track_id not in person_behaviour:
-                            person_behaviour[track_id] = {}
-                        if last_zone not in person_behaviour[track_id]:
-                            person_behaviour[track_id][last_zone] = 0.0
-                        person_behaviour[track_id][last_zone] += duration
-                        person_behaviour[track_id][last_zone] = round(person_behaviour[track_id][last_zone], 2)
-                        print(f"Track {track_id} spent {duration:.2f} seconds in Zone {last_zone}. Total: {person_behaviour[track_id][last_zone]:.2f}")
-
-                    # Update las update time for the current zone
-                    if track_id not in person_last_update_time:
-                        person_last_update_time[track_id] = {}
-                    person_last_update_time[track_id][current_zone] = time.time()
-                    person_last_zone[track_id] = current_zone
-                    
-                    # track age and gender
-                    if track_id not in person_metadata:
-                        person_metadata[track_id] = {
-                            "Age": None,
-                            "Gender": None,
-                            "DateTime": datetime.now().strftime("%d%m%Y %H:%M:%S"),
-                            "InStoreDuration": 0,
-                            "AgeSamples": [],
-                            "GenderSamples": []
-                        }
-
-                    if len(person_metadata[track_id]["AgeSamples"]) < 10:
-                        face_info = detect_and_analyze_face(frame, frame_with_yolo, x1, y1, x2, y2)
-                        if face_info:
-                            detected_age = face_info[0]['age']
-                            detected_gender = face_info[0]['gender']
-
-                            person_metadata[track_id]["AgeSamples"].append(detected_age)
-                            person_metadata[track_id]["GenderSamples"].append(detected_gender)
-                            
-                            person_metadata[track_id]["Age"] = Counter(person_metadata[track_id]["AgeSamples"]).most_common(1)[0][0]
-                            person_metadata[track_id]["Gender"] = Counter(person_metadata[track_id]["GenderSamples"]).most_common(1)[0][0]
-
-                
+    else:
+        # Embed every detection once, the same vectors are reused for the gallery below
+        detection_crops = [frame[max(y1, 0):y2, max(x1, 0):x2] for x1, y1, x2, y2 in detection_coords]
+        valid = [i for i, crop in enumerate(detection_crops) if crop.size != 0]
+        detections = [detections[i] for i in valid]
+        detection_coords = [detection_coords[i] for i in valid]
+        detection_embeddings = l2_normalize(models.get("reid")([detection_crops[i] for i in valid])) if valid else []
+        tracked_objects = tracker.update_tracks(detections, embeds=list(detection_embeddings))
+    reid_elapsed = time.perf_counter() - reid_start_time
+    camera = cameras.get(cam_id)
+    if camera is not None and camera.scheduler is not None:
+        camera.scheduler.observe_tracks(tracked_objects)
+        if timestamp is not None:
+            camera.scheduler.record_update(timestamp)
+    stats = pipeline_stats.get(cam_id)
+    if stats is not None:
+        stats.record("tracking", reid_elapsed)
+
+    # Zone of every detection's center in one lookup of the camera's label mask
+    zones_start_time = time.perf_counter()
+    detection_zones = zone_map.lookup([((x1 + x2) // 2, (y1 + y2) // 2) for x1, y1, x2, y2 in detection_coords], frame.shape)
+    face_requests = []  # (track_id, person box) of the tracks due for an age / gender sample
+    frame_tracks = []  # (track_id, x1, y1, current_zone) for every confirmed track
+    reid_indices = []
+    reid_inputs = []
+    for i, track in enumerate(tracked_objects):
+        if track.is_confirmed() and i < len(detection_coords):
+            track_id = f"{cam_id}-{track.track_id}"  # Track IDs are only unique within one camera's tracker
+            x1, y1, x2, y2 = detection_coords[i]
+            center_x = int((x1 + x2) / 2)
+            center_y = int((y1 + y2) / 2)
+
+            current_zone = detection_zones[i]
+
+            with track_store.lock:
+                record_zone(track_id, current_zone)
+
+                # Sample each track's face at most every FACE_SAMPLE_INTERVAL seconds until it has enough votes
+                metadata = person_metadata[track_id]
+                if (len(metadata["AgeSamples"]) < FACE_MAX_SAMPLES
+                        and clock() - metadata.get("LastFaceSample", 0) >= FACE_SAMPLE_INTERVAL):
+                    metadata["LastFaceSample"] = clock()
+                    face_requests.append((track_id, (x1, y1, x2, y2)))
+
+            if detection_embeddings is not None:
+                reid_indices.append(len(frame_tracks))
+                reid_inputs.append(i)  # Index of the detection embedding computed before tracking
+            else:
                 person_crop = frame[y1:y2, x1:x2]
-                
                 if person_crop.size != 0:
-                    embedding = extractor(person_crop)
-                    embedding = embedding[0]
-
-                    best_match_id = None
-                    best_similarity = float("inf")
-
-                    with embedding_lock:
-                        for existing_id, stored_embedding in person_embeddings.items():
-                            similarity = cosine(embedding.cpu(), stored_embedding.cpu())
-                            if similarity < feature_extraction_threshold and similarity < best_similarity: # Threshold for similarity (lower = more similar)
-                                best_match_id = existing_id
-                                best_similarity = similarity
-
-                        if best_match_id is not None:
-                            track_id = best_match_id
-                        else:
-                            person_embeddings[track_id] = embedding
-                            cv2.putText(frame_with_yolo, f"Human Detected: {len(person_embeddings)}", (10, 40),
-                                        cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
-
-                cv2.putText(frame_with_yolo, f"ID: {track_id}", (x1+50, y1 - 70),
-                            cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
-                
-                # Display the current duration in the zone
-                if current_zone is not None and track_id in person_behaviour and current_zone in person_behaviour[track_id]:
-                    current_stay_duration = person_behaviour[track_id][current_zone]
-                    cv2.putText(frame_with_yolo, f"Duration: {current_zone} {current_stay_duration:.2f}s", (x1+50, y1 - 40), 
-                                cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
-                else:
-                    # If not currently in a zone or no entry time recorded, display 0.0s
-                    cv2.putText(frame_with_yolo, f"Duration: 0.00s", (x1+150, y1 + 10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
-                              
-        # Encode frame and send over WebSocket
-        _, buffer = cv2.imencode('.jpg', frame_with_yolo)
-        encoded_frame = base64.b64encode(buffer).decode('utf-8')
-        await websocket.send(encoded_frame)
-
-        cleaned_person_behaviour = [meta.copy() for meta in person_behaviour.values()]
-        print("Person Behaviour:", cleaned_person_behaviour)
-
-        cleaned_person_metadata = [meta.copy() for meta in person_metadata.values()]
-        for meta in cleaned_person_metadata:
-            del meta["AgeSamples"]
-            del meta["GenderSamples"]
-        print("Person Metadata:", cleaned_person_metadata)
-
-        today = datetime.now().strftime("%d%m%Y")
-
-        script_dir = os.path.dirname(__file__)
-        base_temp_dir = os.path.join(script_dir, '..', 'temp')
-
-        customer_dir = os.path.join(base_temp_dir, 'customer', today)
-        visit_zone_dir = os.path.join(base_temp_dir, 'visit_zone', today)
-
-        if not os.path.exists(customer_dir):
-            os.makedirs(customer_dir, exist_ok=True)
-            open(os.path.join(customer_dir, "log.txt"), "w").close()
-
-
-        if not os.path.exists(visit_zone_dir):
-            os.makedirs(visit_zone_dir, exist_ok=True)
-            open(os.path.join(visit_zone_dir, "log.txt"), "w").close()
-
-        customer_file_path = os.path.join(customer_dir, f"{today}.json")
-        with open(customer_file_path, "w") as f:
-            json.dump(cleaned_person_metadata, f, indent=4)
-
-        visit_zone_file_path = os.path.join(visit_zone_dir, f"{today}.json")
-        with open(visit_zone_file_path, "w") as f:
-            json.dump(cleaned_person_behaviour, f, indent=4)
-
-    cap.release()
-
+                    reid_indices.append(len(frame_tracks))
+                    reid_inputs.append(person_crop)
+
+            frame_tracks.append((track_id, x1, y1, (center_x, center_y), current_zone))
+
+    if stats is not None:
+        stats.record("zones", time.perf_counter() - zones_start_time)
+
+    # Faces of all sampled tracks of this frame in one batch per network, on the demographics workers when there are any
+    if face_requests and demographics is not None:
+        demographics.submit(frame, face_requests, stats)
+    elif face_requests:
+        face_start_time = time.perf_counter()
+        faces = models.get("face_analyzer").analyze(frame, [box for _, box in face_requests])
+        for (track_id, _), face in zip(face_requests, faces):
+            if face is not None:
+                record_face(track_id, face)
+                if overlay is not None:
+                    overlay.faces.append((face['bbox'], f"{face['gender']}, {face['age']}"))
+        if stats is not None:
+            stats.record("face", time.perf_counter() - face_start_time)
+
+    # Embed all crops of this frame together and match them against the gallery in one batched lookup
+    if reid_inputs:
+        match_start_time = time.perf_counter()
+        if detection_embeddings is not None:
+            reid_embeddings = detection_embeddings[reid_inputs]
+        else:
+            reid_embeddings = models.get("reid")(reid_inputs)
+        resolved_ids, _ = person_embeddings.match_or_add(
+            [frame_tracks[j][0] for j in reid_indices], reid_embeddings, cam_id)
+        for j, resolved_id in zip(reid_indices, resolved_ids):
+            frame_tracks[j] = (resolved_id,) + frame_tracks[j][1:]
+        if stats is not None:
+            stats.record("reid", time.perf_counter() - match_start_time)
+
+    if overlay is None:
+        return None
+    overlay.people_count = len(person_embeddings)
+    for track_id, x1, y1, center, current_zone in frame_tracks:
+        # Current duration in the zone, None if not currently in a zone or no entry time recorded
+        duration = person_behaviour.get(track_id, {}).get(current_zone) if current_zone is not None else None
+        overlay.tracks.append((track_id, x1, y1, center, current_zone, duration))
+    return overlay
+
+def analyze_predicted_frame(frame, prediction, tracker, cam_id):
+    # Frames the detection schedule skipped: move the confirmed tracks along their Kalman prediction
+    overlay = None if HEADLESS else FrameOverlay()
+    zone_map = zone_map_for(cam_id)
+
+    start_time = time.perf_counter()
+    # Kalman velocities are per tracker update, the scheduler converts the frame's capture time into updates
+    camera = cameras.get(cam_id)
+    steps = camera.scheduler.steps(prediction.timestamp) if camera is not None and camera.scheduler is not None else 0.0
+    tracks = [track for track in tracker.tracker.tracks if track.is_confirmed() and track.time_since_update == 0]
+    boxes = [tuple(map(int, predicted_ltrb(track, steps))) for track in tracks]
+    zones = zone_map.lookup([((x1 + x2) // 2, (y1 + y2) // 2) for x1, y1, x2, y2 in boxes], frame.shape)
+    for track, (x1, y1, x2, y2), current_zone in zip(tracks, boxes, zones):
+        track_id = f"{cam_id}-{track.track_id}"
+        record_zone(track_id, current_zone)
+        if overlay is not None:
+            overlay.predicted.append((track_id, x1, y1, x2, y2))
+
+    stats = pipeline_stats.get(cam_id)
+    if stats is not None:
+        stats.record("prediction", time.perf_counter() - start_time)
+    if overlay is not None:
+        overlay.people_count = len(person_embeddings)
+    return overlay
+
+def analyze_camera_frame(frame, result, camera, timestamp):
+    # (frame, FrameOverlay) for the broadcast, None in headless mode so nothing is queued for viewers
+    if isinstance(result, Prediction):
+        overlay = analyze_predicted_frame(frame, result, camera.tracker, camera.cam_id)
+    else:
+        overlay = analyze_frame(frame, [result], camera.tracker, camera.cam_id, timestamp)
+    return None if overlay is None else (frame, overlay)
+
+def housekeeping_loop(stop_event):
+    # Periodic eviction and pipeline timing export for all cameras
+    last_stats_time = time.time()
+    while not stop_event.wait(EVICTION_INTERVAL):
+        evict_stale_tracks()
+        if time.time() - last_stats_time >= STATS_INTERVAL:
+            for cam_id in cameras:
+                export_pipeline_stats(cam_id)
+            last_stats_time = time.time()
+
+def start_cameras(config_path=CAMERA_CONFIG, headless=False):
+    # Start every camera of the registry, all of them share one batched YOLO worker. Safe to call more than once.
+    # Headless cameras only run the analytics: no overlays, no annotated frames, nothing to broadcast.
+    global detector, HEADLESS
+    with cameras_lock:
+        if cameras:
+            return cameras
+        HEADLESS = headless
+
+        for camera_config in load_camera_config(config_path):
+            min_interval, max_interval = camera_config.get("detection_interval", (MIN_DETECTION_INTERVAL, MAX_DETECTION_INTERVAL))
+            camera = Camera(camera_config["cam_id"], camera_config["source"], create_tracker(), camera_config["frame_size"],
+                            scheduler=DetectionScheduler(min_interval, max_interval))
+            cameras[camera.cam_id] = camera
+            pipeline_stats[camera.cam_id] = camera.stats
+            zone_maps[camera.cam_id] = ZoneMap(camera_config.get("zones") or DEFAULT_ZONES, camera_config["frame_size"])
+        print(f"Starting {len(cameras)} camera(s): {list(cameras)}")
+        warm_up_models()
+
+        detector = BatchDetector(models.get("yolo"), list(cameras.values()), inference_threshold)
+        detector.start()
+        for camera in cameras.values():
+            camera.start(analyze_camera_frame, on_frame=detector.frame_ready.set)
+
+        threading.Thread(target=housekeeping_loop, args=(housekeeping_stop,), daemon=True).start()
+        analytics_writer.start()
+        if demographics is not None:
+            demographics.start()
+            for camera in cameras.values():
+                camera.stats.watch_queue("demographics", demographics.jobs)
+        return cameras
+
+def stop_cameras():
+    with cameras_lock:
+        housekeeping_stop.set()
+        for camera in cameras.values():
+            camera.stop()
+        if detector is not None:
+            detector.stop()
+        if demographics is not None:
+            demographics.stop()
+        analytics_writer.stop()
+
+async def broadcast_camera(camera, hub):
+    # Single producer per camera: fan each new analyzed frame out to all viewers, the overlay is drawn and
+    # encoded only when a viewer actually sends the frame
+    loop = asyncio.get_running_loop()
+    # The blocking gets wait on a thread of their own, the default executor stays free for the viewers' encodes
+    waiter = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"broadcast-{camera.cam_id}")
+    frame_id = 0
+    try:
+        while True:
+            item = await loop.run_in_executor(waiter, camera.processed.get, 1.0)
+            if item is None:
+                if camera.processed.closed:
+                    break
+                continue
+            if len(hub) == 0:
+                continue  # Nobody is watching, analytics keep running but there is nothing to send
+
+            frame_id += 1
+            frame, overlay = item
+            hub.publish((frame_id, frame, overlay))
+    finally:
+        waiter.shutdown(wait=False)
+
+async def start_broadcast():
+    # Start the cameras and one broadcast task per camera on the running event loop
+    for cam_id, camera in start_cameras().items():
+        if cam_id not in hubs:
+            hubs[cam_id] = FrameHub()
+            encoders[cam_id] = FrameEncoder()
+            broadcast_tasks.append(asyncio.create_task(broadcast_camera(camera, hubs[cam_id])))
+    return hubs
+
+async def read_viewer_settings(websocket, settings):
+    # Clients may renegotiate format / width / quality / max_fps at any time with a JSON text message
+    try:
+        async for message in websocket:
+            if isinstance(message, str) and settings.update(message):
+                print(f"Viewer {websocket.remote_address} settings: {vars(settings)}")
+    except Exception:
+        pass  # Connection closed, the send loop notices on its next frame
+
+async def watch_camera(websocket, cam_id):
+    # Subscribe a viewer to a camera's hub, connecting or disconnecting never touches the pipeline
+    hub = hubs[cam_id]
+    encoder = encoders[cam_id]
+    zone_map = zone_map_for(cam_id)
+    stats = cameras[cam_id].stats
+    settings = StreamSettings()
+    quality = AdaptiveQuality(settings)
+    reader = asyncio.create_task(read_viewer_settings(websocket, settings))
+    loop = asyncio.get_running_loop()
+    last_sent_time = 0
+
+    queue = hub.subscribe()
+    print(f"[Camera {cam_id}] Viewer joined, {len(hub)} watching")
+    try:
+        while True:
+            frame_id, frame, overlay = await queue.get()
+            if settings.max_fps and time.time() - last_sent_time < 1.0 / settings.max_fps:
+                continue
+            if not quality.ready(send_buffer_size(websocket)):
+                continue  # Client is still behind, skip this frame rather than queueing it
+
+            start_time = time.perf_counter()
+            data = await loop.run_in_executor(None, encoder.encode, frame_id, frame, settings.format, settings.width,
+                                              quality.encode_quality, lambda frame: render(frame, overlay, zone_map))
+            stats.record("encode", time.perf_counter() - start_time)
+            if not settings.binary:
+                data = base64.b64encode(data).decode('utf-8')
+
+            await websocket.send(data)
+            last_sent_time = time.time()
+    finally:
+        reader.cancel()
+        hub.unsubscribe(queue)
+        print(f"[Camera {cam_id}] Viewer left, {len(hub)} watching")
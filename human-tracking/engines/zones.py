@@ -0,0 +1,94 @@
+import threading
+import numpy as np
+import cv2
+
+NO_ZONE = "none"  # Name of everything outside the configured zones, as stored in person_behaviour
+
+
+def rectangle(name, x1, y1, x2, y2, color):
+    """Zone config entry for an axis-aligned rectangle (corners inclusive)"""
+    return {"name": name, "polygon": [[x1, y1], [x2, y1], [x2, y2], [x1, y2]], "color": list(color)}
+
+
+class ZoneMap:
+    """Polygon zones of one camera, rasterized once into a label mask.
+
+    `zones` is a list of {"name", "polygon": [[x, y], ...], "color": [b, g, r]}
+    in the coordinates of `frame_size`. Where zones overlap, the one listed first
+    wins. Frames of another size get their own mask with the polygons scaled, so
+    a camera that ignores the requested resolution still gets the right zones.
+    The outlines and labels are rendered once per frame size and composited
+    onto each frame instead of being redrawn.
+    """
+
+    def __init__(self, zones, frame_size=(1280, 960), fill_alpha=0.0, thickness=2):
+        self.zones = zones
+        self.names = np.array([NO_ZONE] + [zone["name"] for zone in zones], dtype=object)
+        self.frame_size = tuple(frame_size)
+        self.fill_alpha = fill_alpha  # > 0 also tints the inside of each zone
+        self.thickness = thickness
+        self._layers = {}  # Format: {(height, width): (labels, overlay, line_mask, fill)}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.zones)
+
+    def _polygons(self, height, width):
+        scale = np.array([width / self.frame_size[0], height / self.frame_size[1]])
+        return [np.round(np.array(zone["polygon"], dtype=np.float64) * scale).astype(np.int32) for zone in self.zones]
+
+    def _layer(self, height, width):
+        layer = self._layers.get((height, width))
+        if layer is not None:
+            return layer
+
+        with self._lock:
+            if (height, width) in self._layers:
+                return self._layers[(height, width)]
+
+            polygons = self._polygons(height, width)
+            labels = np.zeros((height, width), dtype=np.uint8 if len(self.zones) < 255 else np.uint16)
+            # Last zone first, so earlier zones overwrite later ones where they overlap
+            for label in range(len(polygons), 0, -1):
+                cv2.fillPoly(labels, [polygons[label - 1]], label)
+                cv2.polylines(labels, [polygons[label - 1]], True, label, 1)  # Boundary pixels belong to the zone
+
+            overlay = np.zeros((height, width, 3), dtype=np.uint8)
+            line_mask = np.zeros((height, width), dtype=np.uint8)
+            for zone, polygon in zip(self.zones, polygons):
+                color = tuple(int(c) for c in zone.get("color", (0, 255, 0)))
+                x, y = polygon[:, 0].min(), polygon[:, 1].min()
+                for target, value in ((overlay, color), (line_mask, 255)):
+                    cv2.polylines(target, [polygon], True, value, self.thickness)
+                    cv2.putText(target, f"Zone {zone['name']}", (int(x), int(y) - 10),
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, value, 2)
+
+            fill = None
+            if self.fill_alpha > 0:
+                palette = np.array([(0, 0, 0)] + [zone.get("color", (0, 255, 0)) for zone in self.zones], dtype=np.uint8)
+                fill_mask = ((labels > 0) & (line_mask == 0)).astype(np.uint8)
+                fill = (palette[labels], fill_mask)
+
+            layer = (labels, overlay, line_mask, fill)
+            self._layers[(height, width)] = layer
+            return layer
+
+    def lookup(self, points, frame_shape):
+        """Zone name for each (x, y) point of a frame with `frame_shape`, one vectorized mask read"""
+        height, width = frame_shape[:2]
+        labels = self._layer(height, width)[0]
+        points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+        if len(points) == 0:
+            return []
+        x = np.clip(points[:, 0], 0, width - 1)
+        y = np.clip(points[:, 1], 0, height - 1)
+        return self.names[labels[y, x]].tolist()
+
+    def draw(self, frame):
+        """Composite the cached zone layer onto `frame` in place"""
+        _, overlay, line_mask, fill = self._layer(*frame.shape[:2])
+        if fill is not None:
+            tinted = cv2.addWeighted(frame, 1 - self.fill_alpha, fill[0], self.fill_alpha, 0)
+            cv2.copyTo(tinted, fill[1], frame)
+        cv2.copyTo(overlay, line_mask, frame)
+        return frame
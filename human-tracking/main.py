@@ -1,11 +1,7 @@
 import engines.zone as engine
-import threading
-import engines.zone as engine
 from engines.s3datasync import S3DataSync
 import threading
-import subprocess
-import sys
-import os
+import time
 
 
 # Start S3 sync service
@@ -13,8 +9,11 @@ s3_sync = S3DataSync()  # Create instance
 s3_thread = threading.Thread(target=s3_sync.run, daemon=True)  # Create thread
 s3_thread.start()  # Start the thread
 
-thread0 = threading.Thread(target=engine.process_camera, args=(0, 0))
-
-thread0.start()
+# Start every camera from engines/cameras.json without a viewer: analytics only, nothing is drawn or encoded
+engine.start_cameras(headless=True)
 
-thread0.join()
\ No newline at end of file
+try:
+    while True:
+        time.sleep(1)
+except KeyboardInterrupt:
+    engine.stop_cameras()
@@ -0,0 +1,252 @@
+import os
+import re
+import sys
+import glob
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+import cv2
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import engines.zone as engine
+from engines.cameras import Camera
+from engines.pipeline import PipelineStats
+from engines.schedule import DetectionScheduler
+
+# Offline replay: recorded video files or image sequences go through the same
+# detection -> tracking -> zone -> face -> re-ID code as the live cameras, as fast
+# as possible and without dropping frames, and the timings are written as JSON.
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+STAGES = ["read", "detection", "analytics", "tracking", "zones", "face", "reid", "prediction", "publish"]
+PERCENTILES = [50, 90, 95, 99]
+
+
+def natural_key(path):
+    # 2.jpg sorts before 10.jpg
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", os.path.basename(path))]
+
+
+def image_paths(source, annotations=None):
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source) if name.lower().endswith(IMAGE_EXTENSIONS)]
+    else:
+        paths = [path for path in glob.glob(source, recursive=True) if path.lower().endswith(IMAGE_EXTENSIONS)]
+
+    if annotations is not None:
+        # Only the frames that have a YOLO label file, e.g. the ones that go with Annotation/
+        labelled = {os.path.splitext(name)[0] for name in os.listdir(annotations) if name.endswith(".txt")}
+        paths = [path for path in paths if os.path.splitext(os.path.basename(path))[0] in labelled]
+    return sorted(paths, key=natural_key)
+
+
+def iter_frames(source, annotations=None, limit=None, fps=30.0):
+    """Yield (frame, read_seconds, timestamp) from a video file, an image folder or a glob of images.
+
+    Timestamps are seconds into the recording, image sequences are assumed to be shot at `fps`.
+    """
+    count = 0
+    if os.path.isfile(source) and not source.lower().endswith(IMAGE_EXTENSIONS):
+        cap = cv2.VideoCapture(source)
+        fps = cap.get(cv2.CAP_PROP_FPS) or fps
+        try:
+            while limit is None or count < limit:
+                start_time = time.perf_counter()
+                ret, frame = cap.read()
+                if not ret or frame is None:
+                    break
+                yield frame, time.perf_counter() - start_time, count / fps
+                count += 1
+        finally:
+            cap.release()
+        return
+
+    for path in image_paths(source, annotations):
+        if limit is not None and count >= limit:
+            break
+        start_time = time.perf_counter()
+        frame = cv2.imread(path)
+        if frame is None:
+            print(f"Skipping unreadable frame {path}")
+            continue
+        yield frame, time.perf_counter() - start_time, count / fps
+        count += 1
+
+
+def batched(frames, batch_size):
+    batch = []
+    for item in frames:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def peak_memory_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def build_report(stats, sources, frames, elapsed, batch_size, scheduler):
+    stages = {}
+    for stage in STAGES:
+        durations = np.array(stats.durations(stage)) * 1000
+        if len(durations) == 0:
+            continue
+        stages[stage] = {"frames": len(durations), "avg_ms": round(float(durations.mean()), 2)}
+        for q in PERCENTILES:
+            stages[stage][f"p{q}_ms"] = round(float(np.percentile(durations, q)), 2)
+        stages[stage]["max_ms"] = round(float(durations.max()), 2)
+
+    return {
+        "sources": sources,
+        "frames": frames,
+        "batch_size": batch_size,
+        "elapsed_s": round(elapsed, 3),
+        "fps": round(frames / elapsed, 2) if elapsed > 0 else 0.0,
+        "peak_memory_mb": peak_memory_mb(),
+        "device": str(engine.models.get("device")),
+        "backend": engine.models.get("backend"),
+        "model_load_s": engine.models.report(),
+        "reid_mode": engine.REID_EMBEDDING_MODE,
+        "stages": stages,
+        "schedule": scheduler.stats(),
+        "demographics": engine.demographics.stats() if engine.demographics is not None else None,
+        "tracks": engine.track_store.stats(),
+        "gallery": len(engine.person_embeddings),
+    }
+
+
+def replay(sources, cam_id=0, batch_size=1, annotations=None, limit=None, publish=None,
+           detection_interval=(1, 1), fps=30.0):
+    """Run every frame of `sources` through the pipeline in order, `publish(frame_id, frame, overlay)` is optional.
+
+    `detection_interval` is the (min, max) YOLO schedule, (1, 1) detects on every frame. Zone
+    durations are measured on the recording's clock, so they are comparable between schedules.
+    """
+    stats = PipelineStats(window=None)  # Keep every sample, percentiles cover the whole replay
+    # The load part of the schedule treats the recording as a live camera at its frame rate
+    scheduler = DetectionScheduler(*detection_interval, frame_period=1.0 / fps)
+    camera = Camera(cam_id, sources[0], engine.create_tracker(), scheduler=scheduler)
+    camera.stats = stats
+    engine.cameras[cam_id] = camera
+    engine.pipeline_stats[cam_id] = stats
+
+    frames = 0
+    offset = 0.0  # Recording time where the current source starts
+    timestamp = 0.0
+    live_clock = engine.clock
+    engine.clock = lambda: offset + timestamp
+    live_headless = engine.HEADLESS
+    engine.HEADLESS = publish is None  # Without viewers the replay measures the headless analytics cost
+    engine.warm_up_models()  # Loading the models is not part of the replay time
+    if engine.demographics is not None:
+        engine.demographics.start()
+    start_time = time.perf_counter()
+    try:
+        for source in sources:
+            for batch in batched(iter_frames(source, annotations, None if limit is None else limit - frames, fps), batch_size):
+                for _, read_seconds, _ in batch:
+                    stats.record("read", read_seconds)
+
+                # Schedule first, then one YOLO call for the frames that need it, like the shared BatchDetector
+                plan = [None if scheduler.should_detect(frame, offset + frame_time) else scheduler.prediction()
+                        for frame, _, frame_time in batch]
+                detect = [frame for (frame, _, _), prediction in zip(batch, plan) if prediction is None]
+                results = iter([])
+                if detect:
+                    detection_start = time.perf_counter()
+                    results = iter(engine.models.get("yolo")(detect, conf=engine.inference_threshold))
+                    detection_elapsed = (time.perf_counter() - detection_start) / len(detect)
+                    scheduler.record_detection(detection_elapsed)
+
+                # Tracking strictly in frame order
+                for (frame, _, timestamp), prediction in zip(batch, plan):
+                    analytics_start = time.perf_counter()
+                    if prediction is None:
+                        stats.record("detection", detection_elapsed)
+                        overlay = engine.analyze_frame(frame, [next(results)], camera.tracker, cam_id, offset + timestamp)
+                    else:
+                        overlay = engine.analyze_predicted_frame(frame, prediction, camera.tracker, cam_id)
+                    stats.record("analytics", time.perf_counter() - analytics_start)
+                    frames += 1
+
+                    if publish is not None:
+                        publish_start = time.perf_counter()
+                        publish(frames, frame, overlay)
+                        stats.record("publish", time.perf_counter() - publish_start)
+            offset += timestamp + 1.0 / fps
+            timestamp = 0.0
+        if engine.demographics is not None:
+            engine.demographics.stop()  # Queued face jobs count towards the replay time
+    finally:
+        engine.clock = live_clock
+        engine.HEADLESS = live_headless
+        engine.cameras.pop(cam_id, None)
+    elapsed = time.perf_counter() - start_time
+    return build_report(stats, sources, frames, elapsed, batch_size, scheduler)
+
+
+async def replay_with_viewers(sources, port, **kwargs):
+    # Same websocket endpoint as websocket_server.py, fed by the replay instead of a live camera
+    import websockets
+    from websocket_server import handler
+    from engines.hub import FrameHub
+    from engines.stream import FrameEncoder
+
+    cam_id = kwargs.get("cam_id", 0)
+    loop = asyncio.get_running_loop()
+    engine.hubs[cam_id] = hub = FrameHub()
+    engine.encoders[cam_id] = FrameEncoder()
+
+    def publish(frame_id, frame, overlay):
+        if len(hub):
+            loop.call_soon_threadsafe(hub.publish, (frame_id, frame, overlay))
+
+    server = await websockets.serve(handler, "0.0.0.0", port)
+    print(f"WebSocket server started on ws://0.0.0.0:{port}/{cam_id}")
+    try:
+        return await loop.run_in_executor(None, lambda: replay(sources, publish=publish, **kwargs))
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded video or image sequences through the zone engine")
+    parser.add_argument("sources", nargs="+", help="Video files, image folders or image globs (e.g. 'datasets/images/**/*.jpg')")
+    parser.add_argument("--annotations", default=None, help="Only replay images with a label file here, e.g. Annotation")
+    parser.add_argument("--batch", type=int, default=1, help="Frames per YOLO call")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many frames")
+    parser.add_argument("--cam-id", type=int, default=0)
+    parser.add_argument("--detection-interval", type=int, nargs=2, default=[1, 1], metavar=("MIN", "MAX"),
+                        help="Frames between YOLO runs, e.g. 1 6 for the adaptive live schedule")
+    parser.add_argument("--fps", type=float, default=30.0, help="Frame rate of image sequences")
+    parser.add_argument("--websocket", type=int, default=None, metavar="PORT", help="Also stream the annotated frames")
+    parser.add_argument("--output", default=None, help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    options = dict(cam_id=args.cam_id, batch_size=args.batch, annotations=args.annotations, limit=args.limit,
+                   detection_interval=tuple(args.detection_interval), fps=args.fps)
+    if args.websocket is not None:
+        report = asyncio.run(replay_with_viewers(args.sources, args.websocket, **options))
+    else:
+        report = replay(args.sources, **options)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"Replayed {report['frames']} frames at {report['fps']} fps, report written to {args.output}")
+    else:
+        print(json.dumps(report, indent=4))
@@ -1,50 +1,109 @@
 import os
 import json
-import random
+import argparse
+import numpy as np
 from datetime import datetime, timedelta
 
 AGE_LIST = ['(0-2)', '(4-6)', '(8-12)', '(15-20)', '(25-32)', '(38-43)', '(48-53)', '(60-100)']
+AGE_WEIGHTS = [0.03, 0.05, 0.07, 0.14, 0.25, 0.22, 0.14, 0.10]
 GENDER_LIST = ["Male", "Female"]
+UNKNOWN_FACE_RATE = 0.08  # Tracks that never showed a usable face keep Age / Gender None, like zone.py
 
-# Output folder
-output_dir = "synthetic_data"
-os.makedirs(output_dir, exist_ok=True)
-
-# Start date: first day of 2024
-start_date = datetime(2024, 1, 1)
-# End date: today
-end_date = datetime.now()
-
-# Calculate number of days between start and today
-total_days = (end_date - start_date).days + 1  # include today
-
-# Generate JSON files
-for i in range(total_days):
-    current_date = start_date + timedelta(days=i)
-    date_str = current_date.strftime("%d%m%Y")   # e.g. "01012024"
-    
-    # Generate random records for the day
-    day_data = []
-    for _ in range(random.randint(5, 20)):  # 5–20 entries per file
-        # Random time within the day
-        random_time = current_date.replace(
-            hour=random.randint(0, 23),
-            minute=random.randint(0, 59),
-            second=random.randint(0, 59)
-        )
-        datetime_str = random_time.strftime("%d%m%Y %H:%M:%S")
-
-        entry = {
-            "Age": random.choice(AGE_LIST),
-            "Gender": random.choice(GENDER_LIST),
-            "DateTime": datetime_str,
-            "InStoreDuration": round(random.uniform(0.1, 120.0), 2)  # duration in minutes
+# Zone names as zone.py assigns them ('none' = outside every zone rectangle)
+ZONES = ['A', 'B', 'C', 'D', 'E', 'none']
+ZONE_VISIT_PROBABILITY = np.array([0.45, 0.35, 0.55, 0.40, 0.30, 0.60])
+ZONE_DWELL_MEDIAN = np.array([45.0, 30.0, 60.0, 40.0, 25.0, 15.0])  # Seconds
+ZONE_DWELL_SIGMA = np.array([0.8, 0.7, 0.9, 0.8, 0.6, 1.0])  # Log-normal spread
+
+OPENING_HOUR, CLOSING_HOUR = 9, 21
+WEEKDAY_FACTOR = np.array([0.85, 0.85, 0.9, 0.95, 1.1, 1.35, 1.2])  # Monday .. Sunday
+
+
+def arrival_curve():
+    """Probability of an arrival in each minute of the day: late morning and early evening peaks within opening hours"""
+    minutes = np.arange(24 * 60)
+    curve = (np.exp(-0.5 * ((minutes - 12.5 * 60) / 75) ** 2)
+             + 1.3 * np.exp(-0.5 * ((minutes - 18 * 60) / 90) ** 2)
+             + 0.15)
+    curve[(minutes < OPENING_HOUR * 60) | (minutes >= CLOSING_HOUR * 60)] = 0
+    return curve / curve.sum()
+
+
+def generate_day(rng, day, mean_visitors, cameras, minute_weights):
+    """Customer and visit_zone records of one day, as (key, metadata, behaviour) tuples"""
+    count = rng.poisson(mean_visitors * WEEKDAY_FACTOR[day.weekday()])
+    if count == 0:
+        return []
+
+    arrivals = np.sort(rng.choice(len(minute_weights), count, p=minute_weights) * 60 + rng.integers(0, 60, count))
+    ages = rng.choice(len(AGE_LIST), count, p=AGE_WEIGHTS)
+    genders = rng.integers(0, len(GENDER_LIST), count)
+    unknown = rng.random(count) < UNKNOWN_FACE_RATE
+
+    # Visited zones, at least one per visitor, with log-normal dwell times per zone
+    visited = rng.random((count, len(ZONES))) < ZONE_VISIT_PROBABILITY
+    nowhere = ~visited.any(axis=1)
+    visited[nowhere, rng.choice(len(ZONES), int(nowhere.sum()), p=ZONE_VISIT_PROBABILITY / ZONE_VISIT_PROBABILITY.sum())] = True
+    dwell = np.round(ZONE_DWELL_MEDIAN * np.exp(ZONE_DWELL_SIGMA * rng.standard_normal((count, len(ZONES)))), 2) * visited
+    in_store = np.round(dwell.sum(axis=1), 2)  # zone.py adds every zone interval to InStoreDuration as well
+
+    cam_ids = rng.integers(0, cameras, count)
+    midnight = datetime(day.year, day.month, day.day)
+    records = []
+    next_track = [1] * cameras
+    for i in range(count):
+        track_id = f"{cam_ids[i]}-{next_track[cam_ids[i]]}"  # Same namespacing as zone.py
+        next_track[cam_ids[i]] += 1
+        metadata = {
+            "Age": None if unknown[i] else AGE_LIST[ages[i]],
+            "Gender": None if unknown[i] else GENDER_LIST[genders[i]],
+            "DateTime": (midnight + timedelta(seconds=int(arrivals[i]))).strftime("%d%m%Y %H:%M:%S"),
+            "InStoreDuration": float(in_store[i]),
         }
-        day_data.append(entry)
-    
-    # Save JSON file
-    file_path = os.path.join(output_dir, f"{date_str}.json")
-    with open(file_path, "w") as f:
-        json.dump(day_data, f, indent=4)
-
-print(f"✅ Generated {total_days} JSON files from {start_date.strftime('%d-%m-%Y')} to {end_date.strftime('%d-%m-%Y')} in folder: {output_dir}")
+        behaviour = {ZONES[z]: float(dwell[i, z]) for z in np.flatnonzero(visited[i])}
+        records.append((f"synthetic-{track_id}", metadata, behaviour))
+    return records
+
+
+def write_day(output_dir, date_str, records):
+    """Same files DailyAnalyticsWriter leaves behind: <kind>/<date>/<date>.jsonl, <date>.json and log.txt"""
+    for kind, column in (("customer", 1), ("visit_zone", 2)):
+        folder = os.path.join(output_dir, kind, date_str)
+        os.makedirs(folder, exist_ok=True)
+        open(os.path.join(folder, "log.txt"), "w").close()
+        with open(os.path.join(folder, f"{date_str}.jsonl"), "w") as f:
+            f.write("".join(json.dumps({"key": record[0], "record": record[column]}) + "\n" for record in records))
+        with open(os.path.join(folder, f"{date_str}.json"), "w") as f:
+            json.dump([record[column] for record in records], f, indent=4)
+
+
+def generate(output_dir, start_date, end_date, mean_visitors=2000, cameras=1, seed=None):
+    rng = np.random.default_rng(seed)
+    minute_weights = arrival_curve()  # Precomputed once for every day
+
+    total_days = (end_date - start_date).days + 1  # include end date
+    visitors = 0
+    for i in range(total_days):
+        current_date = start_date + timedelta(days=i)
+        records = generate_day(rng, current_date, mean_visitors, cameras, minute_weights)
+        write_day(output_dir, current_date.strftime("%d%m%Y"), records)
+        visitors += len(records)
+    return total_days, visitors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic customer / visit_zone data in the layout zone.py writes to temp/")
+    parser.add_argument("--output", default="synthetic_data", help="Use temp to feed S3DataSync directly")
+    parser.add_argument("--start", default="2024-01-01", help="YYYY-MM-DD")
+    parser.add_argument("--end", default=None, help="YYYY-MM-DD, defaults to today")
+    parser.add_argument("--visitors", type=float, default=2000, help="Mean visitors per day")
+    parser.add_argument("--cameras", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    # Start date: first day of 2024, end date: today
+    start_date = datetime.strptime(args.start, "%Y-%m-%d")
+    end_date = datetime.strptime(args.end, "%Y-%m-%d") if args.end else datetime.now()
+
+    total_days, visitors = generate(args.output, start_date, end_date, args.visitors, args.cameras, args.seed)
+    print(f"✅ Generated {visitors} visitors over {total_days} days from {start_date.strftime('%d-%m-%Y')} to {end_date.strftime('%d-%m-%Y')} in folder: {args.output}")
@@ -5,16 +5,26 @@ import threading
 from engines.s3datasync import S3DataSync
 
 
+def requested_cam_id(websocket):
+    # ws://host:8766/<cam_id> selects a camera, the first registered camera is the default
+    request = getattr(websocket, "request", None)
+    path = request.path if request is not None else getattr(websocket, "path", "/")
+    cam_id = path.strip("/").split("?")[0]
+    if cam_id.isdigit() and int(cam_id) in engine.cameras:
+        return int(cam_id)
+    return next(iter(engine.cameras))
+
 async def handler(websocket):
     print(f"Client connected from {websocket.remote_address}")
     try:
-        await engine.process_camera(websocket, 0, 0) # cam_id=0, camera_index=0
+        await engine.watch_camera(websocket, requested_cam_id(websocket))
     except websockets.exceptions.ConnectionClosedOK:
         print(f"Client disconnected from {websocket.remote_address}")
     except Exception as e:
         print(f"Error in WebSocket handler: {e}")
 
 async def main():
+    await engine.start_broadcast() # Cameras run from here on, whether or not anyone is watching
     server = await websockets.serve(handler, "0.0.0.0", 8766) # port 8766
     print("WebSocket server started on ws://0.0.0.0:8766")
     await server.wait_closed()
@@ -25,4 +35,3 @@ if __name__ == "__main__":
     s3_thread = threading.Thread(target=s3_sync.run, daemon=True)  # Create thread
     s3_thread.start()  # Start the thread
     asyncio.run(main())
-
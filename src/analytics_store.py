@@ -0,0 +1,255 @@
+import os
+import json
+import glob
+import hashlib
+import shutil
+from datetime import datetime, date
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+# Typed, date partitioned Parquet copy of the synced S3 data:
+#   <store_dir>/<table>/date=YYYY-MM-DD/data.parquet
+# plus <store_dir>/_ingest.json recording which source files / partitions are already stored.
+
+STORE_DIR = os.path.expanduser("../FourCAST/analytics_store")
+INGEST_MANIFEST = "_ingest.json"  # {"sources": {path: [size, mtime]}, "partitions": {table/date: fingerprint}}
+
+PURCHASE_FIELDS = [
+    ("PurchaseID", pa.string()),
+    ("CustomerID", pa.string()),
+    ("DateTime", pa.string()),  # ISO 8601, cast to a timestamp after loading
+    ("ProductID", pa.list_(pa.string())),
+    ("Quantity", pa.list_(pa.int32())),
+    ("Total", pa.float64()),
+]
+
+
+def load_json_array(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def with_date_column(table, timestamps):
+    return table.append_column("date", pc.cast(timestamps, pa.date32()))
+
+
+def load_purchases(path, promotion_type):
+    schema = pa.schema(PURCHASE_FIELDS + [("Promotion", promotion_type)])
+    table = pa.Table.from_pylist(load_json_array(path), schema=schema)
+    timestamps = pc.cast(table["DateTime"], pa.timestamp("us"))
+    table = table.set_column(table.schema.get_field_index("DateTime"), "DateTime", timestamps)
+    return with_date_column(table, timestamps)
+
+
+def load_physical_purchases(path):
+    return load_purchases(path, pa.list_(pa.bool_()))  # One flag per product line
+
+
+def load_online_purchases(path):
+    return load_purchases(path, pa.bool_())  # One flag per purchase
+
+
+def load_retail_features(path):
+    table = pa_csv.read_csv(path, convert_options=pa_csv.ConvertOptions(column_types={"Date": pa.date32()}))
+    return table.append_column("date", table["Date"])
+
+
+def load_daily_customers(path, day):
+    schema = pa.schema([
+        ("Age", pa.string()),
+        ("Gender", pa.string()),
+        ("DateTime", pa.string()),  # "DDMMYYYY HH:MM:SS"
+        ("InStoreDuration", pa.float64()),
+    ])
+    table = pa.Table.from_pylist(load_json_array(path), schema=schema)
+    timestamps = pc.strptime(table["DateTime"], format="%d%m%Y %H:%M:%S", unit="s", error_is_null=True)
+    table = table.set_column(table.schema.get_field_index("DateTime"), "DateTime", timestamps)
+    return table.append_column("date", pa.array([day] * table.num_rows, pa.date32()))
+
+
+def load_daily_visits(path, day):
+    # One {zone: seconds} object per visitor -> long format, one row per (visitor, zone)
+    visitors, zones, durations = [], [], []
+    for visitor, visit in enumerate(load_json_array(path)):
+        for zone, seconds in visit.items():
+            visitors.append(visitor)
+            zones.append(zone)
+            durations.append(seconds)
+    return pa.table({
+        "Visitor": pa.array(visitors, pa.int32()),
+        "Zone": pa.array(zones, pa.string()),
+        "Duration": pa.array(durations, pa.float64()),
+        "date": pa.array([day] * len(visitors), pa.date32()),
+    })
+
+
+# Table name -> source below the synced S3 folder (a single file, or a folder of DDMMYYYY.json daily files) and its loader
+TABLES = {
+    "physical_purchase": ("physicalstore/purchase/purchases_physical.json", load_physical_purchases),
+    "online_purchase": ("onlstores/Purchase/purchase_table.json", load_online_purchases),
+    "retail_features": ("physicalstore/processed/unified_retail_features.csv", load_retail_features),
+    "physical_customer": ("physicalstore/customer", load_daily_customers),
+    "visit_zone": ("physicalstore/visit_zone", load_daily_visits),
+}
+
+
+def load_ingest_manifest(store_dir):
+    try:
+        with open(os.path.join(store_dir, INGEST_MANIFEST), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"sources": {}, "partitions": {}}
+
+
+def save_ingest_manifest(store_dir, manifest):
+    manifest_path = os.path.join(store_dir, INGEST_MANIFEST)
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime]
+
+
+def fingerprint(table):
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return hashlib.sha1(sink.getvalue().to_pybytes()).hexdigest()
+
+
+def partition_dir(store_dir, table_name, day):
+    return os.path.join(store_dir, table_name, f"date={day.isoformat()}")
+
+
+def write_partition(store_dir, table_name, day, table, manifest):
+    """Write one day of a table, skipped when the content did not change; returns True if written"""
+    key = f"{table_name}/{day.isoformat()}"
+    table = table.drop_columns(["date"])
+    digest = fingerprint(table)
+    if manifest["partitions"].get(key) == digest:
+        return False
+
+    folder = partition_dir(store_dir, table_name, day)
+    os.makedirs(folder, exist_ok=True)
+    file_path = os.path.join(folder, "data.parquet")
+    pq.write_table(table, file_path + ".tmp", compression="zstd")
+    os.replace(file_path + ".tmp", file_path)
+    manifest["partitions"][key] = digest
+    return True
+
+
+def split_by_date(table):
+    """Yield (date, rows of that date) with one sort instead of one filter per date"""
+    table = table.filter(pc.is_valid(table["date"]))
+    if table.num_rows == 0:
+        return
+    table = table.take(pc.sort_indices(table["date"]))
+    days = table["date"].combine_chunks().cast(pa.int32()).to_numpy()
+    bounds = np.flatnonzero(np.diff(days)) + 1
+    for start, end in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [len(days)]])):
+        chunk = table.slice(start, end - start)
+        yield chunk["date"][0].as_py(), chunk
+
+
+def ingest_table(store_dir, table_name, source, loader, manifest):
+    written = 0
+    if os.path.isdir(source):
+        # Daily files: only (re)load the days whose file changed
+        for path in sorted(glob.glob(os.path.join(source, "*.json"))):
+            stem = os.path.splitext(os.path.basename(path))[0]
+            try:
+                day = datetime.strptime(stem, "%d%m%Y").date()
+            except ValueError:
+                continue  # index.json and other non daily files
+            signature = file_signature(path)
+            if manifest["sources"].get(path) == signature:
+                continue
+            try:
+                written += write_partition(store_dir, table_name, day, loader(path, day), manifest)
+            except Exception as e:
+                print(f"Failed to ingest {path}: {e}")
+                continue
+            manifest["sources"][path] = signature
+        return written
+
+    if not os.path.exists(source):
+        return 0
+    signature = file_signature(source)
+    if manifest["sources"].get(source) == signature:
+        return 0
+    try:
+        table = loader(source)
+    except Exception as e:
+        print(f"Failed to ingest {source}: {e}")
+        return 0
+
+    # Whole-table source: rewrite only the days whose rows changed, drop days that disappeared
+    days = set()
+    for day, rows in split_by_date(table):
+        days.add(day.isoformat())
+        written += write_partition(store_dir, table_name, day, rows, manifest)
+    for key in [key for key in manifest["partitions"] if key.startswith(table_name + "/")]:
+        if key.split("/", 1)[1] not in days:
+            shutil.rmtree(partition_dir(store_dir, table_name, date.fromisoformat(key.split("/", 1)[1])), ignore_errors=True)
+            del manifest["partitions"][key]
+    manifest["sources"][source] = signature
+    return written
+
+
+def ingest(s3_dir, store_dir=STORE_DIR, tables=None):
+    """Bring the Parquet store up to date with the synced S3 folder, returns {table: partitions written}"""
+    os.makedirs(store_dir, exist_ok=True)
+    manifest = load_ingest_manifest(store_dir)
+    written = {}
+    for table_name, (source, loader) in TABLES.items():
+        if tables is not None and table_name not in tables:
+            continue
+        written[table_name] = ingest_table(store_dir, table_name, os.path.join(s3_dir, source), loader, manifest)
+    save_ingest_manifest(store_dir, manifest)
+    print(f"Analytics store updated: {written}")
+    return written
+
+
+def to_date(value):
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+
+def list_partitions(store_dir, table_name, start=None, end=None):
+    """Partition dates of a table within [start, end] (inclusive, date or YYYY-MM-DD)"""
+    start, end = to_date(start), to_date(end)
+    days = []
+    for folder in glob.glob(os.path.join(store_dir, table_name, "date=*")):
+        day = date.fromisoformat(os.path.basename(folder)[len("date="):])
+        if (start is None or day >= start) and (end is None or day <= end):
+            days.append(day)
+    return sorted(days)
+
+
+def query(table_name, start=None, end=None, columns=None, store_dir=STORE_DIR):
+    """Rows of a table between two dates, reading only those days' files and only `columns`.
+
+    Returns a pyarrow.Table with an extra `date` column (use .to_pandas() for a DataFrame).
+    """
+    if table_name not in TABLES:
+        raise KeyError(f"Unknown table: {table_name}")
+
+    parts = []
+    for day in list_partitions(store_dir, table_name, start, end):
+        part = pq.read_table(os.path.join(partition_dir(store_dir, table_name, day), "data.parquet"), columns=columns)
+        parts.append(part.append_column("date", pa.array([day] * part.num_rows, pa.date32())))
+    if not parts:
+        return pa.table({"date": pa.array([], pa.date32())})
+    return pa.concat_tables(parts, promote_options="default")
+
+
+if __name__ == "__main__":
+    ingest(os.path.expanduser("../FourCAST/public/s3"))
@@ -1,18 +1,43 @@
 import React, { useEffect, useRef, useState } from 'react';
 
+// Stream settings negotiated with the tracking server, frames arrive as binary JPEG
+const STREAM_QUALITY = 75;
+const STREAM_MAX_FPS = 15;
+
 const HumanTrackingDisplay: React.FC = () => {
   const [frame, setFrame] = useState<string | null>(null);
   const ws = useRef<WebSocket | null>(null);
+  const img = useRef<HTMLImageElement | null>(null);
 
   useEffect(() => {
     ws.current = new WebSocket('ws://localhost:8766');
+    ws.current.binaryType = 'blob';
+    let frameUrl: string | null = null;
 
     ws.current.onopen = () => {
       console.log('WebSocket connected');
+      // Only ask for as many pixels as the panel can show
+      const panelWidth = img.current?.clientWidth || window.innerWidth * 0.55;
+      ws.current?.send(JSON.stringify({
+        format: 'jpeg',
+        width: Math.round(panelWidth * window.devicePixelRatio),
+        quality: STREAM_QUALITY,
+        max_fps: STREAM_MAX_FPS,
+        binary: true,
+      }));
     };
 
     ws.current.onmessage = (event) => {
-      setFrame(`data:image/jpeg;base64,${event.data}`);
+      if (typeof event.data === 'string') {
+        setFrame(`data:image/jpeg;base64,${event.data}`);
+        return;
+      }
+      const nextUrl = URL.createObjectURL(event.data);
+      if (frameUrl) {
+        URL.revokeObjectURL(frameUrl);
+      }
+      frameUrl = nextUrl;
+      setFrame(nextUrl);
     };
 
     ws.current.onclose = () => {
@@ -25,6 +50,9 @@ const HumanTrackingDisplay: React.FC = () => {
 
     return () => {
       ws.current?.close();
+      if (frameUrl) {
+        URL.revokeObjectURL(frameUrl);
+      }
     };
   }, []);
 
@@ -32,7 +60,7 @@ const HumanTrackingDisplay: React.FC = () => {
     <div className="human-tracking-display flex items-center justify-center flex-col h-full">
       <div className='text-[3rem] font-bold mb-4' style={{margin: '0 0 1rem 0'}}>Real Time Human Tracking View</div>
       {frame ? (
-        <img src={frame} alt="Human Tracking Feed" style={{ width: '55%', height: 'auto' }} />
+        <img ref={img} src={frame} alt="Human Tracking Feed" style={{ width: '55%', height: 'auto' }} />
       ) : (
         <p>Connecting to human tracking feed...</p>
       )}
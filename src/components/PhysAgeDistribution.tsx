@@ -6,13 +6,6 @@ interface PieChartDataItem {
   value: number;
 }
 
-interface CustomerRecord {
-  Age: string;
-  Gender: string;
-  DateTime: string;
-  InStoreDuration: number;
-}
-
 const PhysAgeDistribution = () => {
   const [data, setData] = useState<PieChartDataItem[]>([]);
   const [loading, setLoading] = useState(true);
@@ -21,61 +14,21 @@ const PhysAgeDistribution = () => {
     async function loadData() {
       try {
         setLoading(true);
-        const indexResponse = await fetch(
-          "/s3/physicalstore/customer/index.json"
-        );
-        if (!indexResponse.ok) {
+        // Histograms are precomputed during sync
+        const response = await fetch("/rollups/demographics.json");
+        if (!response.ok) {
           throw new Error(
-            `HTTP error! status: ${indexResponse.status} for index.json`
+            `HTTP error! status: ${response.status} for demographics.json`
           );
         }
-        const files: string[] = await indexResponse.json();
-
-        // Object to count age occurrences
-        let ageCounts: { [age: string]: number } = {};
-
-        for (const file of files) {
-          try {
-            const response = await fetch(
-              `/s3/physicalstore/customer/${file}`
-            );
-            if (!response.ok) {
-              throw new Error(
-                `HTTP error! status: ${response.status} for ${file}`
-              );
-            }
-            const customers: CustomerRecord[] = await response.json();
-
-            // Count each age occurrence with filtering
-            for (const customer of customers) {
-              const age = customer.Age;
-              
-              // Debug: Log unexpected age values
-              if (!age || age === '' || age === 'null' || age === 'undefined') {
-                console.warn('Found invalid age value:', age, 'in customer:', customer);
-                continue; // Skip invalid entries
-              }
-              
-              // Only count valid age ranges that match the expected format
-              if (age && typeof age === 'string' && age.match(/^\(\d+-\d+\)$/)) {
-                ageCounts[age] = (ageCounts[age] || 0) + 1;
-              } else {
-                console.warn('Unexpected age format:', age, 'in customer:', customer);
-              }
-            }
-          } catch (fileError) {
-            console.error(
-              `Error fetching or processing file ${file}:`,
-              fileError
-            );
-          }
-        }
+        const demographics: { age: { [age: string]: number } } = await response.json();
+        const ageCounts = demographics.age;
 
         // Transform to PieChart format and sort by age ranges
         const ageData: PieChartDataItem[] = Object.entries(ageCounts)
           .filter(([age, count]) => {
-            // Filter out any remaining invalid entries
-            return age && age !== 'null' && age !== 'undefined' && count > 0;
+            // Only keep age ranges that match the expected "(start-end)" format
+            return age && /^\(\d+-\d+\)$/.test(age) && count > 0;
           })
           .map(([age, count]) => ({
             label: age,
@@ -6,13 +6,6 @@ interface PieChartDataItem {
   value: number;
 }
 
-interface CustomerRecord {
-  Age: string;
-  Gender: string;
-  DateTime: string;
-  InStoreDuration: number;
-}
-
 const PhysGenderDistribution = () => {
   const [data, setData] = useState<PieChartDataItem[]>([]);
   const [loading, setLoading] = useState(true);
@@ -21,55 +14,15 @@ const PhysGenderDistribution = () => {
     async function loadData() {
       try {
         setLoading(true);
-        const indexResponse = await fetch(
-          "/s3/physicalstore/customer/index.json"
-        );
-        if (!indexResponse.ok) {
+        // Histograms are precomputed during sync
+        const response = await fetch("/rollups/demographics.json");
+        if (!response.ok) {
           throw new Error(
-            `HTTP error! status: ${indexResponse.status} for index.json`
+            `HTTP error! status: ${response.status} for demographics.json`
           );
         }
-        const files: string[] = await indexResponse.json();
-
-        // Object to count gender occurrences
-        let genderCounts: { [gender: string]: number } = {};
-
-        for (const file of files) {
-          try {
-            const response = await fetch(
-              `/s3/physicalstore/customer/${file}`
-            );
-            if (!response.ok) {
-              throw new Error(
-                `HTTP error! status: ${response.status} for ${file}`
-              );
-            }
-            const customers: CustomerRecord[] = await response.json();
-
-            // Count each gender occurrence with filtering
-            for (const customer of customers) {
-              const gender = customer.Gender;
-
-              // Debug: Log unexpected gender values
-              if (!gender || gender === '' || gender === 'null' || gender === 'undefined') {
-                console.warn('Found invalid gender value:', gender, 'in customer:', customer);
-                continue; // Skip invalid entries
-              }
-              
-              // Only count valid gender values
-              if (gender && typeof gender === 'string') {
-                genderCounts[gender] = (genderCounts[gender] || 0) + 1;
-              } else {
-                console.warn('Unexpected gender format:', gender, 'in customer:', customer);
-              }
-            }
-          } catch (fileError) {
-            console.error(
-              `Error fetching or processing file ${file}:`,
-              fileError
-            );
-          }
-        }
+        const demographics: { gender: { [gender: string]: number } } = await response.json();
+        const genderCounts = demographics.gender;
 
         // Transform to PieChart format and sort by gender
         const genderData: PieChartDataItem[] = Object.entries(genderCounts)
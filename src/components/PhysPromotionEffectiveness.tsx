@@ -6,99 +6,59 @@ interface BoxPlotDataItem {
   values: number[];
 }
 
-interface PhysicalPurchaseRecord {
-  PurchaseID: string;
-  CustomerID: string;
-  DateTime: string;
-  ProductID: string[];
-  Quantity: number[];
-  Total: number;
-  Promotion: boolean[];
-}
+type Histogram = { [quantity: string]: number };
 
 interface PromotionData {
-  [category: string]: number[];
+  [category: string]: Histogram;
 }
 
+// The box plot gets at most this many points, taken at evenly spaced ranks so the quartiles are preserved
+const MAX_BOX_POINTS = 1000;
+
+const sortedBins = (histogram: Histogram) =>
+  Object.entries(histogram)
+    .map(([quantity, count]) => [Number(quantity), count] as [number, number])
+    .sort((a, b) => a[0] - b[0]);
+
+const valueAtRank = (bins: [number, number][], rank: number) => {
+  let seen = 0;
+  for (const [quantity, count] of bins) {
+    seen += count;
+    if (rank < seen) return quantity;
+  }
+  return bins.length > 0 ? bins[bins.length - 1][0] : 0;
+};
+
+const histogramToValues = (histogram: Histogram) => {
+  const bins = sortedBins(histogram);
+  const total = bins.reduce((sum, [, count]) => sum + count, 0);
+  const points = Math.min(total, MAX_BOX_POINTS);
+  const values: number[] = [];
+  for (let i = 0; i < points; i++) {
+    const rank = points === 1 ? 0 : Math.floor((i * (total - 1)) / (points - 1));
+    values.push(valueAtRank(bins, rank));
+  }
+  return values;
+};
+
 const PhysPromotionEffectiveness = () => {
   const [data, setData] = useState<PromotionData>({});
 
   useEffect(() => {
     async function loadData() {
       try {
-        const response = await fetch(
-          "/s3/physicalstore/purchase/purchases_physical.json"
-        );
+        // Quantity histograms per promotion status are precomputed during sync
+        const response = await fetch("/rollups/promotion.json");
         
         if (!response.ok) {
           throw new Error(
-            `HTTP error! status: ${response.status} for purchases_physical.json`
+            `HTTP error! status: ${response.status} for promotion.json`
           );
         }
         
-        const purchases: PhysicalPurchaseRecord[] = await response.json();
-
-        const result: PromotionData = {
-          "With Promotion": [],
-          "Without Promotion": []
-        };
-
-        console.log("Total purchases loaded:", purchases.length);
-        console.log("Sample purchase record:", purchases[0]);
-
-        // Process each purchase record
-        for (const purchase of purchases) {
-          // Debug first few purchases
-          if (result["With Promotion"].length + result["Without Promotion"].length < 10) {
-            console.log("Processing purchase:", {
-              PurchaseID: purchase.PurchaseID,
-              ProductID: purchase.ProductID,
-              Quantity: purchase.Quantity,
-              Promotion: purchase.Promotion
-            });
-          }
-
-          // Iterate through each product in the purchase
-          for (let i = 0; i < purchase.ProductID.length; i++) {
-            const quantity = purchase.Quantity[i];
-            const hasPromotion = purchase.Promotion[i];
-
-            // Debug individual items
-            if (result["With Promotion"].length + result["Without Promotion"].length < 20) {
-              console.log(`Item ${i}:`, { quantity, hasPromotion, valid: typeof quantity === 'number' && !isNaN(quantity) && quantity > 0 });
-            }
-
-            // Validate quantity is a valid number
-            if (typeof quantity === 'number' && !isNaN(quantity) && quantity > 0) {
-              if (hasPromotion) {
-                result["With Promotion"].push(quantity);
-              } else {
-                result["Without Promotion"].push(quantity);
-              }
-            }
-          }
-        }
+        const result: PromotionData = await response.json();
 
-        // Calculate detailed statistics
-        const withPromotionSum = result["With Promotion"].reduce((a, b) => a + b, 0);
-        const withoutPromotionSum = result["Without Promotion"].reduce((a, b) => a + b, 0);
-        const withPromotionAvg = result["With Promotion"].length > 0 ? withPromotionSum / result["With Promotion"].length : 0;
-        const withoutPromotionAvg = result["Without Promotion"].length > 0 ? withoutPromotionSum / result["Without Promotion"].length : 0;
-
-        console.log("Detailed Promotion Analysis:", {
-          "With Promotion": {
-            count: result["With Promotion"].length,
-            sum: withPromotionSum,
-            average: withPromotionAvg,
-            sample: result["With Promotion"].slice(0, 10)
-          },
-          "Without Promotion": {
-            count: result["Without Promotion"].length,
-            sum: withoutPromotionSum,
-            average: withoutPromotionAvg,
-            sample: result["Without Promotion"].slice(0, 10)
-          }
-        });
+        console.log("Promotion histograms loaded:", result);
 
         setData(result);
       } catch (error) {
@@ -112,29 +72,30 @@ const PhysPromotionEffectiveness = () => {
 
   // Transform data for BoxPlot - only include categories that have data
   const promotionData: BoxPlotDataItem[] = Object.entries(data)
-    .filter(([category, values]) => values.length > 0)
-    .map(([category, values]) => ({
+    .map(([category, histogram]) => ({
       label: category,
-      values: values,
+      values: histogramToValues(histogram),
     }))
+    .filter((item) => item.values.length > 0)
     .sort((a, b) => {
       // Sort to show "With Promotion" first, then "Without Promotion"
       const order = ["With Promotion", "Without Promotion"];
       return order.indexOf(a.label) - order.indexOf(b.label);
     });
 
-  // Calculate summary statistics for display
-  const getSummaryStats = (values: number[]) => {
-    if (values.length === 0) return { count: 0, avg: 0, median: 0 };
+  // Calculate summary statistics for display, exact from the histogram
+  const getSummaryStats = (histogram: Histogram) => {
+    const bins = sortedBins(histogram);
+    const count = bins.reduce((sum, [, items]) => sum + items, 0);
+    if (count === 0) return { count: 0, avg: 0, median: 0 };
     
-    const sorted = [...values].sort((a, b) => a - b);
-    const avg = values.reduce((a, b) => a + b, 0) / values.length;
-    const median = sorted.length % 2 === 0
-      ? (sorted[sorted.length / 2 - 1] + sorted[sorted.length / 2]) / 2
-      : sorted[Math.floor(sorted.length / 2)];
+    const avg = bins.reduce((sum, [quantity, items]) => sum + quantity * items, 0) / count;
+    const median = count % 2 === 0
+      ? (valueAtRank(bins, count / 2 - 1) + valueAtRank(bins, count / 2)) / 2
+      : valueAtRank(bins, Math.floor(count / 2));
     
     return {
-      count: values.length,
+      count,
       avg: Math.round(avg * 100) / 100,
       median: Math.round(median * 100) / 100
     };
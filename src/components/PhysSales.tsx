@@ -7,16 +7,6 @@ interface LineChartDataItem {
   value: number;
 }
 
-interface PurchaseRecord {
-  PurchaseID: string;
-  CustomerID: string;
-  DateTime: string;
-  ProductID: string[];
-  Quantity: number[];
-  Total: number;
-  Promotion: boolean[];
-}
-
 interface SalesData {
   [date: string]: number;
 }
@@ -31,63 +21,32 @@ const PhysSales = ({ timeline }: PhysSalesProps) => {
   useEffect(() => {
     async function loadData() {
       try {
-        const indexResponse = await fetch(
-          "/s3/physicalstore/purchase/index.json"
-        );
-        if (!indexResponse.ok) {
+        // Daily totals are precomputed during sync
+        const response = await fetch("/rollups/sales.json");
+        if (!response.ok) {
           throw new Error(
-            `HTTP error! status: ${indexResponse.status} for index.json`
+            `HTTP error! status: ${response.status} for sales.json`
           );
         }
-        const files: string[] = await indexResponse.json();
-
-        const allPurchases: PurchaseRecord[] = [];
-
-        for (const file of files) {
-          try {
-            const response = await fetch(
-              `/s3/physicalstore/purchase/${file}`
-            );
-            if (!response.ok) {
-              throw new Error(
-                `HTTP error! status: ${response.status} for ${file}`
-              );
-            }
-            const purchases: PurchaseRecord[] = await response.json();
-            allPurchases.push(...purchases);
-          } catch (fileError) {
-            console.error(
-              `Error fetching or processing file ${file}:`,
-              fileError
-            );
-          }
-        }
+        const sales: { daily: SalesData } = await response.json();
 
-        // Filter purchases based on timeline
+        // Filter days based on timeline
         const now = new Date();
-        let filteredPurchases = allPurchases;
+        let since: Date | null = null;
 
         if (timeline === "Last Week") {
-          const lastWeek = subDays(now, 7);
-          filteredPurchases = allPurchases.filter(
-            (p) => new Date(p.DateTime) >= lastWeek
-          );
+          since = subDays(now, 7);
         } else if (timeline === "Last Month") {
-          const lastMonth = subMonths(now, 1);
-          filteredPurchases = allPurchases.filter(
-            (p) => new Date(p.DateTime) >= lastMonth
-          );
+          since = subMonths(now, 1);
         } else if (timeline === "Last 3 Days") {
-          const last3Days = subDays(now, 3);
-          filteredPurchases = allPurchases.filter(
-            (p) => new Date(p.DateTime) >= last3Days
-          );
+          since = subDays(now, 3);
         }
 
         const result: SalesData = {};
-        for (const purchase of filteredPurchases) {
-          const date = purchase.DateTime.split('T')[0];
-          result[date] = (result[date] || 0) + purchase.Total;
+        for (const [date, total] of Object.entries(sales.daily)) {
+          if (since === null || date >= format(since, "yyyy-MM-dd")) {
+            result[date] = total;
+          }
         }
 
         setData(result);
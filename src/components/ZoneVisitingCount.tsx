@@ -18,43 +18,23 @@ const ZoneVisitingCount = () => {
   useEffect(() => {
     async function loadData() {
       try {
-        const indexResponse = await fetch(
-          "/s3/physicalstore/visit_zone/index.json"
-        );
-        if (!indexResponse.ok) {
+        // Per day totals are precomputed during sync, one small file instead of every daily file
+        const response = await fetch("/rollups/zone_daily.json");
+        if (!response.ok) {
           throw new Error(
-            `HTTP error! status: ${indexResponse.status} for index.json`
+            `HTTP error! status: ${response.status} for zone_daily.json`
           );
         }
-        const files: string[] = await indexResponse.json();
+        const days: Record<string, Record<string, { duration: number; visits: number }>> =
+          await response.json();
 
         const result: ZoneData = {};
 
-        for (const file of files) {
-          try {
-            const response = await fetch(
-              `/s3/physicalstore/visit_zone/${file}`
-            );
-            if (!response.ok) {
-              throw new Error(
-                `HTTP error! status: ${response.status} for ${file}`
-              );
-            }
-            const visits: Record<string, any>[] = await response.json();
-
-            const date = file.replace(".json", "");
-            result[date] = {};
-
-            for (const record of visits) {
-              for (const zone of Object.keys(record)) {
-                result[date][zone] = (result[date][zone] || 0) + 1;
-              }
-            }
-          } catch (fileError) {
-            console.error(
-              `Error fetching or processing file ${file}:`,
-              fileError
-            );
+        for (const [date, zones] of Object.entries(days)) {
+          result[date] = {};
+          for (const [zone, totals] of Object.entries(zones)) {
+            // Visitors per zone
+            result[date][zone] = totals.visits;
           }
         }
 
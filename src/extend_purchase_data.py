@@ -1,87 +1,110 @@
-import json
+import os
+import argparse
 import datetime
-import random
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 
-def extend_purchase_data(purchase_file_path, product_file_path, start_date_str):
-    # Load existing purchase data
-    with open(purchase_file_path, 'r') as f:
-        purchase_data = json.load(f)
+from purchase_io import BATCH_SIZE, PurchaseWriter, iter_json_array, iter_purchase_batches, purchase_schema
 
-    # Load product data to get valid ProductIDs
-    with open(product_file_path, 'r') as f:
-        product_data = json.load(f)
-    
-    valid_product_ids = [product['ProductID'] for product in product_data]
+MAX_PRODUCTS_PER_PURCHASE = 5
+CUSTOMER_COUNT = 2000  # Customer IDs range from C00001 to C02000
+MICROSECONDS_PER_DAY = 86_400_000_000
 
-    # Determine the last PurchaseID
+
+def last_purchase_number(purchase_file_path):
+    # Streamed, only one batch of the existing table is in memory at a time
     last_purchase_id_num = 0
-    if purchase_data:
-        last_purchase_id = max(purchase_data, key=lambda x: int(x['PurchaseID'][2:]))['PurchaseID']
-        last_purchase_id_num = int(last_purchase_id[2:])
+    if os.path.exists(purchase_file_path):
+        for batch in iter_purchase_batches(purchase_file_path, columns=['PurchaseID']):
+            last_purchase_id_num = max(last_purchase_id_num, max(int(p['PurchaseID'][2:]) for p in batch))
+    return last_purchase_id_num
+
+
+def sample_products(rng, product_count, purchases, per_purchase):
+    """Indices of `per_purchase` distinct products for every purchase, as a (purchases, per_purchase) array"""
+    picks = rng.integers(0, product_count, (purchases, per_purchase))
+    while per_purchase > 1:
+        ordered = np.sort(picks, axis=1)
+        duplicated = (ordered[:, 1:] == ordered[:, :-1]).any(axis=1)
+        if not duplicated.any():
+            break
+        picks[duplicated] = rng.integers(0, product_count, (int(duplicated.sum()), per_purchase))
+    return picks
+
+
+def prefixed_ids(prefix, numbers):
+    return pc.binary_join_element_wise(prefix, pc.utf8_lpad(pc.cast(pa.array(numbers), pa.string()), 5, "0"), "")
+
+
+def generate_purchases(rng, product_ids, days, first_purchase_number, min_daily=1, max_daily=5, promotion_per_item=True):
+    """One batch of purchases for `days` (datetime64[D] array) as a pyarrow Table, built column by column"""
+    daily_counts = rng.integers(min_daily, max_daily + 1, len(days))
+    count = int(daily_counts.sum())
+
+    # Random time of day for each purchase
+    timestamps = np.repeat(days, daily_counts).astype("datetime64[us]") + rng.integers(0, MICROSECONDS_PER_DAY, count).astype("timedelta64[us]")
+
+    # 1 to 5 distinct products per purchase, each with a quantity of 1 to 10
+    per_purchase = min(MAX_PRODUCTS_PER_PURCHASE, len(product_ids))
+    items = rng.integers(1, per_purchase + 1, count)
+    picks = sample_products(rng, len(product_ids), count, per_purchase)
+    selected = picks[np.arange(per_purchase) < items[:, None]]
+    offsets = pa.array(np.concatenate([[0], np.cumsum(items)]), pa.int32())
+
+    # Random total (simplified as we don't have product prices in purchase_table)
+    totals = np.round(rng.uniform(100.0, 50000.0, count), 2)
+    promotion = rng.random(count) < 0.5
+
+    if promotion_per_item:
+        promotion_column = pa.ListArray.from_arrays(offsets, pa.array(np.repeat(promotion, items)))
+    else:
+        promotion_column = pa.array(promotion)
+
+    return pa.table({
+        "PurchaseID": prefixed_ids("PU", np.arange(first_purchase_number + 1, first_purchase_number + count + 1)),
+        "CustomerID": prefixed_ids("C", rng.integers(1, CUSTOMER_COUNT + 1, count)),
+        "DateTime": pc.strftime(pa.array(timestamps), format="%Y-%m-%dT%H:%M:%S"),  # ISO 8601 with microseconds
+        "ProductID": pa.ListArray.from_arrays(offsets, pa.array(product_ids[selected])),
+        "Quantity": pa.ListArray.from_arrays(offsets, pa.array(rng.integers(1, 11, len(selected)), pa.int32())),
+        "Total": pa.array(totals),
+        "Promotion": promotion_column,
+    }, schema=purchase_schema(promotion_per_item))
+
+
+def extend_purchase_data(purchase_file_path, product_file_path, start_date_str, end_date_str=None,
+                         seed=None, min_daily=1, max_daily=5, promotion_per_item=True):
+    """Append synthetic purchases from start_date to end_date (default today) to a .json, .jsonl or .parquet table.
+
+    Purchases are generated with NumPy a batch of days at a time and streamed
+    to the file, so memory stays bounded whatever the date range or daily
+    volume. The same seed produces the same data.
+    """
+    rng = np.random.default_rng(seed)
+
+    # Precomputed sampling array of valid ProductIDs
+    product_ids = np.array([product['ProductID'] for product in iter_json_array(product_file_path)])
+
+    # Determine the last PurchaseID
+    current_purchase_id_num = last_purchase_number(purchase_file_path)
 
     # Define start and end dates for new data generation
-    start_date = datetime.datetime.strptime(start_date_str, '%Y-%m-%d')
-    end_date = datetime.datetime.now()
-
-    new_purchase_entries = []
-    current_purchase_id_num = last_purchase_id_num
-
-    current_date = start_date
-    while current_date <= end_date:
-        # Generate a random number of purchases for each day (e.g., 1 to 5)
-        num_daily_purchases = random.randint(1, 5)
-        
-        for _ in range(num_daily_purchases):
-            current_purchase_id_num += 1
-            purchase_id = f"PU{current_purchase_id_num:05d}"
-            
-            customer_id = f"C{random.randint(1, 2000):05d}" # Assuming customer IDs range from C00001 to C02000
-            
-            # Generate random time for the purchase
-            random_hour = random.randint(0, 23)
-            random_minute = random.randint(0, 59)
-            random_second = random.randint(0, 59)
-            random_microsecond = random.randint(0, 999999)
-            
-            purchase_datetime = current_date.replace(
-                hour=random_hour,
-                minute=random_minute,
-                second=random_second,
-                microsecond=random_microsecond
-            ).isoformat()
-
-            # Select 1 to 5 random product IDs
-            num_products_in_purchase = random.randint(1, min(5, len(valid_product_ids)))
-            selected_product_ids = random.sample(valid_product_ids, num_products_in_purchase)
-            
-            quantities = [random.randint(1, 10) for _ in selected_product_ids]
-            
-            # Generate a random total (simplified as we don't have product prices in purchase_table)
-            total = round(random.uniform(100.0, 50000.0), 2)
-            
-            promotion = random.choice([True, False])
-
-            new_purchase_entries.append({
-                "PurchaseID": purchase_id,
-                "CustomerID": customer_id,
-                "DateTime": purchase_datetime,
-                "ProductID": selected_product_ids,
-                "Quantity": quantities,
-                "Total": total,
-                "Promotion": promotion
-            })
-        
-        current_date += datetime.timedelta(days=1)
-
-    # Append new entries to existing data
-    purchase_data.extend(new_purchase_entries)
-
-    # Write the updated data back to the JSON file
-    with open(purchase_file_path, 'w') as f:
-        json.dump(purchase_data, f, indent=4)
-
-    print(f"Successfully extended purchase data from {start_date_str} to {end_date.strftime('%Y-%m-%d')}.")
-    print(f"Total entries after extension: {len(purchase_data)}")
+    start_date = np.datetime64(start_date_str, "D")
+    end_date = np.datetime64(end_date_str or datetime.date.today().isoformat(), "D")
+    days = np.arange(start_date, end_date + 1, dtype="datetime64[D]")
+    days_per_batch = max(1, BATCH_SIZE // max_daily)
+
+    with PurchaseWriter(purchase_file_path, promotion_per_item=promotion_per_item) as writer:
+        for start in range(0, len(days), days_per_batch):
+            batch = generate_purchases(rng, product_ids, days[start:start + days_per_batch], current_purchase_id_num,
+                                       min_daily, max_daily, promotion_per_item)
+            writer.write(batch)
+            current_purchase_id_num += batch.num_rows
+
+    print(f"Successfully extended purchase data from {start_date} to {end_date}.")
+    print(f"Added {writer.written} entries, last PurchaseID PU{current_purchase_id_num:05d}")
+    return writer.written
+
 
 # Paths to the JSON files (relative to the current working directory of the script)
 purchase_file = '..//public/s3/physicalstore/purchase/purchases_physical.json'
@@ -89,4 +112,17 @@ product_file = '../public/s3/physicalstore/product/products_physical.json'
 start_date_for_extension = '2024-01-01'
 
 if __name__ == "__main__":
-    extend_purchase_data(purchase_file, product_file, start_date_for_extension)
+    parser = argparse.ArgumentParser(description="Append synthetic purchases, e.g. years of data for load testing")
+    parser.add_argument("--purchases", default=purchase_file, help=".json, .jsonl or .parquet purchase table")
+    parser.add_argument("--products", default=product_file)
+    parser.add_argument("--start", default=start_date_for_extension, help="YYYY-MM-DD")
+    parser.add_argument("--end", default=None, help="YYYY-MM-DD, defaults to today")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--min-daily", type=int, default=1, help="Fewest purchases per day")
+    parser.add_argument("--max-daily", type=int, default=5, help="Most purchases per day")
+    parser.add_argument("--promotion-per-purchase", action="store_true",
+                        help="One Promotion flag per purchase (online table) instead of one per product")
+    args = parser.parse_args()
+
+    extend_purchase_data(args.purchases, args.products, args.start, args.end, args.seed,
+                         args.min_daily, args.max_daily, not args.promotion_per_purchase)
@@ -1,40 +1,79 @@
-import json
-import random
+import os
+import shutil
+import argparse
+import itertools
+import numpy as np
 
-def process_purchase_data(product_file_path, purchase_file_path):
-    with open(product_file_path, 'r') as f:
-        product_data = json.load(f)
+from purchase_io import PurchaseWriter, iter_json_array, iter_purchase_batches
 
-    with open(purchase_file_path, 'r') as f:
-        purchase_data = json.load(f)
 
+def temp_path(path):
+    root, extension = os.path.splitext(path)
+    return f"{root}.tmp{extension}"
+
+
+def process_purchase_data(product_file_path, purchase_file_path, output_path=None, seed=None):
+    """Replace product IDs that are not in the product table, streaming the purchases batch by batch"""
+    product_data = list(iter_json_array(product_file_path))
     valid_product_ids = {product['ProductID'] for product in product_data}
-    
-    # Filter out products with 0 stock from valid_product_ids
-    valid_product_ids_with_stock = {product['ProductID'] for product in product_data if product['Stock'] > 0}
-
-    modified_purchase_data = []
-    for purchase in purchase_data:
-        modified_product_ids = []
-        for product_id in purchase['ProductID']:
-            if product_id not in valid_product_ids:
-                # Replace with a random valid product ID that has stock
-                if valid_product_ids_with_stock:
-                    modified_product_ids.append(random.choice(list(valid_product_ids_with_stock)))
-                else:
-                    # Fallback if no products have stock (shouldn't happen with typical data)
-                    modified_product_ids.append(random.choice(list(valid_product_ids)))
-            else:
-                modified_product_ids.append(product_id)
-        purchase['ProductID'] = modified_product_ids
-        modified_purchase_data.append(purchase)
-
-    with open(purchase_file_path, 'w') as f:
-        json.dump(modified_purchase_data, f, indent=4)
-
-    print(f"Processed {len(purchase_data)} purchases. Invalid product IDs replaced.")
+
+    # Precomputed once: replacements are drawn from products that have stock
+    replacement_ids = np.array(sorted(product['ProductID'] for product in product_data if product['Stock'] > 0))
+    if len(replacement_ids) == 0:
+        # Fallback if no products have stock (shouldn't happen with typical data)
+        replacement_ids = np.array(sorted(valid_product_ids))
+    rng = np.random.default_rng(seed)
+
+    # Write next to the target and swap it in at the end, the input is read while writing
+    output_path = output_path or purchase_file_path
+    tmp_path = temp_path(output_path)
+    if os.path.isdir(tmp_path):
+        shutil.rmtree(tmp_path)
+    elif os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    batches = iter_purchase_batches(purchase_file_path)
+    first_batch = next(batches, None)
+    if first_batch is None:
+        print("No purchases to process.")
+        return 0
+
+    purchases = replaced = 0
+    with PurchaseWriter(tmp_path, promotion_per_item=isinstance(first_batch[0].get('Promotion'), list)) as writer:
+        for batch in itertools.chain([first_batch], batches):
+            flat_ids = [product_id for purchase in batch for product_id in purchase['ProductID']]
+            invalid = np.fromiter((product_id not in valid_product_ids for product_id in flat_ids), dtype=bool, count=len(flat_ids))
+            replacements = iter(rng.choice(replacement_ids, int(invalid.sum())).tolist())
+
+            position = 0
+            for purchase in batch:
+                modified_product_ids = []
+                for product_id in purchase['ProductID']:
+                    modified_product_ids.append(next(replacements) if invalid[position] else product_id)
+                    position += 1
+                purchase['ProductID'] = modified_product_ids
+
+            writer.write(batch)
+            purchases += len(batch)
+            replaced += int(invalid.sum())
+
+    if os.path.isdir(output_path):
+        shutil.rmtree(output_path)
+    os.replace(tmp_path, output_path)
+
+    print(f"Processed {purchases} purchases. {replaced} invalid product IDs replaced.")
+    return replaced
+
 
 if __name__ == "__main__":
     product_online_table_path = '../../React Apps/FourCAST/public/s3/onlstores/Product/Product_Online_Table.json'
     purchase_table_path = '../../React Apps/FourCAST/public/s3/onlstores/Purchase/purchase_table.json'
-    process_purchase_data(product_online_table_path, purchase_table_path)
+
+    parser = argparse.ArgumentParser(description="Replace unknown product IDs in a purchase table")
+    parser.add_argument("--products", default=product_online_table_path)
+    parser.add_argument("--purchases", default=purchase_table_path, help=".json, .jsonl or .parquet purchase table")
+    parser.add_argument("--output", default=None, help="Defaults to rewriting --purchases")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    process_purchase_data(args.products, args.purchases, args.output, args.seed)
@@ -0,0 +1,164 @@
+import os
+import json
+import glob
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from analytics_store import PURCHASE_FIELDS
+
+# Streaming readers / writers for purchase tables, picked by path:
+#   *.jsonl   one purchase per line, appended in place
+#   *.parquet a folder of part-NNNNNN.parquet files, every writer adds a new part
+#   *.json    the dashboard's JSON array, read incrementally and appended by rewriting only its closing bracket
+# Memory use depends on the batch size, not on the size of the table.
+
+BATCH_SIZE = 50_000
+
+
+def purchase_schema(promotion_per_item=True):
+    return pa.schema(PURCHASE_FIELDS + [("Promotion", pa.list_(pa.bool_()) if promotion_per_item else pa.bool_())])
+
+
+def iter_json_array(path, chunk_size=1 << 20):
+    """Yield the items of a (possibly huge) JSON array file one by one"""
+    decoder = json.JSONDecoder()
+    with open(path, "r") as f:
+        buffer = ""
+        pos = 0
+        started = False
+        while True:
+            # Skip whitespace and separators, reading more when the buffer runs out
+            while True:
+                while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                    pos += 1
+                if pos < len(buffer):
+                    break
+                buffer = f.read(chunk_size)
+                pos = 0
+                if not buffer:
+                    return
+
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError(f"{path} is not a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise
+                buffer = buffer[pos:] + chunk  # Item spans the chunk boundary
+                pos = 0
+                continue
+            yield item
+            pos = end
+            if pos > chunk_size:
+                buffer = buffer[pos:]
+                pos = 0
+
+
+def iter_jsonl(path):
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_purchase_batches(path, batch_size=BATCH_SIZE, columns=None):
+    """Yield lists of purchase dicts from a .json, .jsonl or .parquet table (Parquet only reads `columns`)"""
+    if path.endswith(".parquet"):
+        for part in sorted(glob.glob(os.path.join(path, "*.parquet"))) if os.path.isdir(path) else [path]:
+            for batch in pq.ParquetFile(part).iter_batches(batch_size=batch_size, columns=columns):
+                yield batch.to_pylist()
+        return
+
+    if path.endswith(".jsonl"):
+        items = iter_jsonl(path)
+    else:
+        items = iter_json_array(path)
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class PurchaseWriter:
+    """Appends batches (lists of dicts or pyarrow Tables) to a .json, .jsonl or .parquet purchase table"""
+
+    def __init__(self, path, promotion_per_item=True, indent=None):
+        self.path = path
+        self.schema = purchase_schema(promotion_per_item)
+        self.indent = indent  # Only for .json, None keeps one purchase per line
+        self.written = 0
+        self._file = None
+        self._parquet = None
+        self._first_json_item = True
+
+    def __enter__(self):
+        if self.path.endswith(".parquet"):
+            os.makedirs(self.path, exist_ok=True)
+            part = len(glob.glob(os.path.join(self.path, "part-*.parquet")))
+            self._parquet = pq.ParquetWriter(os.path.join(self.path, f"part-{part:06d}.parquet"), self.schema, compression="zstd")
+        elif self.path.endswith(".jsonl"):
+            self._file = open(self.path, "a")
+        else:
+            self._open_json_array()
+        return self
+
+    def _open_json_array(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            self._file = open(self.path, "w")
+            self._file.write("[")
+            return
+
+        # Drop the closing bracket and keep appending items after the last one
+        with open(self.path, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(0, size - 4096))
+            tail = f.read()
+            stripped = tail.rstrip()
+            if not stripped.endswith(b"]"):
+                raise ValueError(f"{self.path} is not a JSON array")
+            before = stripped[:-1].rstrip()
+            self._first_json_item = before.endswith(b"[")
+            f.truncate(size - len(tail) + len(before))
+        self._file = open(self.path, "a")
+
+    def write(self, batch):
+        if isinstance(batch, pa.Table):
+            if self._parquet is not None:
+                self._parquet.write_table(batch.cast(self.schema))
+                self.written += batch.num_rows
+                return
+            batch = batch.to_pylist()
+        elif self._parquet is not None:
+            self._parquet.write_table(pa.Table.from_pylist(batch, schema=self.schema))
+            self.written += len(batch)
+            return
+
+        if self.path.endswith(".jsonl"):
+            self._file.write("".join(json.dumps(item) + "\n" for item in batch))
+        else:
+            for item in batch:
+                self._file.write(("\n" if self._first_json_item else ",\n") + json.dumps(item, indent=self.indent))
+                self._first_json_item = False
+        self.written += len(batch)
+
+    def __exit__(self, *exc_info):
+        if self._parquet is not None:
+            self._parquet.close()
+        if self._file is not None:
+            if not self.path.endswith(".jsonl"):
+                self._file.write("\n]")
+            self._file.close()
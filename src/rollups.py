@@ -0,0 +1,176 @@
+import os
+import json
+from datetime import date
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from analytics_store import STORE_DIR, load_ingest_manifest, query
+
+# Small precomputed files the dashboard charts load instead of every daily file:
+#   zone_daily.json        {DDMMYYYY: {zone: {"duration": seconds, "visits": n}}}
+#   visitors_hourly.json   {DDMMYYYY: {hour: {"visitors": n, "duration": seconds in store}}}
+#   demographics.json      {"age": {...}, "gender": {...}, "daily": {DDMMYYYY: {"age": {...}, "gender": {...}}}}
+#   sales.json             {"daily": {YYYY-MM-DD: total}, "products": {product: quantity}, "daily_products": {YYYY-MM-DD: {product: quantity}}}
+#   promotion.json         {"With Promotion": {quantity: items}, "Without Promotion": {quantity: items}}
+ROLLUP_DIR = os.path.expanduser("../FourCAST/public/rollups")
+ROLLUP_STATE = "_rollups.json"  # {"partitions": {table/date: fingerprint}, "days": {table: {date: per day rollup}}}
+
+
+def as_dict(keys, values):
+    return {str(key): value for key, value in zip(keys.to_pylist(), values.to_pylist()) if key is not None}
+
+
+def zone_day(table):
+    grouped = table.group_by("Zone").aggregate([("Duration", "sum"), ("Duration", "count")])
+    return {
+        zone: {"duration": round(duration, 2), "visits": visits}
+        for zone, duration, visits in zip(grouped["Zone"].to_pylist(), grouped["Duration_sum"].to_pylist(), grouped["Duration_count"].to_pylist())
+    }
+
+
+def customer_day(table):
+    counts = {}
+    for column in ("Age", "Gender"):
+        value_counts = pc.value_counts(table[column])
+        counts[column.lower()] = as_dict(value_counts.field("values"), value_counts.field("counts"))
+
+    timed = table.filter(pc.is_valid(table["DateTime"]))
+    hours = pa.table({"hour": pc.hour(timed["DateTime"]), "duration": timed["InStoreDuration"]})
+    grouped = hours.group_by("hour").aggregate([("duration", "count"), ("duration", "sum")])
+    counts["hourly"] = {
+        str(hour): {"visitors": visitors, "duration": round(duration or 0, 2)}
+        for hour, visitors, duration in zip(grouped["hour"].to_pylist(), grouped["duration_count"].to_pylist(), grouped["duration_sum"].to_pylist())
+    }
+    return counts
+
+
+def purchase_day(table):
+    items = pa.table({
+        "product": pc.list_flatten(table["ProductID"]),
+        "quantity": pc.list_flatten(table["Quantity"]),
+        "promotion": pc.list_flatten(table["Promotion"]),
+    }).filter(pc.greater(pc.fill_null(pc.list_flatten(table["Quantity"]), 0), 0))  # Same rule as the chart: quantity > 0
+
+    products = items.group_by("product").aggregate([("quantity", "sum")])
+    promotion = items.group_by(["promotion", "quantity"]).aggregate([("quantity", "count")])
+    histogram = {"With Promotion": {}, "Without Promotion": {}}
+    for flag, quantity, count in zip(promotion["promotion"].to_pylist(), promotion["quantity"].to_pylist(), promotion["quantity_count"].to_pylist()):
+        histogram["With Promotion" if flag else "Without Promotion"][str(quantity)] = count
+
+    return {
+        "total": round(pc.sum(table["Total"]).as_py() or 0, 2),
+        "products": as_dict(products["product"], products["quantity_sum"]),
+        "promotion": histogram,
+    }
+
+
+# Store table -> per day rollup function
+ROLLUP_TABLES = {
+    "visit_zone": zone_day,
+    "physical_customer": customer_day,
+    "physical_purchase": purchase_day,
+}
+
+
+def load_rollup_state(store_dir):
+    try:
+        with open(os.path.join(store_dir, ROLLUP_STATE), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"partitions": {}, "days": {table: {} for table in ROLLUP_TABLES}}
+
+
+def save_json(path, data):
+    """Write `data` unless the file already holds exactly this content; returns True if written"""
+    body = json.dumps(data, sort_keys=True)
+    try:
+        with open(path, "r") as f:
+            if f.read() == body:
+                return False
+    except FileNotFoundError:
+        pass
+    with open(path + ".tmp", "w") as f:
+        f.write(body)
+    os.replace(path + ".tmp", path)
+    return True
+
+
+def add_counts(target, counts):
+    for key, value in counts.items():
+        target[key] = target.get(key, 0) + value
+
+
+def ddmmyyyy(day):
+    return date.fromisoformat(day).strftime("%d%m%Y")  # The dashboard's existing date keys
+
+
+def build_rollups(days):
+    zone_daily = {ddmmyyyy(day): zones for day, zones in days["visit_zone"].items()}
+
+    demographics = {"age": {}, "gender": {}, "daily": {}}
+    visitors_hourly = {}
+    for day, counts in days["physical_customer"].items():
+        add_counts(demographics["age"], counts["age"])
+        add_counts(demographics["gender"], counts["gender"])
+        demographics["daily"][ddmmyyyy(day)] = {"age": counts["age"], "gender": counts["gender"]}
+        visitors_hourly[ddmmyyyy(day)] = counts["hourly"]
+
+    sales = {"daily": {}, "products": {}, "daily_products": {}}
+    promotion = {"With Promotion": {}, "Without Promotion": {}}
+    for day, rollup in days["physical_purchase"].items():
+        sales["daily"][day] = rollup["total"]
+        sales["daily_products"][day] = rollup["products"]
+        add_counts(sales["products"], rollup["products"])
+        for label, histogram in rollup["promotion"].items():
+            add_counts(promotion[label], histogram)
+
+    return {
+        "zone_daily.json": zone_daily,
+        "visitors_hourly.json": visitors_hourly,
+        "demographics.json": demographics,
+        "sales.json": sales,
+        "promotion.json": promotion,
+    }
+
+
+def update_rollups(store_dir=STORE_DIR, rollup_dir=ROLLUP_DIR):
+    """Recompute the per day rollups of the store partitions that changed since the last run, then rewrite the files"""
+    partitions = load_ingest_manifest(store_dir)["partitions"]
+    state = load_rollup_state(store_dir)
+
+    recomputed = 0
+    for table_name, rollup_day in ROLLUP_TABLES.items():
+        days = state["days"].setdefault(table_name, {})
+        current = {key.split("/", 1)[1]: digest for key, digest in partitions.items() if key.startswith(table_name + "/")}
+
+        for day in [day for day in days if day not in current]:
+            del days[day]  # Partition was removed from the store
+            state["partitions"].pop(f"{table_name}/{day}", None)
+
+        for day, digest in current.items():
+            key = f"{table_name}/{day}"
+            if state["partitions"].get(key) == digest:
+                continue
+            try:
+                days[day] = rollup_day(query(table_name, day, day, store_dir=store_dir))
+            except Exception as e:
+                print(f"Failed to roll up {key}: {e}")
+                continue
+            state["partitions"][key] = digest
+            recomputed += 1
+
+    os.makedirs(rollup_dir, exist_ok=True)
+    written = [name for name, data in build_rollups(state["days"]).items() if save_json(os.path.join(rollup_dir, name), data)]
+
+    state_path = os.path.join(store_dir, ROLLUP_STATE)
+    with open(state_path + ".tmp", "w") as f:
+        json.dump(state, f)
+    os.replace(state_path + ".tmp", state_path)
+
+    print(f"Rollups: {recomputed} days recomputed, updated {written or 'nothing'}")
+    return written
+
+
+if __name__ == "__main__":
+    update_rollups()
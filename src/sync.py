@@ -1,8 +1,12 @@
 import os
 import json
+from fnmatch import fnmatch
 import boto3
 from dotenv import load_dotenv
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from analytics_store import ingest
+from rollups import update_rollups
 
 load_dotenv()
 
@@ -10,65 +14,152 @@ region = os.getenv("AWS_REGION")
 access_key = os.getenv("AWS_ACCESS_KEY_ID")
 secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
 
-def download_s3_bucket(bucket_name, download_dir):
-    os.makedirs(download_dir, exist_ok=True)
-    s3 = boto3.client(
+# {key: {"etag", "size", "last_modified"}} of what is already on disk, one <bucket>.json per bucket.
+# Kept next to this script, the download dirs are served to the dashboard as they are.
+SYNC_STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".sync_state")
+LEGACY_MANIFEST_FILE = ".sync_manifest.json"  # Where the manifest used to live, inside the download dir
+MAX_WORKERS = 8
+# Upload parts of the store PCs and their compacted merge, the daily JSON files next to them hold the same records
+SKIPPED_FILES = ("part-*.jsonl.gz", "compacted.jsonl.gz")
+
+def create_s3_client():
+    return boto3.client(
         "s3",
         aws_access_key_id=access_key,
         aws_secret_access_key=secret_key,
         region_name=region,
     )
 
-    # List all objects
-    response = s3.list_objects_v2(Bucket=bucket_name)
+def manifest_path(bucket_name):
+    return os.path.join(SYNC_STATE_DIR, f"{bucket_name}.json")
 
-    if "Contents" not in response:
-        print("No files in bucket")
-        return
+def load_manifest(bucket_name, download_dir):
+    legacy_path = os.path.join(download_dir, LEGACY_MANIFEST_FILE)
+    for path in (manifest_path(bucket_name), legacy_path):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            continue
+    return {}
+
+def save_manifest(bucket_name, download_dir, manifest):
+    os.makedirs(SYNC_STATE_DIR, exist_ok=True)
+    path = manifest_path(bucket_name)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
+    # Take the old manifest out of the public dir once its state has moved
+    legacy_path = os.path.join(download_dir, LEGACY_MANIFEST_FILE)
+    if os.path.exists(legacy_path):
+        os.remove(legacy_path)
+
+def list_objects(s3, bucket_name):
+    # Paginate, a single list_objects_v2 call stops at 1000 keys
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket_name):
+        for obj in page.get("Contents", []):
+            if not obj["Key"].endswith("/"):
+                yield obj
+
+def is_mirrored(key):
+    return not any(fnmatch(os.path.basename(key), pattern) for pattern in SKIPPED_FILES)
+
+def write_index(folder_path):
+    index_file = os.path.join(folder_path, "index.json")
+    files = sorted(
+        f for f in os.listdir(folder_path)
+        if os.path.isfile(os.path.join(folder_path, f)) and f not in ("index.json", LEGACY_MANIFEST_FILE)
+    )
+    with open(index_file, "w") as f:
+        json.dump(files, f, indent=2)
 
-    for obj in response["Contents"]:
+def download_s3_bucket(bucket_name, download_dir, s3=None, max_workers=MAX_WORKERS):
+    os.makedirs(download_dir, exist_ok=True)
+    s3 = s3 or create_s3_client()
+    manifest = load_manifest(bucket_name, download_dir)
+
+    # Only fetch objects whose ETag / size / mtime changed, or that are missing locally
+    to_download = []
+    listed = 0
+    mirrored = set()
+    for obj in list_objects(s3, bucket_name):
+        listed += 1
         key = obj["Key"]
-
-        if key.endswith("/"):
+        if not is_mirrored(key):
             continue
-
+        mirrored.add(key)
+        entry = {"etag": obj["ETag"], "size": obj["Size"], "last_modified": obj["LastModified"].isoformat()}
         local_path = os.path.join(download_dir, key)
-        os.makedirs(os.path.dirname(local_path), exist_ok=True)
-
-        print(f"Downloading {key} -> {local_path}")
-        s3.download_file(bucket_name, key, local_path)
-
-        # Update index.json for this directory
-        folder_path = os.path.dirname(local_path)
-        index_file = os.path.join(folder_path, "index.json")
+        if manifest.get(key) == entry and os.path.exists(local_path) and os.path.getsize(local_path) == obj["Size"]:
+            continue
+        to_download.append((key, local_path, entry))
 
-        files = [
-            f for f in os.listdir(folder_path)
-            if os.path.isfile(os.path.join(folder_path, f)) and f != "index.json"
-        ]
+    if listed == 0:
+        print("No files in bucket")  # Still prune below, everything mirrored before has been deleted
 
-        with open(index_file, "w") as f:
-            json.dump(files, f, indent=2)
+    # Keys deleted from the bucket (or skipped since) leave the manifest and the public dir
+    changed_folders = set()
+    removed = [key for key in manifest if key not in mirrored]
+    for key in removed:
+        local_path = os.path.join(download_dir, key)
+        if os.path.exists(local_path):
+            os.remove(local_path)
+        del manifest[key]
+        changed_folders.add(os.path.dirname(local_path))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {}
+        for key, local_path, entry in to_download:
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            print(f"Downloading {key} -> {local_path}")
+            futures[pool.submit(s3.download_file, bucket_name, key, local_path)] = (key, local_path, entry)
+
+        for future in as_completed(futures):
+            key, local_path, entry = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Failed to download {key}: {e}")
+                continue
+            manifest[key] = entry
+            changed_folders.add(os.path.dirname(local_path))
+
+    # Update index.json once per changed directory
+    for folder_path in changed_folders:
+        if os.path.isdir(folder_path):
+            write_index(folder_path)
+    if to_download or removed or os.path.exists(os.path.join(download_dir, LEGACY_MANIFEST_FILE)):
+        save_manifest(bucket_name, download_dir, manifest)
+
+    print(f"{bucket_name}: {listed} objects listed, {len(to_download)} changed, {len(removed)} removed, "
+          f"{len(changed_folders)} index.json files updated")
 
 if __name__ == "__main__":
+    s3 = create_s3_client()  # One client shared by every bucket and download thread
     while True:
         print("Starting S3 download sync...")
+        start_time = time.time()
 
         # Third bucket
         BUCKET_NAME = "modelpredictionresult"
         DOWNLOAD_DIR = os.path.expanduser("../FourCAST/public/s3/modelpredictionresult")
-        download_s3_bucket(BUCKET_NAME, DOWNLOAD_DIR)
+        download_s3_bucket(BUCKET_NAME, DOWNLOAD_DIR, s3)
 
         # First bucket
         BUCKET_NAME = "onlstores"
         DOWNLOAD_DIR = os.path.expanduser("../FourCAST/public/s3/onlstores")
-        download_s3_bucket(BUCKET_NAME, DOWNLOAD_DIR)
+        download_s3_bucket(BUCKET_NAME, DOWNLOAD_DIR, s3)
 
         # Second bucket
         BUCKET_NAME = "physicalstore"
         DOWNLOAD_DIR = os.path.expanduser("../FourCAST/public/s3/physicalstore")
-        download_s3_bucket(BUCKET_NAME, DOWNLOAD_DIR)
+        download_s3_bucket(BUCKET_NAME, DOWNLOAD_DIR, s3)
 
+        # Refresh the Parquet copy, only new or changed files are read
+        ingest(os.path.expanduser("../FourCAST/public/s3"))
+        # ...and the per chart rollups of the days that changed
+        update_rollups()
 
-        print("Sync complete. Waiting 1 hour...\n")
+        print(f"Sync complete in {time.time() - start_time:.1f}s. Waiting 1 hour...\n")
         time.sleep(3600)